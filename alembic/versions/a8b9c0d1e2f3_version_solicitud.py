@@ -0,0 +1,31 @@
+"""version de solicitud para control de concurrencia optimista
+
+Revision ID: a8b9c0d1e2f3
+Revises: f7a8b9c0d1e2
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8b9c0d1e2f3'
+down_revision: Union[str, Sequence[str], None] = 'f7a8b9c0d1e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'solicitud',
+        sa.Column('version', sa.Integer(), nullable=False, server_default=sa.text('1')),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('solicitud', 'version')
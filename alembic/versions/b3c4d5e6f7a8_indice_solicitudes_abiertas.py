@@ -0,0 +1,34 @@
+"""indice parcial para agrupar solicitudes abiertas por cama/area/tipo
+
+Revision ID: b3c4d5e6f7a8
+Revises: a0212404be54
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3c4d5e6f7a8'
+down_revision: Union[str, Sequence[str], None] = 'a0212404be54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_solicitud_abiertas_cama_area_tipo',
+        'solicitud',
+        ['id_cama', 'id_area', 'tipo', 'fecha_creacion'],
+        unique=False,
+        postgresql_where=sa.text("estado_actual <> 'cerrada'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_solicitud_abiertas_cama_area_tipo', table_name='solicitud')
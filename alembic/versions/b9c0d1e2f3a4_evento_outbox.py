@@ -0,0 +1,47 @@
+"""outbox transaccional de eventos de dominio
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9c0d1e2f3a4'
+down_revision: Union[str, Sequence[str], None] = 'a8b9c0d1e2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'evento_outbox',
+        sa.Column('id_evento', sa.BigInteger(), primary_key=True),
+        sa.Column('tipo', sa.String(length=80), nullable=False),
+        sa.Column('payload', postgresql.JSONB(), nullable=False),
+        sa.Column('fecha_creacion', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('fecha_envio', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('intentos', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('ultimo_error', sa.String(length=500), nullable=True),
+    )
+    # Índice parcial: el relay sólo recorre los pendientes.
+    op.create_index(
+        'ix_evento_outbox_pendientes',
+        'evento_outbox',
+        ['id_evento'],
+        unique=False,
+        postgresql_where=sa.text('fecha_envio IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_evento_outbox_pendientes', table_name='evento_outbox')
+    op.drop_table('evento_outbox')
@@ -0,0 +1,39 @@
+"""idempotency-key compartida entre workers
+
+Revision ID: c0d1e2f3a4b5
+Revises: b9c0d1e2f3a4
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c0d1e2f3a4b5'
+down_revision: Union[str, Sequence[str], None] = 'b9c0d1e2f3a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'idempotencia_solicitud',
+        sa.Column('clave', sa.String(length=255), primary_key=True),
+        sa.Column('huella', sa.String(length=64), nullable=False),
+        sa.Column('respuesta', postgresql.JSONB(), nullable=True),
+        sa.Column('expira_en', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index(
+        'ix_idempotencia_solicitud_expira_en', 'idempotencia_solicitud', ['expira_en'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_idempotencia_solicitud_expira_en', table_name='idempotencia_solicitud')
+    op.drop_table('idempotencia_solicitud')
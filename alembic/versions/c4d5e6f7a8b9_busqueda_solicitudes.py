@@ -0,0 +1,52 @@
+"""busqueda de solicitudes: tsvector generado (spanish) e indices trigram
+
+Revision ID: c4d5e6f7a8b9
+Revises: b3c4d5e6f7a8
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d5e6f7a8b9'
+down_revision: Union[str, Sequence[str], None] = 'b3c4d5e6f7a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_COLUMNS = ('nombre_solicitante', 'correo_solicitante', 'tipo')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        """
+        ALTER TABLE solicitud ADD COLUMN busqueda tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector(
+                'spanish',
+                coalesce(tipo, '') || ' ' || coalesce(descripcion, '') || ' ' || coalesce(nombre_solicitante, '')
+            )
+        ) STORED
+        """
+    )
+    op.create_index('ix_solicitud_busqueda', 'solicitud', ['busqueda'], postgresql_using='gin')
+    for column in TRIGRAM_COLUMNS:
+        op.create_index(
+            f'ix_solicitud_{column}_trgm',
+            'solicitud',
+            [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in TRIGRAM_COLUMNS:
+        op.drop_index(f'ix_solicitud_{column}_trgm', table_name='solicitud')
+    op.drop_index('ix_solicitud_busqueda', table_name='solicitud')
+    op.drop_column('solicitud', 'busqueda')
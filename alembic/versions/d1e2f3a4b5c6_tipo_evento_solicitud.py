@@ -0,0 +1,33 @@
+"""tipo de evento en solicitud_evento (agrupación de duplicados)
+
+Revision ID: d1e2f3a4b5c6
+Revises: c0d1e2f3a4b5
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1e2f3a4b5c6'
+down_revision: Union[str, Sequence[str], None] = 'c0d1e2f3a4b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Con server_default constante, Postgres no reescribe la tabla.
+    op.add_column(
+        'solicitud_evento',
+        sa.Column('tipo', sa.String(length=20), nullable=False, server_default=sa.text("'estado'")),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM solicitud_evento WHERE tipo <> 'estado'")
+    op.drop_column('solicitud_evento', 'tipo')
@@ -0,0 +1,36 @@
+"""sla por area e indice parcial para la cola de solicitudes abiertas
+
+Revision ID: d5e6f7a8b9c0
+Revises: c4d5e6f7a8b9
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e6f7a8b9c0'
+down_revision: Union[str, Sequence[str], None] = 'c4d5e6f7a8b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('area', sa.Column('sla_minutos', sa.Integer(), nullable=True))
+    op.create_index(
+        'ix_solicitud_cola_area',
+        'solicitud',
+        ['id_area', 'fecha_creacion'],
+        unique=False,
+        postgresql_where=sa.text("estado_actual <> 'cerrada'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_solicitud_cola_area', table_name='solicitud')
+    op.drop_column('area', 'sla_minutos')
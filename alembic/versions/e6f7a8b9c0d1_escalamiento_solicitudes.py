@@ -0,0 +1,41 @@
+"""escalamiento sla: columnas escalada/fecha_escalamiento e indice parcial
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f7a8b9c0d1'
+down_revision: Union[str, Sequence[str], None] = 'd5e6f7a8b9c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'solicitud',
+        sa.Column('escalada', sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.add_column('solicitud', sa.Column('fecha_escalamiento', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        'ix_solicitud_por_escalar',
+        'solicitud',
+        ['id_area', 'fecha_creacion'],
+        unique=False,
+        postgresql_where=sa.text("estado_actual <> 'cerrada' AND NOT escalada"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_solicitud_por_escalar', table_name='solicitud')
+    op.drop_column('solicitud', 'fecha_escalamiento')
+    op.drop_column('solicitud', 'escalada')
@@ -0,0 +1,47 @@
+"""inicio_sla: el SLA se reinicia al reabrir una solicitud
+
+Revision ID: f3a4b5c6d7e8
+Revises: e2f3a4b5c6d7
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a4b5c6d7e8'
+down_revision: Union[str, Sequence[str], None] = 'e2f3a4b5c6d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('solicitud', sa.Column('inicio_sla', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE solicitud SET inicio_sla = fecha_creacion")
+    op.alter_column('solicitud', 'inicio_sla', nullable=False, server_default=sa.func.now())
+
+    op.drop_index('ix_solicitud_por_escalar', table_name='solicitud')
+    op.create_index(
+        'ix_solicitud_por_escalar',
+        'solicitud',
+        ['id_area', 'inicio_sla'],
+        unique=False,
+        postgresql_where=sa.text("estado_actual <> 'cerrada' AND NOT escalada"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_solicitud_por_escalar', table_name='solicitud')
+    op.create_index(
+        'ix_solicitud_por_escalar',
+        'solicitud',
+        ['id_area', 'fecha_creacion'],
+        unique=False,
+        postgresql_where=sa.text("estado_actual <> 'cerrada' AND NOT escalada"),
+    )
+    op.drop_column('solicitud', 'inicio_sla')
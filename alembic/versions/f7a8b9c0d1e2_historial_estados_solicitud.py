@@ -0,0 +1,81 @@
+"""historial de estados: solicitud_evento, rollups diarios y fecha_primera_respuesta
+
+Revision ID: f7a8b9c0d1e2
+Revises: e6f7a8b9c0d1
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a8b9c0d1e2'
+down_revision: Union[str, Sequence[str], None] = 'e6f7a8b9c0d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+estado_solicitud = postgresql.ENUM(
+    'pendiente', 'en_proceso', 'cerrada', name='estado_solicitud', create_type=False
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('solicitud', sa.Column('fecha_primera_respuesta', sa.DateTime(timezone=True), nullable=True))
+
+    # Sin backfill: para solicitudes previas, services.historial usa
+    # fecha_creacion / fecha_actualizacion como inicio del estado vigente.
+    op.create_table(
+        'solicitud_evento',
+        sa.Column('id_evento', sa.BigInteger(), primary_key=True),
+        sa.Column(
+            'id_solicitud',
+            sa.Integer(),
+            sa.ForeignKey('solicitud.id_solicitud', ondelete='CASCADE'),
+            nullable=False,
+        ),
+        sa.Column('id_area', sa.Integer(), sa.ForeignKey('area.id_area'), nullable=False),
+        sa.Column('estado_anterior', estado_solicitud, nullable=True),
+        sa.Column('estado_nuevo', estado_solicitud, nullable=False),
+        sa.Column('fecha', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('segundos_en_estado', sa.Float(), nullable=True),
+        sa.Column('segundos_primera_respuesta', sa.Float(), nullable=True),
+    )
+    op.create_index(
+        'ix_solicitud_evento_solicitud_fecha', 'solicitud_evento', ['id_solicitud', 'fecha'], unique=False
+    )
+
+    op.create_table(
+        'rollup_estado_diario',
+        sa.Column('dia', sa.Date(), primary_key=True),
+        sa.Column('id_area', sa.Integer(), sa.ForeignKey('area.id_area'), primary_key=True),
+        sa.Column('estado', estado_solicitud, primary_key=True),
+        sa.Column('salidas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('segundos', sa.Float(), nullable=False, server_default='0'),
+    )
+    op.create_table(
+        'rollup_primera_respuesta_diaria',
+        sa.Column('dia', sa.Date(), primary_key=True),
+        sa.Column('id_area', sa.Integer(), sa.ForeignKey('area.id_area'), primary_key=True),
+        sa.Column('cantidad', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('segundos', sa.Float(), nullable=False, server_default='0'),
+    )
+    op.create_table(
+        'rollup_marca',
+        sa.Column('nombre', sa.String(length=60), primary_key=True),
+        sa.Column('ultimo_id', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rollup_marca')
+    op.drop_table('rollup_primera_respuesta_diaria')
+    op.drop_table('rollup_estado_diario')
+    op.drop_index('ix_solicitud_evento_solicitud_fecha', table_name='solicitud_evento')
+    op.drop_table('solicitud_evento')
+    op.drop_column('solicitud', 'fecha_primera_respuesta')
@@ -2,16 +2,22 @@ import base64
 import hashlib
 import hmac
 import json
+import logging
 import os
 import time
+import uuid
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
+from auth import jwks
 from db.session import SessionLocal
 from models.models import RolUsuario, Usuario
+from services import cache
+
+logger = logging.getLogger("auth")
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
@@ -28,8 +34,63 @@ def _decode_segment(segment: str) -> bytes:
         ) from exc
 
 
-def _verify_jwt(token: str, secret: str) -> dict:
-    """Verify HS256 JWT without external dependencies."""
+def _json_segment(segment: str, detail: str) -> dict:
+    try:
+        data = json.loads(_decode_segment(segment))
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=detail,
+        ) from exc
+    if not isinstance(data, dict):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=detail,
+        )
+    return data
+
+
+def _verify_signature(alg: Optional[str], kid: Optional[str], signing_input: bytes, signature: bytes, secret: Optional[str]) -> bool:
+    if alg == "HS256":
+        if not secret:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Configuración de autenticación incompleta",
+            )
+        expected_signature = hmac.new(
+            key=secret.encode("utf-8"),
+            msg=signing_input,
+            digestmod=hashlib.sha256,
+        ).digest()
+        return hmac.compare_digest(signature, expected_signature)
+
+    if alg in jwks.ALGORITMOS:
+        try:
+            clave = jwks.cache.clave(kid)
+        except jwks.JWKSError as exc:
+            logger.error("JWKS no disponible: %s", exc)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="No se pudieron obtener las claves de verificación",
+            ) from exc
+        if clave is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Clave de firma desconocida",
+            )
+        return jwks.verificar_firma(clave, alg, signing_input, signature)
+
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Algoritmo de firma no soportado",
+    )
+
+
+def _verify_jwt(token: str, secret: Optional[str] = None) -> dict:
+    """
+    Verify a JWT in-process: HS256 with the shared secret, or RS256/ES256
+    with Supabase's public keys from the JWKS cache.
+    """
     parts = token.split(".")
     if len(parts) != 3:
         raise HTTPException(
@@ -38,29 +99,17 @@ def _verify_jwt(token: str, secret: str) -> dict:
         )
 
     header_b64, payload_b64, signature_b64 = parts
+    header = _json_segment(header_b64, "Token con encabezado inválido")
     signing_input = f"{header_b64}.{payload_b64}".encode("utf-8")
     signature = _decode_segment(signature_b64)
 
-    expected_signature = hmac.new(
-        key=secret.encode("utf-8"),
-        msg=signing_input,
-        digestmod=hashlib.sha256,
-    ).digest()
-
-    if not hmac.compare_digest(signature, expected_signature):
+    if not _verify_signature(header.get("alg"), header.get("kid"), signing_input, signature, secret):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Firma del token inválida",
         )
 
-    payload_bytes = _decode_segment(payload_b64)
-    try:
-        payload = json.loads(payload_bytes)
-    except json.JSONDecodeError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token con payload inválido",
-        ) from exc
+    payload = _json_segment(payload_b64, "Token con payload inválido")
 
     exp: Optional[int] = payload.get("exp")
     if exp is not None and time.time() > exp:
@@ -72,6 +121,35 @@ def _verify_jwt(token: str, secret: str) -> dict:
     return payload
 
 
+# Payloads de tokens ya verificados, por hash del token: evita repetir la
+# verificación RSA/ECDSA en cada request del mismo usuario (y, con un backend
+# compartido, en cada worker). La expiración se revisa igual en cada acierto;
+# el TTL acota cuánto sobrevive un token a una rotación o revocación de claves.
+verified_tokens = cache.Cache("jwt", float(os.getenv("JWT_CACHE_TTL_SECONDS", "300")))
+
+
+def verify_token(token: str) -> dict:
+    """_verify_jwt() con caché de resultados por token."""
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    payload = verified_tokens.get(key)
+    if payload is not None:
+        exp = payload.get("exp")
+        if exp is not None and time.time() > exp:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token expirado",
+            )
+        return payload
+
+    payload = _verify_jwt(token, os.getenv("SUPABASE_JWT_SECRET"))
+    ttl = verified_tokens.ttl
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        verified_tokens.set(key, payload, ttl)
+    return payload
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -90,14 +168,7 @@ def get_current_user(
             detail="Credenciales de autenticación requeridas",
         )
 
-    secret = os.getenv("SUPABASE_JWT_SECRET")
-    if not secret:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Configuración de autenticación incompleta",
-        )
-
-    payload = _verify_jwt(credentials.credentials, secret)
+    payload = verify_token(credentials.credentials)
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(
@@ -105,7 +176,24 @@ def get_current_user(
             detail="Token sin identificador de usuario",
         )
 
-    usuario = db.query(Usuario).filter(Usuario.id == user_id).first()
+    try:
+        user_uuid = uuid.UUID(str(user_id))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token con identificador de usuario inválido",
+        )
+
+    usuario = (
+        db.query(Usuario)
+        .options(joinedload(Usuario.area))
+        .filter(Usuario.id == user_uuid)
+        .first()
+    )
+    # Devuelve la conexión al pool antes de que corra el handler, que abre su
+    # propia sesión: con pool_size=3, tres requests autenticadas que retenían
+    # una conexión aquí y esperaban otra en el router se bloqueaban entre sí.
+    db.close()
     if not usuario or not usuario.activo:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
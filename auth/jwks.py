@@ -0,0 +1,180 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+
+logger = logging.getLogger("jwks")
+
+# Supabase cachea el JWKS 10 minutos en su edge; más seguido no trae nada nuevo.
+TTL_SECONDS = float(os.getenv("SUPABASE_JWKS_TTL_SECONDS", "600"))
+# Mínimo entre descargas forzadas por un `kid` desconocido: un token con kid
+# inventado no debe convertirse en una petición a Supabase por request.
+REFRESCO_MIN_SECONDS = float(os.getenv("SUPABASE_JWKS_REFRESCO_MIN_SECONDS", "30"))
+TIMEOUT_SECONDS = float(os.getenv("SUPABASE_JWKS_TIMEOUT_SECONDS", "5"))
+
+ALGORITMOS = ("RS256", "ES256")
+
+
+class JWKSError(Exception):
+    """No se pudo obtener o interpretar el JWKS."""
+
+
+def _b64_entero(valor: str) -> int:
+    return int.from_bytes(base64.urlsafe_b64decode(valor + "=" * (-len(valor) % 4)), "big")
+
+
+def clave_publica(jwk: dict) -> Optional[Tuple[str, object]]:
+    """
+    ("RS256", RSAPublicKey) o ("ES256", EllipticCurvePublicKey) a partir de
+    un JWK público; None si la clave no sirve para verificar firmas de un
+    algoritmo soportado.
+    """
+    if jwk.get("use", "sig") != "sig":
+        return None
+    try:
+        if jwk.get("kty") == "RSA" and jwk.get("alg", "RS256") == "RS256":
+            n, e = _b64_entero(jwk["n"]), _b64_entero(jwk["e"])
+            if n.bit_length() < 2048:
+                return None
+            return ("RS256", rsa.RSAPublicNumbers(e, n).public_key())
+        if jwk.get("kty") == "EC" and jwk.get("crv") == "P-256" and jwk.get("alg", "ES256") == "ES256":
+            x, y = _b64_entero(jwk["x"]), _b64_entero(jwk["y"])
+            # public_key() rechaza puntos fuera de la curva con ValueError.
+            return ("ES256", ec.EllipticCurvePublicNumbers(x, y, ec.SECP256R1()).public_key())
+    except (KeyError, TypeError, ValueError):
+        return None
+    return None
+
+
+def verificar_firma(clave: Tuple[str, object], alg: str, mensaje: bytes, firma: bytes) -> bool:
+    tipo, publica = clave
+    if tipo != alg:
+        return False
+    try:
+        if alg == "RS256":
+            publica.verify(firma, mensaje, padding.PKCS1v15(), hashes.SHA256())
+        else:
+            # La firma JWS es r || s de 32 bytes cada uno; cryptography espera DER.
+            if len(firma) != 64:
+                return False
+            r, s = int.from_bytes(firma[:32], "big"), int.from_bytes(firma[32:], "big")
+            publica.verify(encode_dss_signature(r, s), mensaje, ec.ECDSA(hashes.SHA256()))
+    except InvalidSignature:
+        return False
+    return True
+
+
+def _fuente() -> Optional[str]:
+    """SUPABASE_JWKS_FILE (tests sin red) o la URL del JWKS del proyecto."""
+    archivo = os.getenv("SUPABASE_JWKS_FILE")
+    if archivo:
+        return archivo
+    url = os.getenv("SUPABASE_JWKS_URL")
+    if url:
+        return url
+    base_url = os.getenv("SUPABASE_URL")
+    if base_url:
+        return f"{base_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+    return None
+
+
+def _descargar(fuente: str) -> dict:
+    try:
+        if fuente.startswith(("http://", "https://")):
+            import httpx  # sólo con JWKS remoto; los tests leen un archivo
+
+            try:
+                response = httpx.get(fuente, timeout=TIMEOUT_SECONDS)
+                response.raise_for_status()
+            except httpx.HTTPError as exc:
+                raise OSError(str(exc)) from exc
+            return response.json()
+        with open(fuente, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as exc:
+        raise JWKSError(f"No se pudo leer el JWKS desde {fuente}: {exc}") from exc
+
+
+class JWKSCache:
+    """
+    Claves públicas por `kid`, descargadas una vez y renovadas cada `ttl`
+    segundos. Un `kid` desconocido (rotación de claves en Supabase) fuerza
+    una descarga, como máximo una cada `refresco_min` segundos. Si una
+    descarga falla se siguen usando las claves que ya había.
+
+    La descarga corre fuera del lock y la hace un solo hilo; mientras tanto
+    los demás siguen verificando con las claves ya cargadas. Sólo esperan
+    si todavía no hay ninguna (primera carga del worker).
+    """
+
+    def __init__(self, ttl: float = TTL_SECONDS, refresco_min: float = REFRESCO_MIN_SECONDS, reloj=time.monotonic):
+        self.ttl = ttl
+        self.refresco_min = refresco_min
+        self._reloj = reloj
+        self._claves: Dict[Optional[str], Tuple[str, object]] = {}
+        self._cargado_en: Optional[float] = None
+        self._intentado_en: Optional[float] = None
+        self._refrescando = False
+        self._cond = threading.Condition()
+
+    def _descargar_claves(self, fuente: str) -> Optional[Dict[Optional[str], Tuple[str, object]]]:
+        try:
+            documento = _descargar(fuente)
+        except JWKSError:
+            if not self._claves:
+                raise
+            logger.warning("No se pudo renovar el JWKS; se mantienen %s claves en caché", len(self._claves), exc_info=True)
+            return None
+        claves = {}
+        for jwk in documento.get("keys", []) if isinstance(documento, dict) else []:
+            clave = clave_publica(jwk) if isinstance(jwk, dict) else None
+            if clave is not None:
+                claves[jwk.get("kid")] = clave
+        return claves
+
+    def _refrescar(self, ahora: float) -> None:
+        fuente = _fuente()
+        if fuente is None:
+            raise JWKSError("No hay JWKS configurado (SUPABASE_JWKS_FILE, SUPABASE_JWKS_URL o SUPABASE_URL).")
+        claves = self._descargar_claves(fuente)
+        if claves is not None:
+            with self._cond:
+                self._claves = claves
+                self._cargado_en = ahora
+
+    def clave(self, kid: Optional[str]) -> Optional[Tuple[str, object]]:
+        with self._cond:
+            ahora = self._reloj()
+            puede = self._intentado_en is None or ahora - self._intentado_en >= self.refresco_min
+            vencido = self._cargado_en is None or ahora - self._cargado_en >= self.ttl
+            refrescar = not self._refrescando and puede and (vencido or kid not in self._claves)
+            if refrescar:
+                self._refrescando = True
+                self._intentado_en = ahora
+            elif self._refrescando and self._cargado_en is None:
+                # Otro hilo hace la primera carga: no hay claves con qué seguir.
+                self._cond.wait_for(lambda: not self._refrescando, timeout=TIMEOUT_SECONDS * 2)
+        if refrescar:
+            try:
+                self._refrescar(ahora)
+            finally:
+                with self._cond:
+                    self._refrescando = False
+                    self._cond.notify_all()
+        with self._cond:
+            if self._cargado_en is None:
+                raise JWKSError("JWKS no disponible; se reintentará en unos segundos.")
+            if kid is None and len(self._claves) == 1:
+                return next(iter(self._claves.values()))
+            return self._claves.get(kid)
+
+
+cache = JWKSCache()
@@ -0,0 +1,107 @@
+"""
+Arranque en frío del proceso de la API.
+
+Mide (1) el tiempo de importar `main` según `python -X importtime`, con los
+módulos más caros, y (2) el tiempo desde que se lanza uvicorn hasta la
+primera respuesta 200 de `GET /`, que es lo que ve un usuario cuando Render
+despierta la instancia.
+
+    python -m benchmarks.bench_arranque [--repeticiones 5] [--top 15]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencias que sólo usan chat, generación de QR, el relay a webhooks o las
+# llamadas a Supabase: no deben cargarse al arrancar.
+PESADOS = ("openai", "qrcode", "PIL", "requests", "httpx")
+
+
+def _entorno(directorio: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(directorio, 'arranque.db')}")
+    env["SCHEDULER_ENABLED"] = "0"
+    env["PYTHONPATH"] = RAIZ + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def importacion() -> dict:
+    """
+    {modulo: microsegundos acumulados} de importar `main` en un proceso nuevo,
+    tal como lo reporta `-X importtime`.
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=RAIZ, env=_entorno(directorio), capture_output=True, text=True, check=True,
+        )
+    tiempos = {}
+    for linea in proc.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, propio_acumulado = linea.split(":", 1)
+        _, acumulado, modulo = propio_acumulado.split("|")
+        tiempos[modulo.strip()] = int(acumulado)
+    return tiempos
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def primera_respuesta(timeout: float = 30) -> float:
+    """Segundos desde lanzar uvicorn hasta el primer 200 de GET /."""
+    puerto = _puerto_libre()
+    with tempfile.TemporaryDirectory() as directorio:
+        inicio = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(puerto), "--log-level", "warning"],
+            cwd=RAIZ, env=_entorno(directorio), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            while time.perf_counter() - inicio < timeout:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/", timeout=1) as r:
+                        if r.status == 200:
+                            return time.perf_counter() - inicio
+                except OSError:
+                    time.sleep(0.01)
+            raise TimeoutError("uvicorn no respondió a tiempo")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="módulos más caros a listar")
+    args = parser.parse_args(argv)
+
+    tiempos = importacion()
+    print(f"import main: {tiempos['main'] / 1000:.0f} ms")
+    for modulo, us in sorted(tiempos.items(), key=lambda kv: -kv[1])[1:args.top + 1]:
+        print(f"  {us / 1000:8.1f} ms  {modulo}")
+    cargados = [m for m in PESADOS if m in tiempos]
+    print(f"dependencias pesadas cargadas al arrancar: {', '.join(cargados) or 'ninguna'}")
+
+    muestras = [primera_respuesta() for _ in range(args.repeticiones)]
+    print(
+        f"arranque → primera respuesta: mediana {statistics.median(muestras) * 1000:.0f} ms"
+        f" (min {min(muestras) * 1000:.0f}, max {max(muestras) * 1000:.0f}, n={len(muestras)})"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Micro-benchmark de serialización de un listado grande de solicitudes.
+
+Compara la ruta anterior (dicts con isoformat → jsonable_encoder → json.dumps
+de JSONResponse) con la actual (dict(zip) de la fila → ORJSONResponse).
+
+    python -m benchmarks.bench_serializacion [--n 50000] [--min-speedup 3]
+"""
+import argparse
+import enum
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+class EstadoSolicitud(str, enum.Enum):
+    # Copia de models.EstadoSolicitud: importar models exige DATABASE_URL.
+    PENDIENTE = "pendiente"
+    CERRADA = "cerrada"
+
+
+COLUMNAS = (
+    "id", "id_cama", "id_area", "tipo", "descripcion", "estado", "fecha_creacion",
+    "fecha_actualizacion", "fecha_cierre", "nombre_solicitante", "correo_solicitante", "identificador_qr",
+)
+
+
+def filas_sinteticas(n: int, semilla: int = 42) -> list:
+    """Tuplas con la misma forma que devuelve select_solicitudes()."""
+    rng = random.Random(semilla)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    filas = []
+    for i in range(1, n + 1):
+        creada = base + timedelta(seconds=rng.randrange(365 * 86400))
+        cerrada = rng.random() < 0.8
+        filas.append((
+            i, rng.randrange(1, 500), rng.randrange(1, 6), "BAÑO", f"Descripción de la solicitud {i}",
+            EstadoSolicitud.CERRADA if cerrada else EstadoSolicitud.PENDIENTE,
+            creada, creada + timedelta(hours=2), creada + timedelta(hours=2) if cerrada else None,
+            f"Paciente {i}", f"paciente{i}@example.com", f"H1-E1-1{i % 100:02d}-A",
+        ))
+    return filas
+
+
+def ruta_anterior(filas: list) -> bytes:
+    salida = []
+    for f in filas:
+        d = dict(zip(COLUMNAS, f))
+        d["estado"] = d["estado"].value
+        for k in ("fecha_creacion", "fecha_actualizacion", "fecha_cierre"):
+            d[k] = d[k].isoformat() if d[k] else None
+        salida.append(d)
+    return JSONResponse(jsonable_encoder(salida)).body
+
+
+def ruta_orjson(filas: list) -> bytes:
+    return ORJSONResponse([dict(zip(COLUMNAS, f)) for f in filas]).body
+
+
+def _medir(fn, filas, repeticiones: int = 3) -> float:
+    return min(_una(fn, filas) for _ in range(repeticiones))
+
+
+def _una(fn, filas) -> float:
+    inicio = time.perf_counter()
+    fn(filas)
+    return time.perf_counter() - inicio
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=50000)
+    parser.add_argument("--min-speedup", type=float, default=3.0)
+    args = parser.parse_args()
+
+    filas = filas_sinteticas(args.n)
+    antes = _medir(ruta_anterior, filas)
+    ahora = _medir(ruta_orjson, filas)
+    print(f"jsonable_encoder + json: {antes * 1000:8.1f} ms")
+    print(f"orjson directo:          {ahora * 1000:8.1f} ms")
+    print(f"speedup:                 {antes / ahora:8.1f}x (mínimo {args.min_speedup:.1f}x)")
+    return 0 if antes / ahora >= args.min_speedup else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark del overhead de TelemetryMiddleware.
+
+Ejecuta una app ASGI mínima directamente (sin red ni servidor) con y sin el
+middleware y reporta el costo adicional por petición.
+
+    python -m benchmarks.bench_telemetria [--n 20000] [--max-us 50]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from services.telemetry import TelemetryMiddleware
+
+
+class _Route:
+    path = "/bench/{id}"
+
+
+async def _app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b'{"ok":true}'})
+
+
+async def _noop_send(message):
+    return None
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _run(app, n: int) -> float:
+    headers = [(b"content-length", b"0")]
+    start = time.perf_counter()
+    for _ in range(n):
+        scope = {"type": "http", "method": "GET", "path": "/bench/1", "headers": headers}
+        await app(scope, _receive, _noop_send)
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--max-us", type=float, default=50.0)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    middleware = TelemetryMiddleware(_app)
+    # Calentamiento
+    loop.run_until_complete(_run(_app, 1000))
+    loop.run_until_complete(_run(middleware, 1000))
+
+    base = min(loop.run_until_complete(_run(_app, args.n)) for _ in range(3))
+    medido = min(loop.run_until_complete(_run(middleware, args.n)) for _ in range(3))
+    overhead_us = (medido - base) / args.n * 1e6
+
+    print(f"sin middleware: {base / args.n * 1e6:.2f} µs/petición")
+    print(f"con middleware: {medido / args.n * 1e6:.2f} µs/petición")
+    print(f"overhead:       {overhead_us:.2f} µs/petición (límite {args.max_us:.0f} µs)")
+    return 0 if overhead_us <= args.max_us else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Escalamiento del throughput con la cantidad de workers de gunicorn.
+
+Siembra la BD una vez y, para cada valor de --workers, levanta
+`gunicorn main:app -c gunicorn.conf.py` con WEB_CONCURRENCY=<n> y corre la
+mezcla de benchmarks.carga por HTTP contra él. Reporta req/s totales y la
+aceleración respecto al primer valor. Con SQLite las escrituras se
+serializan; para medir en serio usar --db con Postgres.
+
+    python -m benchmarks.bench_workers [--workers 1,2,4] [--db postgresql://...]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks import carga
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar(url: str, proc: subprocess.Popen, timeout: float = 60) -> None:
+    limite = time.perf_counter() + timeout
+    while time.perf_counter() < limite:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó con código {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError("gunicorn no respondió a tiempo")
+
+
+def medir(workers: int, db: str, argumentos_carga: list) -> float:
+    """req/s totales de la mezcla de carga contra `workers` workers."""
+    puerto = _puerto_libre()
+    env = dict(
+        os.environ,
+        DATABASE_URL=db,
+        PORT=str(puerto),
+        WEB_CONCURRENCY=str(workers),
+        SCHEDULER_ENABLED="0",
+        RATE_LIMIT_ENABLED="0",
+        GUNICORN_LOG_LEVEL="warning",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py"],
+        cwd=RAIZ, env=env,
+    )
+    try:
+        url = f"http://127.0.0.1:{puerto}"
+        _esperar(f"{url}/healthz", proc)
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            salida = f.name
+        try:
+            carga.main(["--url", url, "--db", db, "--sin-seed", "--salida", salida, *argumentos_carga])
+            with open(salida, encoding="utf-8") as f:
+                endpoints = json.load(f)["endpoints"]
+        finally:
+            os.unlink(salida)
+        return sum(r["rps"] for r in endpoints.values())
+    finally:
+        proc.terminate()  # SIGTERM: apagado ordenado, como en un deploy
+        proc.wait(timeout=60)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--db", default="sqlite:///./bench.db")
+    parser.add_argument("--duracion", type=float, default=15)
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--solicitudes", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    # El servidor y el cliente deben firmar/verificar el JWT con el mismo secreto.
+    os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+    carga.main(["--db", args.db, "--solicitudes", str(args.solicitudes), "--duracion", "0"])
+
+    argumentos = ["--duracion", str(args.duracion), "--concurrencia", str(args.concurrencia)]
+    resultados = []
+    for n in (int(w) for w in args.workers.split(",")):
+        print(f"\n== {n} worker(s) ==")
+        resultados.append((n, medir(n, args.db, argumentos)))
+
+    print(f"\nCPUs disponibles: {len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()}")
+    print(f"{'workers':>8} {'req/s':>10} {'aceleración':>12}")
+    base = resultados[0][1] or 1
+    for n, rps in resultados:
+        print(f"{n:>8} {rps:>10.1f} {rps / base:>11.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Harness de carga reproducible contra un dataset sintético multi-hospital.
+
+Siembra el dataset (benchmarks.dataset) y ejecuta una mezcla de tráfico
+realista: escaneo de QR → crear ticket, bootstrap del dashboard y métricas.
+Reporta p50/p95/p99 y req/s por endpoint y compara contra un baseline.
+
+En proceso (TestClient, la app usa --db como DATABASE_URL):
+    python -m benchmarks.carga --db sqlite:///./bench.db --duracion 15
+
+Contra un servidor ya levantado (la BD debe estar sembrada con --db):
+    python -m benchmarks.carga --url http://localhost:8000 --db postgresql://... --token <JWT>
+
+Comparar / actualizar el baseline:
+    python -m benchmarks.carga --baseline benchmarks/baseline.json
+    python -m benchmarks.carga --guardar-baseline benchmarks/baseline.json
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+BASELINE_DEFAULT = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# escenario -> peso relativo en la mezcla
+MEZCLA_DEFAULT = "qr=6,dashboard=2,metricas=2"
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def firmar_jwt(sub: str, secret: str, ttl: int = 3600) -> str:
+    """JWT HS256 equivalente al que emite Supabase, para autenticar el dashboard."""
+    header = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    payload = _b64(json.dumps({"sub": sub, "exp": int(time.time()) + ttl}).encode())
+    firma = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+    return f"{header}.{payload}.{_b64(firma)}"
+
+
+def percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    # Nearest-rank
+    k = max(0, math.ceil(p / 100 * len(valores)) - 1)
+    return valores[k]
+
+
+class Recolector:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+
+    def registrar(self, endpoint: str, segundos: float, status: int) -> None:
+        with self._lock:
+            self.latencias[endpoint].append(segundos)
+            if status >= 500 or status in (401, 403, 429):
+                self.errores[endpoint] += 1
+
+    def resumen(self, duracion: float) -> dict:
+        salida = {}
+        for endpoint, valores in sorted(self.latencias.items()):
+            valores = sorted(valores)
+            salida[endpoint] = {
+                "n": len(valores),
+                "errores": self.errores[endpoint],
+                "rps": round(len(valores) / duracion, 2),
+                "p50_ms": round(percentil(valores, 50) * 1000, 2),
+                "p95_ms": round(percentil(valores, 95) * 1000, 2),
+                "p99_ms": round(percentil(valores, 99) * 1000, 2),
+            }
+        return salida
+
+
+class Escenarios:
+    def __init__(self, cliente, dataset, token, recolector, rng):
+        self.cliente = cliente
+        self.dataset = dataset
+        self.headers_auth = {"Authorization": f"Bearer {token}"} if token else {}
+        self.recolector = recolector
+        self.rng = rng
+
+    def _medir(self, nombre, metodo, url, **kwargs):
+        inicio = time.perf_counter()
+        respuesta = self.cliente.request(metodo, url, **kwargs)
+        self.recolector.registrar(nombre, time.perf_counter() - inicio, respuesta.status_code)
+        return respuesta
+
+    def qr(self):
+        indice = self.rng.randrange(len(self.dataset.qrs))
+        self._medir("GET /qr/validate", "GET", "/qr/validate", params={"code": self.dataset.qrs[indice]})
+        body = {
+            "id_cama": self.dataset.id_camas[indice],
+            "id_area": self.rng.choice(self.dataset.id_areas),
+            "tipo": "BENCHMARK",
+            "descripcion": "carga",
+        }
+        self._medir("POST /solicitudes", "POST", "/solicitudes", json=body)
+
+    def dashboard(self):
+        self._medir("GET /admin/bootstrap", "GET", "/admin/bootstrap", headers=self.headers_auth)
+
+    def metricas(self):
+        params = {"fecha_inicio": "2000-01-01", "fecha_fin": "2100-01-01"}
+        self._medir("GET /metricas/solicitudes-por-fecha", "GET", "/metricas/solicitudes-por-fecha", params=params)
+        self._medir("GET /metricas/solicitudes-por-area", "GET", "/metricas/solicitudes-por-area", params=params)
+
+
+def parse_mezcla(texto: str) -> dict:
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        mezcla[nombre.strip()] = float(peso or 1)
+    return mezcla
+
+
+def comparar(resultado: dict, baseline: dict, tolerancia: float) -> list:
+    """Lista de regresiones: p95 sobre (1+tol)·baseline o req/s bajo (1-tol)·baseline."""
+    regresiones = []
+    for endpoint, base in baseline.get("endpoints", {}).items():
+        actual = resultado.get(endpoint)
+        if actual is None:
+            continue
+        if base["p95_ms"] and actual["p95_ms"] > base["p95_ms"] * (1 + tolerancia):
+            regresiones.append(f"{endpoint}: p95 {actual['p95_ms']} ms > baseline {base['p95_ms']} ms")
+        if base["rps"] and actual["rps"] < base["rps"] * (1 - tolerancia):
+            regresiones.append(f"{endpoint}: {actual['rps']} req/s < baseline {base['rps']} req/s")
+    return regresiones
+
+
+def imprimir(resultado: dict) -> None:
+    print(f"{'endpoint':45} {'n':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, r in resultado.items():
+        print(
+            f"{endpoint:45} {r['n']:>7} {r['errores']:>5} {r['rps']:>9} "
+            f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de carga del backend")
+    parser.add_argument("--db", default="sqlite:///./bench.db", help="URL de la BD a sembrar")
+    parser.add_argument("--url", help="Servidor a probar; si se omite se usa la app en proceso")
+    parser.add_argument("--token", help="JWT para /admin/*; por defecto se firma con SUPABASE_JWT_SECRET")
+    parser.add_argument("--sin-seed", action="store_true", help="No volver a sembrar la BD")
+    parser.add_argument("--instituciones", type=int, default=2)
+    parser.add_argument("--edificios", type=int, default=2)
+    parser.add_argument("--pisos", type=int, default=4)
+    parser.add_argument("--habitaciones", type=int, default=10)
+    parser.add_argument("--camas", type=int, default=2)
+    parser.add_argument("--solicitudes", type=int, default=20000)
+    parser.add_argument("--anios", type=int, default=2)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--duracion", type=float, default=15, help="Segundos de carga")
+    parser.add_argument("--concurrencia", type=int, default=4)
+    parser.add_argument("--mezcla", default=MEZCLA_DEFAULT)
+    parser.add_argument("--baseline", default=None, help=f"Comparar contra este archivo (p. ej. {BASELINE_DEFAULT})")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    parser.add_argument("--guardar-baseline", default=None)
+    parser.add_argument("--salida", default=None, help="Guardar resultado en JSON")
+    args = parser.parse_args(argv)
+
+    # La app y db.session leen el entorno al importarse.
+    os.environ["DATABASE_URL"] = args.db
+    os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+    if not args.url:
+        os.environ["RATE_LIMIT_ENABLED"] = "0"
+
+    from sqlalchemy import create_engine
+
+    from benchmarks import dataset as ds
+
+    config = ds.DatasetConfig(
+        instituciones=args.instituciones,
+        edificios=args.edificios,
+        pisos=args.pisos,
+        habitaciones=args.habitaciones,
+        camas=args.camas,
+        solicitudes=args.solicitudes,
+        anios=args.anios,
+        semilla=args.semilla,
+    )
+    engine = create_engine(args.db)
+    inicio_seed = time.perf_counter()
+    if args.sin_seed:
+        dataset = ds.load(engine)
+    else:
+        dataset = ds.seed(engine, config, create_schema=args.db.startswith("sqlite"))
+    engine.dispose()
+    print(f"dataset: {len(dataset.id_camas)} camas, {config.solicitudes} solicitudes "
+          f"({time.perf_counter() - inicio_seed:.1f} s)")
+
+    token = args.token or firmar_jwt(str(dataset.admin_id), os.environ["SUPABASE_JWT_SECRET"])
+
+    if args.url:
+        import httpx
+
+        def nuevo_cliente():
+            return httpx.Client(base_url=args.url, timeout=30)
+    else:
+        from fastapi.testclient import TestClient
+
+        from main import app
+
+        def nuevo_cliente():
+            return TestClient(app, raise_server_exceptions=False)
+
+    mezcla = parse_mezcla(args.mezcla)
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    recolector = Recolector()
+    fin = time.perf_counter() + args.duracion
+
+    def trabajador(n: int):
+        rng = random.Random(args.semilla * 1000 + n)
+        escenarios = Escenarios(nuevo_cliente(), dataset, token, recolector, rng)
+        while time.perf_counter() < fin:
+            getattr(escenarios, rng.choices(nombres, pesos)[0])()
+
+    hilos = [threading.Thread(target=trabajador, args=(n,)) for n in range(args.concurrencia)]
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - inicio
+
+    resultado = recolector.resumen(duracion)
+    imprimir(resultado)
+
+    documento = {
+        "config": {**vars(config), "concurrencia": args.concurrencia, "mezcla": args.mezcla,
+                   "db": args.db.split("://")[0], "modo": "http" if args.url else "en_proceso"},
+        "endpoints": resultado,
+    }
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(documento, f, indent=2, ensure_ascii=False)
+    if args.guardar_baseline:
+        with open(args.guardar_baseline, "w", encoding="utf-8") as f:
+            json.dump(documento, f, indent=2, ensure_ascii=False)
+        print(f"baseline guardado en {args.guardar_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regresiones = comparar(resultado, json.load(f), args.tolerancia)
+        if regresiones:
+            print("\nREGRESIONES:")
+            for r in regresiones:
+                print(f"  - {r}")
+            return 1
+        print("\nsin regresiones respecto al baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Dataset sintético multi-hospital para benchmarks.
+
+Genera la jerarquía institución → edificio → piso → habitación → cama, las
+áreas, un usuario ADMIN para el dashboard y M solicitudes repartidas en los
+últimos años, usando generar_datos. Es determinista para una misma semilla.
+"""
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+import generar_datos
+from generar_datos import ADMIN_ID
+from models.models import Area, Cama, Institucion
+
+
+@dataclass
+class DatasetConfig:
+    instituciones: int = 2
+    edificios: int = 2
+    pisos: int = 4
+    habitaciones: int = 10
+    camas: int = 2
+    solicitudes: int = 20000
+    anios: int = 2
+    semilla: int = 42
+
+
+@dataclass
+class Dataset:
+    qrs: list
+    id_camas: list
+    id_areas: list
+    id_instituciones: list
+    admin_id: uuid.UUID = ADMIN_ID
+
+
+def seed(engine: Engine, config: DatasetConfig, create_schema: bool = False) -> Dataset:
+    generar_datos.generar(
+        engine,
+        generar_datos.ConfigGenerador(**vars(config)),
+        limpiar=True,
+        crear_esquema=create_schema,
+        log=lambda *_: None,
+    )
+    return load(engine)
+
+
+def load(engine: Engine) -> Dataset:
+    """Lee de una BD ya sembrada los datos que necesita el harness."""
+    with engine.connect() as conn:
+        camas = conn.execute(
+            select(Cama.id_cama, Cama.identificador_qr).where(Cama.activo.is_(True)).order_by(Cama.id_cama)
+        ).all()
+        id_areas = conn.execute(select(Area.id_area).order_by(Area.id_area)).scalars().all()
+        id_instituciones = conn.execute(
+            select(Institucion.id_institucion).order_by(Institucion.id_institucion)
+        ).scalars().all()
+    return Dataset(
+        qrs=[qr for _, qr in camas],
+        id_camas=[id_cama for id_cama, _ in camas],
+        id_areas=list(id_areas),
+        id_instituciones=list(id_instituciones),
+    )
@@ -1,16 +1,51 @@
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
 
+from services import telemetry
+
 # Cargar variables desde .env (aunque en Render se inyectan directo)
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+
+
+class WaitTrackingQueuePool(QueuePool):
+    """QueuePool que cuenta los hilos esperando una conexión libre (para /readyz)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _do_get(self):
+        # Sólo cuenta los checkouts que van a bloquearse: con el pool bajo su
+        # capacidad hay una conexión libre o se abre otra sin esperar.
+        if self._max_overflow == -1 or self.checkedout() < self.size() + self._max_overflow:
+            return super()._do_get()
+        with self._waiting_lock:
+            self._waiting += 1
+        try:
+            return super()._do_get()
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+
+
 # Crear motor de conexión
 engine = create_engine(
     DATABASE_URL,
+    poolclass=WaitTrackingQueuePool,
     pool_pre_ping=True,   # evita usar conexiones muertas
     pool_size=3,          # límites modestos para free tier
     max_overflow=0,
@@ -21,3 +56,86 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base para definir modelos (tablas)
 Base = declarative_base()
+
+
+# ---------- Conteo de SQL por petición y log de consultas lentas ----------
+slow_query_logger = logging.getLogger("db.slow_query")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Si el conteo se activó entre el before y el after de esta sentencia no
+    # hay marca de inicio: se omite en vez de romper la consulta del usuario.
+    inicio = getattr(context, "_query_started_at", None)
+    if inicio is None:
+        return
+    elapsed = time.perf_counter() - inicio
+    stats = telemetry.current_query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        _log_slow_query(conn, cursor, statement, parameters, elapsed, executemany)
+
+
+def _log_slow_query(conn, cursor, statement, parameters, elapsed, executemany):
+    plan = None
+    if not executemany and statement.lstrip().upper().startswith("SELECT"):
+        prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+        dbapi_conn = cursor.connection
+        # En Postgres un error dentro de la transacción la deja abortada y la
+        # siguiente sentencia de la petición fallaría: el EXPLAIN va en un
+        # SAVEPOINT. Sin transacción abierta (autocommit) no hace falta.
+        savepoint = conn.dialect.name == "postgresql" and not getattr(dbapi_conn, "autocommit", False)
+        try:
+            # Cursor aparte sobre la misma conexión DBAPI: no pasa de nuevo por los eventos.
+            explain_cursor = dbapi_conn.cursor()
+            try:
+                if savepoint:
+                    explain_cursor.execute("SAVEPOINT slow_query_explain")
+                try:
+                    explain_cursor.execute(prefix + statement, parameters)
+                    plan = "\n".join(" ".join(str(col) for col in row) for row in explain_cursor.fetchall())
+                except Exception:
+                    if savepoint:
+                        explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                    raise
+                finally:
+                    if savepoint:
+                        explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            finally:
+                explain_cursor.close()
+        except Exception as exc:  # noqa: BLE001
+            plan = f"(EXPLAIN no disponible: {exc})"
+    slow_query_logger.warning(
+        "Consulta lenta (%.1f ms): %s\nPlan:\n%s", elapsed * 1000, statement, plan or "-"
+    )
+
+
+def enable_query_timing(bind=None) -> None:
+    """Registra los hooks de conteo; sin ellos el costo por sentencia es cero."""
+    bind = bind or engine
+    if not event.contains(bind, "before_cursor_execute", _before_cursor_execute):
+        event.listen(bind, "before_cursor_execute", _before_cursor_execute)
+        event.listen(bind, "after_cursor_execute", _after_cursor_execute)
+    telemetry.QUERY_TIMING_ENABLED = True
+
+
+def disable_query_timing(bind=None) -> None:
+    bind = bind or engine
+    telemetry.QUERY_TIMING_ENABLED = False
+    if event.contains(bind, "before_cursor_execute", _before_cursor_execute):
+        event.remove(bind, "before_cursor_execute", _before_cursor_execute)
+        event.remove(bind, "after_cursor_execute", _after_cursor_execute)
+
+
+def query_timing_enabled() -> bool:
+    return telemetry.QUERY_TIMING_ENABLED
+
+
+if os.getenv("SQL_TIMING_ENABLED", "0") in ("1", "true", "True"):
+    enable_query_timing()
@@ -0,0 +1,416 @@
+"""
+Generador determinista de datos sintéticos (reemplaza a los seeders fila a fila).
+
+Construye la jerarquía institución → edificio → piso → habitación → cama, las
+áreas, usuarios y millones de solicitudes con distribución horaria, semanal y
+por área realista. En Postgres las filas se envían con COPY; en otros motores
+con executemany por lotes. Misma semilla + misma fecha --hasta = mismos datos.
+
+    python generar_datos.py --solicitudes 2000000 --anios 3 --semilla 7
+    DATABASE_URL=sqlite:///./bench.db python generar_datos.py --crear-esquema --limpiar
+
+Usa la BD de DATABASE_URL (.env), igual que la app.
+"""
+import argparse
+import csv
+import io
+import itertools
+import math
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import Integer, delete, insert, text
+from sqlalchemy.engine import Engine
+
+from db import session as db_session
+from models.models import (
+    Area,
+    Cama,
+    Edificio,
+    EstadoSolicitud,
+    Habitacion,
+    Institucion,
+    Piso,
+    RolUsuario,
+    Servicio,
+    Solicitud,
+    Usuario,
+)
+
+# (nombre, peso en el volumen, mediana de resolución en minutos, tipos)
+AREAS = [
+    ("Mantención", 0.35, 240, [
+        "BAÑO", "CLIMATIZACIÓN", "CAMA (LUCES, TIMBRE, ETC)", "TELEVISOR Y CONTROL REMOTO",
+        "MOBILIARIO DENTRO DE LA HABITACIÓN", "OTRO TIPO DE MANTENCIÓN",
+    ]),
+    ("Nutrición y alimentación a pacientes", 0.20, 45, ["DIETA", "HORARIO DE COMIDA", "COLACIÓN"]),
+    ("Limpieza de habitación, baño o box", 0.25, 60, ["HABITACIÓN", "BAÑO", "BOX"]),
+    ("Asistencia social", 0.12, 720, ["ORIENTACIÓN", "TRÁMITES", "APOYO FAMILIAR"]),
+    ("Acompañamiento espiritual", 0.08, 480, ["VISITA", "SACRAMENTOS"]),
+]
+SERVICIOS = ["Medicina", "Cirugía", "Pediatría", "UCI", "Maternidad", "Oncología"]
+
+# Peso relativo de cada hora del día (0..23): noche baja, peaks de mañana y tarde.
+PERFIL_HORARIO = [
+    0.2, 0.15, 0.1, 0.1, 0.1, 0.2, 0.5, 1.0, 1.6, 2.0, 2.0, 1.8,
+    1.5, 1.4, 1.6, 1.8, 1.7, 1.5, 1.2, 1.0, 0.8, 0.6, 0.4, 0.3,
+]
+FACTOR_FIN_DE_SEMANA = 0.7
+CRECIMIENTO = 0.5  # el volumen diario crece 50% entre el primer y el último día
+CAMAS_INACTIVAS = 0.03
+BATCH_SIZE = 10000
+
+# Usuario fijo para que los benchmarks puedan firmar un JWT de prueba.
+ADMIN_ID = uuid.UUID("00000000-0000-4000-8000-00000000be0c")
+
+
+def _hoy_utc() -> datetime:
+    return datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+@dataclass
+class ConfigGenerador:
+    instituciones: int = 2
+    edificios: int = 2
+    pisos: int = 4
+    habitaciones: int = 10
+    camas: int = 2
+    solicitudes: int = 20000
+    anios: float = 2
+    semilla: int = 42
+    hasta: datetime = field(default_factory=_hoy_utc)
+
+
+# ---------- jerarquía ----------
+def _jerarquia(config: ConfigGenerador, rng: random.Random) -> dict:
+    tablas = {k: [] for k in ("institucion", "edificio", "piso", "habitacion", "cama")}
+    for i in range(1, config.instituciones + 1):
+        tablas["institucion"].append({"id_institucion": i, "nombre_institucion": f"Hospital Sintético {i}"})
+        for e in range(config.edificios):
+            id_edificio = len(tablas["edificio"]) + 1
+            tablas["edificio"].append({
+                "id_edificio": id_edificio,
+                "nombre_edificio": f"Torre {chr(65 + e)}",
+                "id_institucion": i,
+            })
+            for p in range(1, config.pisos + 1):
+                id_piso = len(tablas["piso"]) + 1
+                tablas["piso"].append({"id_piso": id_piso, "numero_piso": p, "id_edificio": id_edificio})
+                for h in range(1, config.habitaciones + 1):
+                    id_habitacion = len(tablas["habitacion"]) + 1
+                    tablas["habitacion"].append({
+                        "id_habitacion": id_habitacion,
+                        "nombre_habitacion": f"{p}{h:02d}",
+                        "id_piso": id_piso,
+                        "id_servicio": rng.randint(1, len(SERVICIOS)),
+                    })
+                    for c in range(config.camas):
+                        tablas["cama"].append({
+                            "id_cama": len(tablas["cama"]) + 1,
+                            "letra_cama": chr(65 + c),
+                            "id_habitacion": id_habitacion,
+                            "identificador_qr": f"H{i}-E{e + 1}-{p}{h:02d}-{chr(65 + c)}",
+                            "activo": rng.random() >= CAMAS_INACTIVAS,
+                        })
+    tablas["servicio"] = [{"id_servicio": n, "nombre_servicio": s} for n, s in enumerate(SERVICIOS, start=1)]
+    tablas["area"] = [{"id_area": n, "nombre_area": a[0]} for n, a in enumerate(AREAS, start=1)]
+    return tablas
+
+
+def _usuarios(config: ConfigGenerador) -> list:
+    ahora = config.hasta
+    usuarios = [{
+        "id": ADMIN_ID, "rol": RolUsuario.ADMIN.value, "correo": "admin@example.com",
+        "nombre": "Admin", "apellido": "Sintético", "telefono": None, "id_area": None,
+        "activo": True, "creado_en": ahora, "actualizado_en": ahora,
+    }]
+    for id_area in range(1, len(AREAS) + 1):
+        usuarios.append({
+            "id": uuid.uuid5(ADMIN_ID, f"jefe-{config.semilla}-{id_area}"),
+            "rol": RolUsuario.JEFE_AREA.value, "correo": f"jefe{id_area}@example.com",
+            "nombre": "Jefe", "apellido": f"Área {id_area}", "telefono": None, "id_area": id_area,
+            "activo": True, "creado_en": ahora, "actualizado_en": ahora,
+        })
+    return usuarios
+
+
+# ---------- solicitudes ----------
+def _solicitudes(config: ConfigGenerador, camas_activas: list, rng: random.Random) -> Iterator[dict]:
+    """Genera solicitudes en orden cronológico, día a día, sin materializarlas todas."""
+    dias = max(1, int(config.anios * 365))
+    inicio = config.hasta - timedelta(days=dias)
+    pesos_dia = []
+    for d in range(dias):
+        fecha = inicio + timedelta(days=d)
+        peso = (1 + CRECIMIENTO * d / max(1, dias - 1))
+        if fecha.weekday() >= 5:
+            peso *= FACTOR_FIN_DE_SEMANA
+        pesos_dia.append(peso)
+    total_peso = sum(pesos_dia)
+
+    horas = list(range(24))
+    ids_area = list(range(1, len(AREAS) + 1))
+    pesos_area = [a[1] for a in AREAS]
+    # lognormal con la mediana de cada área (sigma fija)
+    mu_area = {n: math.log(a[2]) for n, a in enumerate(AREAS, start=1)}
+
+    id_solicitud = 0
+    acumulado = 0.0
+    for d, peso in enumerate(pesos_dia):
+        # Reparto exacto de M entre días arrastrando el redondeo.
+        acumulado += config.solicitudes * peso / total_peso
+        cantidad = int(round(acumulado)) - id_solicitud
+        if cantidad <= 0:
+            continue
+        dia = inicio + timedelta(days=d)
+        segundos = sorted(
+            h * 3600 + rng.randrange(3600) for h in rng.choices(horas, PERFIL_HORARIO, k=cantidad)
+        )
+        areas_dia = rng.choices(ids_area, pesos_area, k=cantidad)
+        for seg, id_area in zip(segundos, areas_dia):
+            id_solicitud += 1
+            creada = dia + timedelta(seconds=seg)
+            resolucion = timedelta(minutes=rng.lognormvariate(mu_area[id_area], 0.8))
+            cierre = creada + resolucion
+            if cierre <= config.hasta and rng.random() < 0.995:
+                estado, actualizada = EstadoSolicitud.CERRADA.value, cierre
+            elif creada + resolucion / 3 <= config.hasta:
+                estado, actualizada, cierre = EstadoSolicitud.EN_PROCESO.value, creada + resolucion / 3, None
+            else:
+                estado, actualizada, cierre = EstadoSolicitud.PENDIENTE.value, creada, None
+            yield {
+                "id_solicitud": id_solicitud,
+                "id_cama": rng.choice(camas_activas),
+                "id_area": id_area,
+                "tipo": rng.choice(AREAS[id_area - 1][3]),
+                "descripcion": f"Solicitud sintética {id_solicitud}",
+                "estado_actual": estado,
+                "fecha_creacion": creada,
+                "fecha_actualizacion": actualizada,
+                "fecha_cierre": cierre,
+                "nombre_solicitante": f"Paciente {id_solicitud}",
+                "correo_solicitante": f"paciente{id_solicitud}@example.com",
+            }
+
+
+# ---------- escritura ----------
+class _CopyStream(io.RawIOBase):
+    """Archivo de sólo lectura que produce CSV bajo demanda para COPY FROM STDIN."""
+
+    def __init__(self, rows: Iterable[dict], columns: list):
+        self._rows = iter(rows)
+        self._columns = columns
+        self._buffer = b""
+        self._text = io.StringIO()
+        self._writer = csv.writer(self._text)
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self, size: int) -> None:
+        while len(self._buffer) < size:
+            chunk = []
+            for row in self._rows:
+                chunk.append([_csv_value(row[c]) for c in self._columns])
+                if len(chunk) >= 1000:
+                    break
+            if not chunk:
+                return
+            self._text.seek(0)
+            self._text.truncate()
+            self._writer.writerows(chunk)
+            self._buffer += self._text.getvalue().encode("utf-8")
+
+    def read(self, size: int = -1) -> bytes:
+        self._fill(size if size and size > 0 else 1 << 20)
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _escribir(conn, model, rows: Iterable[dict]) -> int:
+    table = model.__table__
+    rows = iter(rows)
+    primera = next(rows, None)
+    if primera is None:
+        return 0
+    # Sólo las columnas que trae el generador: el resto toma su DEFAULT en la BD.
+    columns = [c.name for c in table.columns if c.name in primera]
+    rows = itertools.chain([primera], rows)
+    contador = {"n": 0}
+
+    def contar(it):
+        for row in it:
+            contador["n"] += 1
+            yield row
+
+    rows = contar(rows)
+    if conn.dialect.name == "postgresql":
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                _CopyStream(rows, columns),
+            )
+        finally:
+            cursor.close()
+    else:
+        lote = []
+        for row in rows:
+            lote.append(row)
+            if len(lote) >= BATCH_SIZE:
+                conn.execute(insert(model), lote)
+                lote = []
+        if lote:
+            conn.execute(insert(model), lote)
+    return contador["n"]
+
+
+def _alinear_secuencias(conn, models) -> None:
+    for model in models:
+        pk = list(model.__table__.primary_key.columns)[0]
+        if isinstance(pk.type, Integer):
+            name = model.__tablename__
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{name}', '{pk.name}'), "
+                f"COALESCE((SELECT MAX({pk.name}) FROM {name}), 1))"
+            ))
+
+
+HOSTS_LOCALES = {None, "", "localhost", "127.0.0.1", "::1", "db", "postgres"}
+
+
+def es_bd_local(engine: Engine) -> bool:
+    """SQLite o un Postgres en esta máquina / docker-compose."""
+    return engine.url.get_backend_name() == "sqlite" or engine.url.host in HOSTS_LOCALES
+
+
+def generar(
+    engine: Engine,
+    config: ConfigGenerador,
+    limpiar: bool = False,
+    crear_esquema: bool = False,
+    log=print,
+    permitir_bd_remota: bool = False,
+) -> dict:
+    """
+    Genera e inserta el dataset completo en una sola transacción.
+
+    Con `limpiar` antes se borran TODAS las tablas del modelo (usuarios y
+    solicitudes incluidos). Sólo se permite sobre una BD local salvo que se
+    pase `permitir_bd_remota`.
+    """
+    if limpiar and not permitir_bd_remota and not es_bd_local(engine):
+        raise ValueError(
+            f"Se negó a limpiar la BD remota {engine.url.render_as_string(hide_password=True)}; "
+            "usar --permitir-bd-remota si de verdad se quiere borrar."
+        )
+    if crear_esquema:
+        db_session.Base.metadata.create_all(engine)
+
+    rng = random.Random(config.semilla)
+    tablas = _jerarquia(config, rng)
+    camas_activas = [c["id_cama"] for c in tablas["cama"] if c["activo"]]
+    orden = [
+        (Institucion, tablas["institucion"]),
+        (Edificio, tablas["edificio"]),
+        (Piso, tablas["piso"]),
+        (Servicio, tablas["servicio"]),
+        (Habitacion, tablas["habitacion"]),
+        (Cama, tablas["cama"]),
+        (Area, tablas["area"]),
+        (Usuario, _usuarios(config)),
+        (Solicitud, _solicitudes(config, camas_activas, rng)),
+    ]
+
+    resumen = {}
+    inicio = time.perf_counter()
+    with engine.begin() as conn:
+        if limpiar:
+            # Todas las tablas del modelo, hijas primero: historial, rollups y
+            # outbox también referencian solicitud/área.
+            for tabla in reversed(db_session.Base.metadata.sorted_tables):
+                conn.execute(delete(tabla))
+        for model, rows in orden:
+            t0 = time.perf_counter()
+            resumen[model.__tablename__] = _escribir(conn, model, rows)
+            log(f"  {model.__tablename__:12} {resumen[model.__tablename__]:>10} filas  "
+                f"{time.perf_counter() - t0:6.2f} s")
+        if conn.dialect.name == "postgresql":
+            _alinear_secuencias(conn, [m for m, _ in orden])
+    resumen["segundos"] = round(time.perf_counter() - inicio, 2)
+    return resumen
+
+
+def sembrar_areas(engine: Engine) -> None:
+    """Inserta sólo las áreas base que falten."""
+    with engine.begin() as conn:
+        existentes = set(conn.execute(text("SELECT nombre_area FROM area")).scalars())
+        nuevas = [{"nombre_area": a[0]} for a in AREAS if a[0] not in existentes]
+        if nuevas:
+            conn.execute(insert(Area), nuevas)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos")
+    parser.add_argument("--instituciones", type=int, default=2)
+    parser.add_argument("--edificios", type=int, default=2)
+    parser.add_argument("--pisos", type=int, default=4)
+    parser.add_argument("--habitaciones", type=int, default=10)
+    parser.add_argument("--camas", type=int, default=2)
+    parser.add_argument("--solicitudes", type=int, default=20000)
+    parser.add_argument("--anios", type=float, default=2)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--hasta", help="Fecha final YYYY-MM-DD (por defecto hoy, UTC)")
+    parser.add_argument("--crear-esquema", action="store_true", help="create_all antes de insertar (SQLite)")
+    parser.add_argument("--limpiar", action="store_true", help="Borrar TODOS los datos existentes antes de insertar")
+    parser.add_argument(
+        "--permitir-bd-remota", action="store_true", help="Permitir --limpiar sobre una BD que no es local"
+    )
+    args = parser.parse_args(argv)
+
+    hasta: Optional[datetime] = None
+    if args.hasta:
+        hasta = datetime.strptime(args.hasta, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    config = ConfigGenerador(
+        instituciones=args.instituciones,
+        edificios=args.edificios,
+        pisos=args.pisos,
+        habitaciones=args.habitaciones,
+        camas=args.camas,
+        solicitudes=args.solicitudes,
+        anios=args.anios,
+        semilla=args.semilla,
+        **({"hasta": hasta} if hasta else {}),
+    )
+    try:
+        resumen = generar(
+            db_session.engine,
+            config,
+            limpiar=args.limpiar,
+            crear_esquema=args.crear_esquema,
+            permitir_bd_remota=args.permitir_bd_remota,
+        )
+    except ValueError as exc:
+        print(f"❌ {exc}", file=sys.stderr)
+        return 2
+    print(f"✅ Datos generados en {resumen['segundos']} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
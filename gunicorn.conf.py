@@ -0,0 +1,74 @@
+"""
+Configuración de producción: gunicorn como supervisor de workers uvicorn.
+
+    gunicorn main:app -c gunicorn.conf.py
+
+Todo se puede ajustar por entorno (WEB_CONCURRENCY, PORT, GUNICORN_*).
+"""
+import logging
+import os
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def _cpus() -> int:
+    # sched_getaffinity respeta los cgroups/cpusets del contenedor; cpu_count() no.
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _workers() -> int:
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    # Cada worker abre hasta pool_size (3) conexiones más la del lock del
+    # scheduler: el tope evita agotar las conexiones de Postgres en máquinas
+    # con muchas CPU y la RAM en los planes chicos de Render.
+    return max(1, min(2 * _cpus() + 1, int(os.getenv("GUNICORN_MAX_WORKERS", "4"))))
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = _workers()
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# La app se importa una vez en el master y los workers la heredan por fork
+# (copy-on-write): arrancan más rápido y comparten la memoria de los módulos.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") not in ("0", "false", "False")
+
+# Reciclar cada ~1000 requests acota cualquier fuga de memoria; el jitter
+# evita que todos los workers se reinicien a la vez.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Al recibir SIGTERM (deploy o reciclaje) cada worker deja de aceptar
+# conexiones y termina las requests en curso; pasado graceful_timeout se mata.
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# X-Forwarded-* lo resuelve la app (ProxyHeadersMiddleware con
+# TRUSTED_PROXY_IPS, que admite rangos CIDR; gunicorn sólo acepta IPs
+# sueltas). Aquí no se confía en ningún proxy para no reescribir el cliente
+# dos veces.
+forwarded_allow_ips = "127.0.0.1"
+
+# Heartbeat de los workers en memoria y no en el disco del contenedor.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    # Con preload el engine se creó en el master. dispose(close=False) deja al
+    # hijo con un pool vacío sin cerrar los sockets que pudiera usar el padre:
+    # ninguna conexión de Postgres queda compartida entre procesos.
+    from db.session import engine
+
+    engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    logger.info("Worker %s terminado", worker.pid)
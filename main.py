@@ -1,16 +1,69 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from routers import solicitudes
 from routers import qr 
 from routers import admin
 from fastapi.middleware.cors import CORSMiddleware
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 import os
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from db.session import SessionLocal, engine
+from services import cache, escalamiento, health, historial, outbox, rate_limit, supabase_admin
+from services.scheduler import LeaderLock, Scheduler
+from services.telemetry import REGISTRY, TelemetryMiddleware
 
 load_dotenv()
 
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") not in ("0", "false", "False")
+# Clave del advisory lock de Postgres que elige al worker líder del scheduler.
+SCHEDULER_LOCK_KEY = 0x5C4ED001
+
+
+def _crear_scheduler() -> Scheduler:
+    scheduler = Scheduler(LeaderLock(engine, SCHEDULER_LOCK_KEY))
+    scheduler.add(
+        "escalamiento_sla",
+        escalamiento.INTERVALO_SECONDS,
+        lambda: escalamiento.escalar_vencidas(SessionLocal),
+    )
+    scheduler.add(
+        "rollup_historial",
+        historial.INTERVALO_SECONDS,
+        lambda: historial.acumular_rollups(SessionLocal),
+    )
+    sinks = outbox.sinks_configurados()
+    scheduler.add(
+        "outbox_relay",
+        outbox.INTERVALO_SECONDS,
+        lambda: outbox.drenar(SessionLocal, sinks),
+    )
+    return scheduler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scheduler = _crear_scheduler() if SCHEDULER_ENABLED else None
+    if scheduler:
+        scheduler.start()
+    # Un oyente por worker: las cachés locales se invalidan en todos a la vez.
+    cache.iniciar_invalidaciones(engine)
+    try:
+        yield
+    finally:
+        health.marcar_apagando()
+        if scheduler:
+            scheduler.stop()
+        cache.detener_invalidaciones()
+        supabase_admin.cerrar()
+
+
 app = FastAPI(
     title="UC Christus API - Gestión de Solicitudes",
     version="1.0.0",
+    lifespan=lifespan,
+    # orjson codifica fechas, UUID y enums sin el paso extra de json.dumps.
+    default_response_class=ORJSONResponse,
 )
 
 ALLOWED_ORIGINS = [
@@ -35,6 +88,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Se agrega al final para quedar por fuera de CORS y medir la petición completa.
+app.add_middleware(TelemetryMiddleware)
+# La más externa: todo lo demás (límites de tasa, logs) ve la IP real del
+# cliente, tomada sólo de los saltos que agregaron proxies confiables.
+app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=rate_limit.TRUSTED_PROXIES)
 
 # Incluir routers
 app.include_router(solicitudes.router)
@@ -46,3 +104,26 @@ app.include_router(chat_router)
 @app.get("/")
 def correr_back():
     return {"mensaje": "Hola, mundo!. Cambio el back"}
+
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    # Liveness: sin I/O. Si el event loop responde, el proceso está vivo.
+    return {"estado": "ok"}
+
+
+@app.get("/readyz", include_in_schema=False)
+def readyz():
+    # Readiness de este worker: BD, saturación del pool y migraciones.
+    resultado = health.readiness(engine)
+    return ORJSONResponse(resultado, status_code=200 if resultado["listo"] else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: str | None = Header(default=None)):
+    # Si METRICS_TOKEN está definido, el scraper debe enviarlo como Bearer.
+    token = os.getenv("METRICS_TOKEN")
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    health.estado_pool(engine)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,16 +1,23 @@
 import enum
+from datetime import datetime, timezone
+
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
+    Date,
     DateTime,
     Enum as SAEnum,
+    Float,
     ForeignKey,
+    Index,
     Integer,
+    JSON,
     String,
     UniqueConstraint,
 )
-from sqlalchemy import text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import false, func, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 
 from db.session import Base
@@ -27,6 +34,17 @@ class EstadoSolicitud(str, enum.Enum):
     CERRADA = "cerrada"
 
 
+def _estado_solicitud_enum() -> SAEnum:
+    # El tipo estado_solicitud lo crean las migraciones; aquí sólo se referencia.
+    return SAEnum(
+        EstadoSolicitud,
+        name="estado_solicitud",
+        create_type=False,
+        validate_strings=True,
+        values_callable=lambda enum_cls: [e.value for e in enum_cls],
+    )
+
+
 class Institucion(Base):
     __tablename__ = "institucion"
 
@@ -78,6 +96,8 @@ class Area(Base):
 
     id_area = Column(Integer, primary_key=True, index=True)
     nombre_area = Column(String(120), nullable=False, unique=True)
+    # Plazo de atención en minutos; NULL usa SLA_MINUTOS_DEFAULT.
+    sla_minutos = Column(Integer)
 
     solicitudes = relationship("Solicitud", back_populates="area")
     usuarios = relationship("Usuario", back_populates="area")
@@ -135,35 +155,165 @@ class Usuario(Base):
     telefono = Column(String(30))
     id_area = Column(Integer, ForeignKey("area.id_area"), nullable=True)
     activo = Column(Boolean, nullable=False, default=True)
-    creado_en = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
-    actualizado_en = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
+    creado_en = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    actualizado_en = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
     area = relationship("Area", back_populates="usuarios")
 
 
+def _inicio_sla_por_defecto(context):
+    return context.get_current_parameters().get("fecha_creacion") or datetime.now(timezone.utc)
+
+
 class Solicitud(Base):
     __tablename__ = "solicitud"
+    __table_args__ = (
+        Index(
+            "ix_solicitud_abiertas_cama_area_tipo",
+            "id_cama",
+            "id_area",
+            "tipo",
+            "fecha_creacion",
+            postgresql_where=text("estado_actual <> 'cerrada'"),
+        ),
+        Index(
+            "ix_solicitud_cola_area",
+            "id_area",
+            "fecha_creacion",
+            postgresql_where=text("estado_actual <> 'cerrada'"),
+        ),
+        Index(
+            "ix_solicitud_por_escalar",
+            "id_area",
+            "inicio_sla",
+            postgresql_where=text("estado_actual <> 'cerrada' AND NOT escalada"),
+        ),
+    )
 
     id_solicitud = Column(Integer, primary_key=True, index=True)
     id_cama = Column(Integer, ForeignKey("cama.id_cama"), nullable=False)
     id_area = Column(Integer, ForeignKey("area.id_area"), nullable=False)
     tipo = Column(String(120), nullable=False)
     descripcion = Column(String)
-    estado_actual = Column(
-        SAEnum(
-            EstadoSolicitud,
-            name="estado_solicitud",
-            create_type=False,
-            validate_strings=True,
-            values_callable=lambda enum_cls: [e.value for e in enum_cls],
-        ),
-        nullable=False,
-    )
-    fecha_creacion = Column(DateTime(timezone=True), nullable=False, server_default=text("NOW()"))
+    estado_actual = Column(_estado_solicitud_enum(), nullable=False)
+    fecha_creacion = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     fecha_actualizacion = Column(DateTime(timezone=True))
     fecha_cierre = Column(DateTime(timezone=True))
+    # Primera salida de "pendiente"; no se borra aunque la solicitud se reabra.
+    fecha_primera_respuesta = Column(DateTime(timezone=True))
     nombre_solicitante = Column(String(120))
     correo_solicitante = Column(String(160))
+    # Marcada por el escalamiento SLA en segundo plano (services.escalamiento).
+    escalada = Column(Boolean, nullable=False, default=False, server_default=false())
+    fecha_escalamiento = Column(DateTime(timezone=True))
+    # Desde cuándo corre el SLA: la creación, o la última reapertura (al
+    # reabrirse también se limpia `escalada`; ver services.historial).
+    inicio_sla = Column(
+        DateTime(timezone=True), nullable=False, default=_inicio_sla_por_defecto, server_default=func.now()
+    )
+    # Control de concurrencia optimista: el ORM agrega `WHERE version = :leida`
+    # a cada UPDATE y la incrementa; el ETag de la solicitud se deriva de ella.
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+    # En Postgres existe además la columna generada `busqueda` (tsvector) con
+    # índices GIN/trigram (migración c4d5e6f7a8b9). No se mapea para que el
+    # esquema siga creándose en SQLite; la consulta la referencia por nombre.
 
     cama = relationship("Cama", back_populates="solicitudes")
     area = relationship("Area", back_populates="solicitudes")
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class SolicitudEvento(Base):
+    """
+    Historial append-only de cambios de estado (y de agrupaciones de
+    duplicados). Se escribe en la misma transacción que el cambio
+    (services.historial) y nunca se actualiza.
+    """
+    __tablename__ = "solicitud_evento"
+    __table_args__ = (
+        Index("ix_solicitud_evento_solicitud_fecha", "id_solicitud", "fecha"),
+    )
+
+    id_evento = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    id_solicitud = Column(
+        Integer, ForeignKey("solicitud.id_solicitud", ondelete="CASCADE"), nullable=False
+    )
+    id_area = Column(Integer, ForeignKey("area.id_area"), nullable=False)
+    # NULL en el evento de creación.
+    estado_anterior = Column(_estado_solicitud_enum())
+    estado_nuevo = Column(_estado_solicitud_enum(), nullable=False)
+    # "estado" o "agrupacion" (otra solicitud se fusionó sin cambiar el estado).
+    tipo = Column(String(20), nullable=False, default="estado", server_default=text("'estado'"))
+    fecha = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Tiempo que la solicitud pasó en estado_anterior.
+    segundos_en_estado = Column(Float)
+    # Sólo en la primera salida de "pendiente": segundos desde la creación.
+    segundos_primera_respuesta = Column(Float)
+
+    solicitud = relationship("Solicitud")
+
+
+class RollupEstadoDiario(Base):
+    """Salidas de cada estado y tiempo acumulado en él, por día (UTC) y área."""
+    __tablename__ = "rollup_estado_diario"
+
+    dia = Column(Date, primary_key=True)
+    id_area = Column(Integer, ForeignKey("area.id_area"), primary_key=True)
+    estado = Column(_estado_solicitud_enum(), primary_key=True)
+    salidas = Column(Integer, nullable=False, default=0)
+    segundos = Column(Float, nullable=False, default=0)
+
+
+class RollupPrimeraRespuestaDiaria(Base):
+    """Primeras respuestas y su demora acumulada, por día (UTC) y área."""
+    __tablename__ = "rollup_primera_respuesta_diaria"
+
+    dia = Column(Date, primary_key=True)
+    id_area = Column(Integer, ForeignKey("area.id_area"), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+    segundos = Column(Float, nullable=False, default=0)
+
+
+class RollupMarca(Base):
+    """Último id_evento ya acumulado en los rollups."""
+    __tablename__ = "rollup_marca"
+
+    nombre = Column(String(60), primary_key=True)
+    ultimo_id = Column(BigInteger, nullable=False, default=0)
+
+
+class EventoOutbox(Base):
+    """
+    Outbox transaccional: los eventos de dominio se insertan en la misma
+    transacción que el cambio y services.outbox los entrega a los sinks.
+    """
+    __tablename__ = "evento_outbox"
+    __table_args__ = (
+        Index("ix_evento_outbox_pendientes", "id_evento", postgresql_where=text("fecha_envio IS NULL")),
+    )
+
+    id_evento = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    tipo = Column(String(80), nullable=False)
+    payload = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+    fecha_creacion = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    fecha_envio = Column(DateTime(timezone=True))
+    intentos = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    ultimo_error = Column(String(500))
+    # Lote en entrega fuera de la transacción; vencido, otro relay lo retoma.
+    reclamado_hasta = Column(DateTime(timezone=True))
+
+
+class IdempotenciaSolicitud(Base):
+    """
+    Respuesta guardada por Idempotency-Key de POST /solicitudes. La PK hace
+    que sólo un worker pueda reservar cada clave.
+    """
+    __tablename__ = "idempotencia_solicitud"
+
+    clave = Column(String(255), primary_key=True)
+    huella = Column(String(64), nullable=False)
+    respuesta = Column(JSON().with_variant(JSONB(), "postgresql"))
+    # Mientras está en vuelo vence pronto (si el worker muere, otro la retoma);
+    # al completarse pasa a vencer tras el TTL de idempotencia.
+    expira_en = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -1,24 +1,40 @@
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
+import os
 import secrets
 import string
 import uuid
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from auth.dependencies import require_admin, require_authenticated_user
+from db import session as db_session
 from db.session import SessionLocal
 from models.models import Area, Cama, Edificio, Habitacion, Institucion, Piso, RolUsuario, Servicio, Solicitud, Usuario, EstadoSolicitud
-from pydantic import BaseModel, EmailStr
-from routers.solicitudes import serialize_area, serialize_cama, serialize_edificio, serialize_habitacion, serialize_institucion, serialize_piso, serialize_servicio, serialize_solicitud
+from pydantic import BaseModel, EmailStr, Field
+from routers.solicitudes import (
+    SOLICITUD_COLUMNAS,
+    select_solicitudes,
+    serialize_cama,
+    serialize_habitacion,
+    serialize_solicitud_rows,
+)
+from services import catalogo, cola
 from services.supabase_admin import SupabaseAdminError, create_auth_user, delete_auth_user, update_auth_user
+from utils.campos import parse_fields
 
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# Llamadas simultáneas a Supabase en el alta masiva de usuarios.
+SUPABASE_CONCURRENCIA = int(os.getenv("ADMIN_BULK_SUPABASE_CONCURRENCIA", "4"))
+LIMITE_ALTA_MASIVA = 200
+
 
 def get_db():
     db = SessionLocal()
@@ -47,48 +63,77 @@ def admin_me(usuario: Usuario = Depends(require_authenticated_user)):
     return {"usuario": serialize_usuario(usuario)}
 
 
+@router.put("/diagnostico/sql", summary="Activar/desactivar conteo de SQL por petición")
+def admin_toggle_sql_timing(
+    activo: bool = Query(...),
+    _: Usuario = Depends(require_admin),
+):
+    if activo:
+        db_session.enable_query_timing()
+    else:
+        db_session.disable_query_timing()
+    # Cada worker de gunicorn tiene su propio engine: el cambio sólo aplica al
+    # proceso que atendió este PUT. Para todos, SQL_TIMING_ENABLED=1 al arrancar.
+    return {
+        "activo": db_session.query_timing_enabled(),
+        "umbral_consulta_lenta_ms": db_session.SLOW_QUERY_MS,
+        "alcance": "worker",
+        "pid": os.getpid(),
+        "nota": "Sólo afecta a este worker; para activarlo en todos usar SQL_TIMING_ENABLED=1 y reiniciar.",
+    }
+
+
 @router.get("/bootstrap", summary="Datos base para el dashboard admin")
 def admin_bootstrap(
+    fields: Optional[str] = Query(
+        default=None,
+        description="Campos de cada solicitud, separados por coma (p. ej. id,estado,id_area,fecha_creacion)",
+    ),
     usuario: Usuario = Depends(require_authenticated_user),
     db: Session = Depends(get_db),
 ):
-    instituciones = db.query(Institucion).order_by(Institucion.id_institucion).all()
-    edificios = db.query(Edificio).order_by(Edificio.id_edificio).all()
-    pisos = db.query(Piso).order_by(Piso.id_piso).all()
-    servicios = db.query(Servicio).order_by(Servicio.id_servicio).all()
-    areas = db.query(Area).order_by(Area.id_area).all()
+    campos = parse_fields(fields, SOLICITUD_COLUMNAS)
+    cat = catalogo.obtener(db)
 
-    habitaciones = (
-        db.query(Habitacion)
-        .join(Piso)
-        .join(Edificio)
-        .order_by(Habitacion.id_habitacion)
-        .all()
-    )
-    camas = db.query(Cama).order_by(Cama.id_cama).all()
-
-    solicitudes_query = db.query(Solicitud).order_by(Solicitud.fecha_creacion.desc())
+    solicitudes_query = select_solicitudes(campos).order_by(Solicitud.fecha_creacion.desc())
     if usuario.rol == RolUsuario.JEFE_AREA:
         if usuario.id_area is None:
             raise HTTPException(
                 status_code=400,
                 detail="El usuario jefe de área no tiene un área asignada",
             )
-        solicitudes_query = solicitudes_query.filter(Solicitud.id_area == usuario.id_area)
+        solicitudes_query = solicitudes_query.where(Solicitud.id_area == usuario.id_area)
 
-    solicitudes = solicitudes_query.all()
+    solicitudes = db.execute(solicitudes_query)
 
-    return {
+    return ORJSONResponse({
         "usuario": serialize_usuario(usuario),
-        "hospitales": [serialize_institucion(inst) for inst in instituciones],
-        "edificios": [serialize_edificio(ed) for ed in edificios],
-        "pisos": [serialize_piso(p) for p in pisos],
-        "servicios": [serialize_servicio(s) for s in servicios],
-        "habitaciones": [serialize_habitacion(h) for h in habitaciones],
-        "camas": [serialize_cama(c) for c in camas],
-        "areas": [serialize_area(a) for a in areas],
-        "solicitudes": [serialize_solicitud(s) for s in solicitudes],
-    }
+        "hospitales": cat.hospitales,
+        "edificios": cat.edificios,
+        "pisos": cat.pisos,
+        "servicios": cat.servicios,
+        "habitaciones": cat.habitaciones,
+        "camas": cat.camas,
+        "areas": cat.areas,
+        "solicitudes": serialize_solicitud_rows(solicitudes),
+    })
+
+
+@router.get("/cola", summary="Cola de solicitudes abiertas con espera y SLA")
+def admin_cola(
+    id_area: Optional[int] = Query(default=None, description="Sólo ADMIN: filtra por área (por defecto todas)"),
+    limite: int = Query(default=cola.LIMITE_DEFAULT, ge=1, le=1000),
+    usuario: Usuario = Depends(require_authenticated_user),
+    db: Session = Depends(get_db),
+):
+    if usuario.rol == RolUsuario.JEFE_AREA:
+        if usuario.id_area is None:
+            raise HTTPException(
+                status_code=400,
+                detail="El usuario jefe de área no tiene un área asignada",
+            )
+        id_area = usuario.id_area
+    return ORJSONResponse(cola.cola(db, id_area, limite))
 
 
 @router.get("/metricas", summary="Métricas para dashboard admin")
@@ -242,6 +287,10 @@ class UsuarioCreateRequest(BaseModel):
     id_area: int
 
 
+class UsuariosBulkCreateRequest(BaseModel):
+    usuarios: List[UsuarioCreateRequest] = Field(..., min_length=1, max_length=LIMITE_ALTA_MASIVA)
+
+
 class ProfileUpdateRequest(BaseModel):
     nombre: Optional[str] = None
     apellido: Optional[str] = None
@@ -338,6 +387,120 @@ def admin_create_user(
     }
 
 
+def _crear_en_supabase(email: str) -> dict:
+    """Crea el usuario en Supabase; nunca lanza: el error va en el resultado."""
+    temp_password = _generate_temp_password(email)
+    try:
+        respuesta = create_auth_user(email, temp_password)
+    except SupabaseAdminError as exc:
+        return {"email": email, "error": str(exc)}
+    user_id = (respuesta.get("user") or respuesta).get("id")
+    try:
+        user_id = str(uuid.UUID(str(user_id)))
+    except ValueError:
+        # Ya existe en Supabase pero no se podrá guardar: se intenta borrar.
+        if user_id:
+            try:
+                delete_auth_user(str(user_id))
+            except SupabaseAdminError:
+                pass
+        return {"email": email, "error": "Supabase no devolvió un ID de usuario válido"}
+    return {"email": email, "id": user_id, "temp_password": temp_password}
+
+
+def _revertir_en_supabase(user_ids: List[str]) -> None:
+    def borrar(user_id):
+        try:
+            delete_auth_user(user_id)
+        except SupabaseAdminError:
+            pass
+
+    with ThreadPoolExecutor(max_workers=SUPABASE_CONCURRENCIA) as pool:
+        list(pool.map(borrar, user_ids))
+
+
+@router.post(
+    "/users/bulk",
+    summary="Crear varios jefes de área",
+    status_code=status.HTTP_201_CREATED,
+    responses={207: {"description": "Algunos usuarios no se crearon; el detalle va en `errores`"}},
+)
+def admin_create_users_bulk(
+    payload: UsuariosBulkCreateRequest,
+    response: Response,
+    admin: Usuario = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    del admin  # unused, pero asegura que es admin
+
+    # Una sola consulta por tabla para validar todo el lote.
+    pedidos = payload.usuarios
+    areas = {
+        a.id_area: a
+        for a in db.query(Area).filter(Area.id_area.in_({p.id_area for p in pedidos}))
+    }
+    existentes = {
+        correo
+        for (correo,) in db.query(Usuario.correo).filter(Usuario.correo.in_({p.email for p in pedidos}))
+    }
+
+    errores = []
+    validos = []
+    vistos = set()
+    for p in pedidos:
+        if p.id_area not in areas:
+            errores.append({"email": p.email, "error": "Área no encontrada"})
+        elif p.email in existentes:
+            errores.append({"email": p.email, "error": "Ya existe un usuario con ese correo"})
+        elif p.email in vistos:
+            errores.append({"email": p.email, "error": "Correo repetido en la solicitud"})
+        else:
+            vistos.add(p.email)
+            validos.append(p)
+
+    # Liberar la conexión mientras se espera a Supabase (un round-trip por
+    # usuario, con reintentos): con pool_size=3 unas pocas altas masivas
+    # dejarían al worker sin conexiones. add_all/commit abren otra al final.
+    db.close()
+
+    with ThreadPoolExecutor(max_workers=SUPABASE_CONCURRENCIA) as pool:
+        resultados = list(pool.map(_crear_en_supabase, [p.email for p in validos]))
+
+    creados = []
+    nuevos = []
+    for p, r in zip(validos, resultados):
+        if "error" in r:
+            errores.append(r)
+            continue
+        usuario = Usuario(
+            id=uuid.UUID(r["id"]),
+            rol=RolUsuario.JEFE_AREA,
+            correo=p.email,
+            nombre="Pendiente",
+            apellido="Pendiente",
+            telefono=None,
+            id_area=p.id_area,
+            area=areas[p.id_area],
+            activo=True,
+        )
+        nuevos.append(usuario)
+        creados.append({"usuario": serialize_usuario(usuario), "temp_password": r["temp_password"]})
+
+    if nuevos:
+        try:
+            db.add_all(nuevos)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Igual que el alta individual: lo creado en Supabase se revierte.
+            _revertir_en_supabase([str(u.id) for u in nuevos])
+            raise
+
+    if errores:
+        response.status_code = status.HTTP_207_MULTI_STATUS
+    return {"creados": creados, "errores": errores}
+
+
 @router.put("/me", summary="Actualizar perfil propio")
 def admin_update_profile(
     payload: ProfileUpdateRequest,
@@ -502,6 +665,7 @@ def admin_crear_habitacion(
     db.add(hab)
     db.commit()
     db.refresh(hab)
+    catalogo.invalidar()
     return {"habitacion": serialize_habitacion(hab)}
 
 
@@ -543,6 +707,7 @@ def admin_crear_cama(
     db.add(cama)
     db.commit()
     db.refresh(cama)
+    catalogo.invalidar()
     return {"cama": serialize_cama(cama)}
 
 
@@ -566,5 +731,6 @@ def admin_patch_cama(
         db.add(cama)
         db.commit()
         db.refresh(cama)
+        catalogo.invalidar()
 
     return {"cama": serialize_cama(cama)}
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from openai import OpenAI
 import os
 import time
 
+from services import rate_limit
 
 router = APIRouter()
 
@@ -12,14 +12,24 @@ class ChatRequest(BaseModel):
     message: str
 
 
-@router.post("/chat")
+_chat_limits = [Depends(rate_limit.chat_por_ip), Depends(rate_limit.chat_concurrencia)]
+
+
+def _openai(api_key: str):
+    # El SDK de OpenAI tarda ~0,5 s en importarse; sólo lo paga el worker que atiende chat.
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key)
+
+
+@router.post("/chat", dependencies=_chat_limits)
 async def chat(body: ChatRequest):
     api_key = os.getenv("OPENAI_API_KEY")
     assistant_id = os.getenv("OPENAI_ASSISTANT_ID")
     if not api_key or not assistant_id:
         raise HTTPException(status_code=500, detail="Faltan OPENAI_API_KEY u OPENAI_ASSISTANT_ID")
 
-    client = OpenAI(api_key=api_key)
+    client = _openai(api_key)
     thread = client.beta.threads.create()
     client.beta.threads.messages.create(thread_id=thread.id, role="user", content=body.message)
     run = client.beta.threads.runs.create(thread_id=thread.id, assistant_id=assistant_id)
@@ -51,14 +61,14 @@ class ChatCompletionsRequest(BaseModel):
     message: str
 
 
-@router.post("/chat-completions")
+@router.post("/chat-completions", dependencies=_chat_limits)
 async def chat_completions(body: ChatCompletionsRequest):
     api_key = os.getenv("OPENAI_API_KEY")
     model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     if not api_key:
         raise HTTPException(status_code=500, detail="Falta OPENAI_API_KEY")
 
-    client = OpenAI(api_key=api_key)
+    client = _openai(api_key)
     try:
         completion = client.chat.completions.create(
             model=model,
@@ -2,11 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlalchemy.orm import Session
 from db.session import SessionLocal
 from models.models import Cama, Habitacion, Piso, Edificio, Institucion
+from services import rate_limit
 from pydantic import BaseModel
 from typing import Optional, List
 from fastapi.responses import RedirectResponse, StreamingResponse
 import os
-import qrcode
 import io
 import zipfile
 import time
@@ -40,14 +40,22 @@ def _qr_png_bytes(payload: str) -> bytes:
     """
     Genera una imagen PNG (bytes) con el contenido 'payload'.
     """
+    import qrcode  # arrastra PIL; sólo hace falta al generar imágenes
+
     img = qrcode.make(payload)  # simple y robusto
     buf = io.BytesIO()
     img.save(buf, format="PNG")
     return buf.getvalue()
 
 # ================ Validate ================
-@router.get("/qr/validate", response_model=QRContext, summary="Valida un QR y entrega contexto")
+@router.get(
+    "/qr/validate",
+    response_model=QRContext,
+    summary="Valida un QR y entrega contexto",
+    dependencies=[Depends(rate_limit.qr_por_ip)],
+)
 def validate_qr(code: str, db: Session = Depends(get_db)):
+    rate_limit.qr_por_codigo.check(f"qr:{code}")
     cama = db.query(Cama).filter(Cama.identificador_qr == code).first()
     if not cama:
         return QRContext(ok=False, code=code, reason="not_found")
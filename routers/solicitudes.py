@@ -1,11 +1,15 @@
-from datetime import datetime, timezone
-from typing import Optional
-
-from fastapi import APIRouter, Depends, HTTPException, Query
-from pydantic import BaseModel
-from sqlalchemy import func
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import func, literal_column, or_, select, text
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
+from auth.dependencies import require_authenticated_user
 from db.session import SessionLocal
 from models.models import (
     Area,
@@ -15,12 +19,40 @@ from models.models import (
     Habitacion,
     Institucion,
     Piso,
+    RolUsuario,
+    RollupEstadoDiario,
+    RollupPrimeraRespuestaDiaria,
     Servicio,
     Solicitud,
+    Usuario,
 )
+from services import catalogo, historial, idempotency, rate_limit
+from utils import etag
+from utils.campos import parse_fields
 
 router = APIRouter()
 
+# Ventana (minutos) en la que una solicitud abierta con la misma cama, área y
+# tipo absorbe a las nuevas en lugar de crear otro ticket. 0 lo desactiva.
+COALESCE_WINDOW_MINUTES = int(os.getenv("SOLICITUD_COALESCE_MINUTES", "30"))
+
+
+class SolicitudOut(BaseModel):
+    """Forma de una solicitud en los listados (sólo para la documentación: no se re-valida)."""
+    id: Optional[int] = None
+    id_cama: Optional[int] = None
+    id_area: Optional[int] = None
+    tipo: Optional[str] = None
+    descripcion: Optional[str] = None
+    estado: Optional[EstadoSolicitud] = None
+    fecha_creacion: Optional[datetime] = None
+    fecha_actualizacion: Optional[datetime] = None
+    fecha_cierre: Optional[datetime] = None
+    nombre_solicitante: Optional[str] = None
+    correo_solicitante: Optional[str] = None
+    identificador_qr: Optional[str] = None
+    version: Optional[int] = None
+
 
 class SolicitudIn(BaseModel):
     id_cama: int
@@ -108,9 +140,90 @@ def serialize_solicitud(s: Solicitud):
         "nombre_solicitante": s.nombre_solicitante,
         "correo_solicitante": s.correo_solicitante,
         "identificador_qr": cama.identificador_qr if cama else None,
+        "version": s.version,
     }
 
 
+def etag_solicitud(s: Solicitud) -> str:
+    return f'"sol-{s.id_solicitud}-v{s.version}"'
+
+
+def _conflicto_version(s: Solicitud) -> JSONResponse:
+    """409 con el estado vigente, para que el cliente decida sobre datos frescos."""
+    return JSONResponse(
+        status_code=409,
+        content={
+            "detail": "La solicitud fue modificada por otro usuario",
+            "solicitud": serialize_solicitud(s),
+        },
+        headers={"ETag": etag_solicitud(s)},
+    )
+
+
+# Campo de salida -> columna. identificador_qr es el único que requiere el JOIN con cama.
+SOLICITUD_COLUMNAS = {
+    "id": Solicitud.id_solicitud,
+    "id_cama": Solicitud.id_cama,
+    "id_area": Solicitud.id_area,
+    "tipo": Solicitud.tipo,
+    "descripcion": Solicitud.descripcion,
+    "estado": Solicitud.estado_actual,
+    "fecha_creacion": Solicitud.fecha_creacion,
+    "fecha_actualizacion": Solicitud.fecha_actualizacion,
+    "fecha_cierre": Solicitud.fecha_cierre,
+    "nombre_solicitante": Solicitud.nombre_solicitante,
+    "correo_solicitante": Solicitud.correo_solicitante,
+    "identificador_qr": Cama.identificador_qr,
+    "version": Solicitud.version,
+}
+
+
+def select_solicitudes(campos: Optional[frozenset] = None, join_cama: bool = False):
+    """
+    SELECT sólo de las columnas pedidas (todas si `campos` es None), con el QR
+    de la cama resuelto en el mismo JOIN en vez de un lazy load por fila.
+    """
+    nombres = [n for n in SOLICITUD_COLUMNAS if campos is None or n in campos]
+    stmt = select(*(SOLICITUD_COLUMNAS[n].label(n) for n in nombres)).select_from(Solicitud)
+    if join_cama or "identificador_qr" in nombres:
+        stmt = stmt.join(Cama, Cama.id_cama == Solicitud.id_cama)
+    return stmt
+
+
+def serialize_solicitud_rows(result) -> list:
+    """
+    Filas de select_solicitudes() a dicts sin convertir valores: ORJSONResponse
+    codifica fechas y enums directamente, sin pasar por jsonable_encoder.
+    """
+    keys = list(result.keys())
+    return [dict(zip(keys, fila)) for fila in result]
+
+
+# Campos con índice trigram; descripcion se cubre con el tsvector.
+COLUMNAS_TRIGRAM = (Solicitud.nombre_solicitante, Solicitud.correo_solicitante, Solicitud.tipo)
+LIMITE_BUSQUEDA_DEFAULT = 50
+LIMITE_CAMBIO_MASIVO = 500
+
+
+def buscar_solicitudes(stmt, q: str, dialect: str):
+    """
+    Agrega a `stmt` el filtro y el orden por relevancia de una búsqueda libre.
+
+    En Postgres usa el tsvector `busqueda` (configuración spanish) y similitud
+    trigram sobre solicitante, correo y tipo; en otros motores cae a LIKE.
+    """
+    termino = q.strip()
+    patron = "%" + termino.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    if dialect == "postgresql":
+        consulta = func.websearch_to_tsquery("spanish", termino)
+        vector = literal_column("solicitud.busqueda")
+        coincide = or_(vector.op("@@")(consulta), *(c.ilike(patron, escape="\\") for c in COLUMNAS_TRIGRAM))
+        rango = func.ts_rank(vector, consulta) + func.greatest(*(func.similarity(c, termino) for c in COLUMNAS_TRIGRAM))
+        return stmt.where(coincide).order_by(rango.desc())
+    columnas = COLUMNAS_TRIGRAM + (Solicitud.descripcion,)
+    return stmt.where(or_(*(func.lower(c).like(patron.lower(), escape="\\") for c in columnas)))
+
+
 def resolve_estado(value: str) -> EstadoSolicitud:
     if not value:
         raise HTTPException(status_code=400, detail="Estado no puede ser vacío")
@@ -126,125 +239,246 @@ def resolve_estado(value: str) -> EstadoSolicitud:
     )
 
 
+CAMPOS_QUERY = Query(None, description="Campos a incluir, separados por coma")
+
+
 @router.get("/hospitales", summary="Listar instituciones (alias hospitales)")
-def obtener_hospitales(db: Session = Depends(get_db)):
-    instituciones = db.query(Institucion).order_by(Institucion.id_institucion).all()
-    return [serialize_institucion(inst) for inst in instituciones]
+def obtener_hospitales(
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_HOSPITAL)
+    cat = catalogo.obtener(db)
+    return catalogo.responder(request, cat.hospitales, cat, campos)
 
 
 @router.get("/hospitales/{id_hospital}", summary="Obtener institución por ID")
-def obtener_hospital(id_hospital: int, db: Session = Depends(get_db)):
-    inst = db.query(Institucion).filter(Institucion.id_institucion == id_hospital).first()
+def obtener_hospital(id_hospital: int, request: Request, db: Session = Depends(get_db)):
+    cat = catalogo.obtener(db)
+    inst = cat.hospital_por_id.get(id_hospital)
     if not inst:
         raise HTTPException(status_code=404, detail="Institución no encontrada")
-    return serialize_institucion(inst)
+    return catalogo.responder(request, inst, cat)
 
 
 @router.get("/edificios", summary="Listar edificios")
-def obtener_edificios(db: Session = Depends(get_db)):
-    edificios = db.query(Edificio).order_by(Edificio.id_edificio).all()
-    return [serialize_edificio(e) for e in edificios]
+def obtener_edificios(
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_EDIFICIO)
+    cat = catalogo.obtener(db)
+    return catalogo.responder(request, cat.edificios, cat, campos)
 
 
 @router.get("/hospitales/{id_hospital}/edificios", summary="Listar edificios por institución")
-def obtener_edificios_por_hospital(id_hospital: int, db: Session = Depends(get_db)):
-    if not db.query(Institucion).filter(Institucion.id_institucion == id_hospital).first():
+def obtener_edificios_por_hospital(
+    id_hospital: int,
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_EDIFICIO)
+    cat = catalogo.obtener(db)
+    if id_hospital not in cat.hospital_por_id:
         raise HTTPException(status_code=404, detail="Institución no encontrada")
-    edificios = db.query(Edificio).filter(Edificio.id_institucion == id_hospital).all()
-    return [serialize_edificio(e) for e in edificios]
+    return catalogo.responder(request, cat.edificios_por_hospital.get(id_hospital, []), cat, campos)
 
 
 @router.get("/pisos", summary="Listar pisos")
-def obtener_pisos(db: Session = Depends(get_db)):
-    pisos = db.query(Piso).order_by(Piso.id_piso).all()
-    return [serialize_piso(p) for p in pisos]
+def obtener_pisos(
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_PISO)
+    cat = catalogo.obtener(db)
+    return catalogo.responder(request, cat.pisos, cat, campos)
 
 
 @router.get("/edificios/{id_edificio}/pisos", summary="Listar pisos por edificio")
-def obtener_pisos_por_edificio(id_edificio: int, db: Session = Depends(get_db)):
-    if not db.query(Edificio).filter(Edificio.id_edificio == id_edificio).first():
+def obtener_pisos_por_edificio(
+    id_edificio: int,
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_PISO)
+    cat = catalogo.obtener(db)
+    if id_edificio not in cat.edificio_por_id:
         raise HTTPException(status_code=404, detail="Edificio no encontrado")
-    pisos = db.query(Piso).filter(Piso.id_edificio == id_edificio).all()
-    return [serialize_piso(p) for p in pisos]
+    return catalogo.responder(request, cat.pisos_por_edificio.get(id_edificio, []), cat, campos)
 
 
 @router.get("/servicios", summary="Listar servicios clínicos")
-def obtener_servicios(db: Session = Depends(get_db)):
-    servicios = db.query(Servicio).order_by(Servicio.id_servicio).all()
-    return [serialize_servicio(s) for s in servicios]
+def obtener_servicios(
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_SERVICIO)
+    cat = catalogo.obtener(db)
+    return catalogo.responder(request, cat.servicios, cat, campos)
 
 
 @router.get("/habitaciones", summary="Listar habitaciones")
-def obtener_habitaciones(db: Session = Depends(get_db)):
-    habitaciones = db.query(Habitacion).join(Piso).join(Edificio).all()
-    return [serialize_habitacion(h) for h in habitaciones]
+def obtener_habitaciones(
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_HABITACION)
+    cat = catalogo.obtener(db)
+    return catalogo.responder(request, cat.habitaciones, cat, campos)
 
 
 @router.get("/hospitales/{id_hospital}/habitaciones", summary="Listar habitaciones por hospital")
-def obtener_habitaciones_por_hospital(id_hospital: int, db: Session = Depends(get_db)):
-    if not db.query(Institucion).filter(Institucion.id_institucion == id_hospital).first():
+def obtener_habitaciones_por_hospital(
+    id_hospital: int,
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_HABITACION)
+    cat = catalogo.obtener(db)
+    if id_hospital not in cat.hospital_por_id:
         raise HTTPException(status_code=404, detail="Institución no encontrada")
-
-    habitaciones = (
-        db.query(Habitacion)
-        .join(Piso)
-        .join(Edificio)
-        .filter(Edificio.id_institucion == id_hospital)
-        .all()
-    )
-    return [serialize_habitacion(h) for h in habitaciones]
+    return catalogo.responder(request, cat.habitaciones_por_hospital.get(id_hospital, []), cat, campos)
+
+
+@router.get("/hospitales/{id_hospital}/arbol", summary="Árbol completo de ubicaciones de una institución")
+def obtener_arbol_hospital(
+    id_hospital: int,
+    request: Request,
+    profundidad: int = Query(
+        catalogo.PROFUNDIDAD_MAXIMA,
+        ge=0,
+        le=catalogo.PROFUNDIDAD_MAXIMA,
+        description="Niveles bajo la institución: 1=edificios, 2=pisos, 3=habitaciones, 4=camas",
+    ),
+    fields: Optional[str] = Query(None, description="Atributos a incluir en cada nodo, separados por coma"),
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, {c for attrs in catalogo.CAMPOS_ARBOL.values() for c in attrs})
+    cat = catalogo.obtener(db)
+    arbol = cat.arbol(id_hospital, profundidad, campos)
+    if arbol is None:
+        raise HTTPException(status_code=404, detail="Institución no encontrada")
+    return catalogo.responder(request, arbol, cat)
 
 
 @router.get("/habitaciones/{id_habitacion}", summary="Obtener habitación por ID")
-def obtener_habitacion(id_habitacion: int, db: Session = Depends(get_db)):
-    hab = (
-        db.query(Habitacion)
-        .filter(Habitacion.id_habitacion == id_habitacion)
-        .first()
-    )
+def obtener_habitacion(id_habitacion: int, request: Request, db: Session = Depends(get_db)):
+    cat = catalogo.obtener(db)
+    hab = cat.habitacion_por_id.get(id_habitacion)
     if not hab:
         raise HTTPException(status_code=404, detail="Habitación no encontrada")
-    return serialize_habitacion(hab)
+    return catalogo.responder(request, hab, cat)
 
 
 @router.get("/camas", summary="Listar camas")
-def obtener_camas(db: Session = Depends(get_db)):
-    camas = db.query(Cama).order_by(Cama.id_cama).all()
-    return [serialize_cama(c) for c in camas]
+def obtener_camas(
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_CAMA)
+    cat = catalogo.obtener(db)
+    return catalogo.responder(request, cat.camas, cat, campos)
 
 
 @router.get("/habitaciones/{id_habitacion}/camas", summary="Listar camas por habitación")
-def obtener_camas_por_habitacion(id_habitacion: int, db: Session = Depends(get_db)):
-    if not db.query(Habitacion).filter(Habitacion.id_habitacion == id_habitacion).first():
+def obtener_camas_por_habitacion(
+    id_habitacion: int,
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_CAMA)
+    cat = catalogo.obtener(db)
+    if id_habitacion not in cat.habitacion_por_id:
         raise HTTPException(status_code=404, detail="Habitación no encontrada")
-    camas = db.query(Cama).filter(Cama.id_habitacion == id_habitacion).all()
-    return [serialize_cama(c) for c in camas]
+    return catalogo.responder(request, cat.camas_por_habitacion.get(id_habitacion, []), cat, campos)
 
 
 @router.get("/camas/{id_cama}", summary="Obtener cama por ID")
-def obtener_cama(id_cama: int, db: Session = Depends(get_db)):
-    cama = db.query(Cama).filter(Cama.id_cama == id_cama).first()
+def obtener_cama(id_cama: int, request: Request, db: Session = Depends(get_db)):
+    cat = catalogo.obtener(db)
+    cama = cat.cama_por_id.get(id_cama)
     if not cama:
         raise HTTPException(status_code=404, detail="Cama no encontrada")
-    return serialize_cama(cama)
+    return catalogo.responder(request, cama, cat)
 
 
 @router.get("/camas/by-qr/{qr}", summary="Obtener cama por identificador QR")
-def obtener_cama_por_qr(qr: str, db: Session = Depends(get_db)):
-    cama = db.query(Cama).filter(Cama.identificador_qr == qr).first()
+def obtener_cama_por_qr(qr: str, request: Request, db: Session = Depends(get_db)):
+    cat = catalogo.obtener(db)
+    cama = cat.cama_por_qr.get(qr)
     if not cama:
         raise HTTPException(status_code=404, detail="Cama no encontrada para ese QR")
-    return serialize_cama(cama)
+    return catalogo.responder(request, cama, cat)
 
 
 @router.get("/areas", summary="Listar áreas")
-def obtener_areas(db: Session = Depends(get_db)):
-    areas = db.query(Area).order_by(Area.id_area).all()
-    return [serialize_area(a) for a in areas]
+def obtener_areas(
+    request: Request,
+    fields: Optional[str] = CAMPOS_QUERY,
+    db: Session = Depends(get_db),
+):
+    campos = parse_fields(fields, catalogo.CAMPOS_AREA)
+    cat = catalogo.obtener(db)
+    return catalogo.responder(request, cat.areas, cat, campos)
+
+
+@router.post(
+    "/solicitudes",
+    summary="Crear solicitud",
+    dependencies=[Depends(rate_limit.solicitudes_por_ip)],
+)
+def crear_solicitud(
+    payload: SolicitudIn,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
+):
+    if not idempotency_key:
+        return _crear_solicitud(payload, db)
+
+    key = idempotency_key.strip()
+    if not key or len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key inválida")
+
+    try:
+        previa = idempotency.store.begin(db, key, idempotency.fingerprint(payload.model_dump_json()))
+    except idempotency.IdempotencyConflict:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key ya utilizada con un cuerpo de solicitud distinto",
+        )
+    except TimeoutError:
+        raise HTTPException(
+            status_code=409,
+            detail="Hay una solicitud con la misma Idempotency-Key en proceso",
+            headers={"Retry-After": "1"},
+        )
+
+    if previa is not None:
+        return JSONResponse(content=previa, headers={"Idempotent-Replayed": "true"})
+
+    try:
+        respuesta = _crear_solicitud(payload, db)
+    except BaseException:
+        idempotency.store.abort(db, key)
+        raise
 
+    idempotency.store.complete(db, key, respuesta)
+    return respuesta
+
+
+def _crear_solicitud(payload: SolicitudIn, db: Session) -> dict:
+    rate_limit.solicitudes_por_cama.check(f"cama:{payload.id_cama}")
 
-@router.post("/solicitudes", summary="Crear solicitud")
-def crear_solicitud(payload: SolicitudIn, db: Session = Depends(get_db)):
     cama = db.query(Cama).filter(Cama.id_cama == payload.id_cama).first()
     if not cama:
         raise HTTPException(status_code=404, detail="Cama no encontrada")
@@ -266,12 +500,31 @@ def crear_solicitud(payload: SolicitudIn, db: Session = Depends(get_db)):
     if not tipo:
         raise HTTPException(status_code=400, detail="Tipo de solicitud requerido")
     now = datetime.now(timezone.utc)
+    descripcion = (payload.descripcion or "").strip()
+
+    # Dos intentos: si un cambio de estado o un borrado gana entre la búsqueda y
+    # el commit (version_id_col), se busca de nuevo con datos frescos.
+    for _ in range(2):
+        existente = _buscar_solicitud_abierta(db, cama.id_cama, area.id_area, tipo, now)
+        if existente is None:
+            break
+        try:
+            return _agrupar_en(db, existente, payload, descripcion, now)
+        except StaleDataError:
+            db.rollback()
+            db.expunge(existente)  # pudo haberse borrado: que no quede en el identity map
+    else:
+        raise HTTPException(
+            status_code=409,
+            detail="La solicitud existente cambió mientras se agrupaba; reintente",
+            headers={"Retry-After": "1"},
+        )
 
     solicitud = Solicitud(
         id_cama=cama.id_cama,
         id_area=area.id_area,
         tipo=tipo,
-        descripcion=(payload.descripcion or "").strip(),
+        descripcion=descripcion,
         estado_actual=EstadoSolicitud.PENDIENTE,
         fecha_creacion=now,
         fecha_actualizacion=now,
@@ -280,42 +533,118 @@ def crear_solicitud(payload: SolicitudIn, db: Session = Depends(get_db)):
     )
 
     db.add(solicitud)
+    historial.registrar_creacion(db, solicitud)
     db.commit()
     db.refresh(solicitud)
 
-    return {"mensaje": "Solicitud creada", "solicitud": serialize_solicitud(solicitud)}
+    return {"mensaje": "Solicitud creada", "fusionada": False, "solicitud": serialize_solicitud(solicitud)}
+
+
+def _agrupar_en(
+    db: Session, existente: Solicitud, payload: SolicitudIn, descripcion: str, now: datetime
+) -> dict:
+    existente.fecha_actualizacion = now
+    if descripcion and descripcion not in (existente.descripcion or ""):
+        existente.descripcion = (
+            f"{existente.descripcion}\n{descripcion}" if existente.descripcion else descripcion
+        )
+    if not existente.nombre_solicitante and payload.nombre_solicitante:
+        existente.nombre_solicitante = payload.nombre_solicitante
+    if not existente.correo_solicitante and payload.correo_solicitante:
+        existente.correo_solicitante = payload.correo_solicitante
+    historial.registrar_agrupacion(db, existente, now)
+    db.commit()
+    db.refresh(existente)
+    return {
+        "mensaje": "Solicitud agrupada con una existente",
+        "fusionada": True,
+        "solicitud": serialize_solicitud(existente),
+    }
+
+
+def _buscar_solicitud_abierta(
+    db: Session, id_cama: int, id_area: int, tipo: str, now: datetime
+) -> Optional[Solicitud]:
+    """Solicitud no cerrada más reciente con la misma cama/área/tipo dentro de la ventana."""
+    if COALESCE_WINDOW_MINUTES <= 0:
+        return None
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Serializa creaciones concurrentes para la misma cama/área hasta el commit,
+        # así dos escaneos simultáneos no abren dos tickets.
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:id_cama, :id_area)"),
+            {"id_cama": id_cama, "id_area": id_area},
+        )
+
+    # Usa ix_solicitud_abiertas_cama_area_tipo (índice parcial sobre no cerradas).
+    return (
+        db.query(Solicitud)
+        .filter(
+            Solicitud.id_cama == id_cama,
+            Solicitud.id_area == id_area,
+            Solicitud.tipo == tipo,
+            Solicitud.estado_actual != EstadoSolicitud.CERRADA,
+            Solicitud.fecha_creacion >= now - timedelta(minutes=COALESCE_WINDOW_MINUTES),
+        )
+        .order_by(Solicitud.fecha_creacion.desc())
+        .first()
+    )
 
 
-@router.get("/solicitudes", summary="Listar solicitudes con filtros")
+@router.get(
+    "/solicitudes",
+    summary="Listar solicitudes con filtros",
+    response_model=List[SolicitudOut],
+    response_model_exclude_unset=True,
+)
 def obtener_solicitudes(
     estado: Optional[str] = Query(default=None, description="pendiente | en_proceso | cerrada"),
     id_hospital: Optional[int] = Query(default=None),
     id_habitacion: Optional[int] = Query(default=None),
     id_cama: Optional[int] = Query(default=None),
+    q: Optional[str] = Query(
+        default=None,
+        min_length=2,
+        max_length=100,
+        description="Búsqueda libre en solicitante, correo, tipo y descripción (ordena por relevancia)",
+    ),
+    limite: Optional[int] = Query(default=None, ge=1, le=500, description=f"Por defecto {LIMITE_BUSQUEDA_DEFAULT} si hay q"),
+    offset: int = Query(default=0, ge=0),
+    fields: Optional[str] = Query(default=None, description="Campos a incluir, separados por coma (p. ej. id,estado,id_area,fecha_creacion)"),
     db: Session = Depends(get_db),
 ):
-    q = db.query(Solicitud)
+    campos = parse_fields(fields, SOLICITUD_COLUMNAS)
+    stmt = select_solicitudes(campos, join_cama=bool(id_habitacion or id_hospital))
 
     if estado:
         estado_enum = resolve_estado(estado)
-        q = q.filter(Solicitud.estado_actual == estado_enum)
+        stmt = stmt.where(Solicitud.estado_actual == estado_enum)
 
     if id_cama:
-        q = q.filter(Solicitud.id_cama == id_cama)
+        stmt = stmt.where(Solicitud.id_cama == id_cama)
 
     if id_habitacion or id_hospital:
-        q = q.join(Cama, Cama.id_cama == Solicitud.id_cama).join(Habitacion, Habitacion.id_habitacion == Cama.id_habitacion)
         if id_habitacion:
-            q = q.filter(Habitacion.id_habitacion == id_habitacion)
+            stmt = stmt.where(Cama.id_habitacion == id_habitacion)
         if id_hospital:
-            q = (
-                q.join(Piso, Piso.id_piso == Habitacion.id_piso)
+            stmt = (
+                stmt.join(Habitacion, Habitacion.id_habitacion == Cama.id_habitacion)
+                .join(Piso, Piso.id_piso == Habitacion.id_piso)
                 .join(Edificio, Edificio.id_edificio == Piso.id_edificio)
-                .filter(Edificio.id_institucion == id_hospital)
+                .where(Edificio.id_institucion == id_hospital)
             )
 
-    solicitudes = q.order_by(Solicitud.fecha_creacion.desc()).all()
-    return [serialize_solicitud(s) for s in solicitudes]
+    if q:
+        stmt = buscar_solicitudes(stmt, q, db.get_bind().dialect.name)
+        if limite is None:
+            limite = LIMITE_BUSQUEDA_DEFAULT
+    stmt = stmt.order_by(Solicitud.fecha_creacion.desc()).offset(offset)
+    if limite is not None:
+        stmt = stmt.limit(limite)
+
+    result = db.execute(stmt)
+    return ORJSONResponse(serialize_solicitud_rows(result))
 
 
 @router.get("/solicitudes/{id_solicitud}", summary="Obtener solicitud por ID")
@@ -323,15 +652,56 @@ def obtener_solicitud(id_solicitud: int, db: Session = Depends(get_db)):
     solicitud = db.query(Solicitud).filter(Solicitud.id_solicitud == id_solicitud).first()
     if not solicitud:
         raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-    return serialize_solicitud(solicitud)
+    return ORJSONResponse(serialize_solicitud(solicitud), headers={"ETag": etag_solicitud(solicitud)})
+
+
+class CambioEstadoMasivoIn(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=LIMITE_CAMBIO_MASIVO)
+    estado: str
+
+
+@router.put("/solicitudes/estado", summary="Actualizar estado de varias solicitudes")
+def actualizar_estado_solicitudes(
+    payload: CambioEstadoMasivoIn,
+    usuario: Usuario = Depends(require_authenticated_user),
+    db: Session = Depends(get_db),
+):
+    estado_enum = resolve_estado(payload.estado)
+    id_area = None
+    if usuario.rol == RolUsuario.JEFE_AREA:
+        if usuario.id_area is None:
+            raise HTTPException(
+                status_code=400,
+                detail="El usuario jefe de área no tiene un área asignada",
+            )
+        id_area = usuario.id_area
+
+    columnas = {n: c for n, c in SOLICITUD_COLUMNAS.items() if n != "identificador_qr"}
+    actualizadas = historial.registrar_transiciones(
+        db, payload.ids, estado_enum, datetime.now(timezone.utc), id_area=id_area, columnas=columnas
+    )
+    db.commit()
+
+    # Omitidas: inexistentes, de otra área o que ya estaban en ese estado.
+    ids_actualizados = {s["id"] for s in actualizadas}
+    return ORJSONResponse({
+        "mensaje": "Estados actualizados",
+        "actualizadas": len(actualizadas),
+        "omitidas": sorted(set(payload.ids) - ids_actualizados),
+        "solicitudes": actualizadas,
+    })
 
 
 @router.put("/solicitudes/{id_solicitud}/estado", summary="Actualizar estado de solicitud")
 def actualizar_estado_solicitud(
     id_solicitud: int,
     nuevo_estado: str,
+    version: Optional[int] = Query(default=None, description="Versión leída; alternativa a If-Match"),
+    if_match: Optional[str] = Header(default=None, alias="If-Match"),
     db: Session = Depends(get_db),
 ):
+    # Sin bloqueo de fila: si otro cambio gana la carrera, el UPDATE condicionado
+    # por versión no afecta filas y se responde 409 en vez de esperar.
     solicitud = db.query(Solicitud).filter(Solicitud.id_solicitud == id_solicitud).first()
     if not solicitud:
         raise HTTPException(status_code=404, detail="Solicitud no encontrada")
@@ -339,17 +709,27 @@ def actualizar_estado_solicitud(
     estado_enum = resolve_estado(nuevo_estado)
     now = datetime.now(timezone.utc)
 
-    if solicitud.estado_actual != estado_enum:
-        solicitud.estado_actual = estado_enum
-        solicitud.fecha_actualizacion = now
-        if estado_enum == EstadoSolicitud.CERRADA:
-            solicitud.fecha_cierre = now
-        else:
-            solicitud.fecha_cierre = None
-        db.commit()
+    if (version is not None and version != solicitud.version) or (
+        if_match and not etag.coincide(if_match, etag_solicitud(solicitud))
+    ):
+        return _conflicto_version(solicitud)
+
+    if historial.registrar_transicion(db, solicitud, estado_enum, now) is not None:
+        try:
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            vigente = db.get(Solicitud, id_solicitud)
+            if vigente is None:
+                # La carrera la ganó un borrado, no otro cambio de estado.
+                raise HTTPException(status_code=404, detail="Solicitud no encontrada")
+            return _conflicto_version(vigente)
         db.refresh(solicitud)
 
-    return {"mensaje": "Estado actualizado", "solicitud": serialize_solicitud(solicitud)}
+    return ORJSONResponse(
+        {"mensaje": "Estado actualizado", "solicitud": serialize_solicitud(solicitud)},
+        headers={"ETag": etag_solicitud(solicitud)},
+    )
 
 
 @router.get("/metricas/solicitudes-por-fecha", summary="Solicitudes creadas en rango de fechas")
@@ -630,3 +1010,89 @@ def metricas_tiempo_promedio_resolucion_por_area(
     ]
 
     return {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, "metricas": metricas}
+
+
+def _rango_dias(fecha_inicio: str, fecha_fin: str):
+    try:
+        inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
+        fin = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido. Use YYYY-MM-DD")
+    if inicio > fin:
+        raise HTTPException(status_code=400, detail="La fecha de inicio debe ser anterior a la fecha de fin")
+    return inicio, fin
+
+
+@router.get(
+    "/metricas/tiempo-primera-respuesta-por-area",
+    summary="Tiempo promedio hasta la primera respuesta por área (minutos)",
+)
+def metricas_tiempo_primera_respuesta_por_area(
+    fecha_inicio: str = Query(..., description="YYYY-MM-DD"),
+    fecha_fin: str = Query(..., description="YYYY-MM-DD"),
+    db: Session = Depends(get_db),
+):
+    # Lee los rollups diarios (services.historial), no el historial completo;
+    # los eventos del último minuto aún pueden no estar sumados.
+    inicio, fin = _rango_dias(fecha_inicio, fecha_fin)
+    resultados = (
+        db.query(
+            Area.nombre_area,
+            func.sum(RollupPrimeraRespuestaDiaria.cantidad),
+            func.sum(RollupPrimeraRespuestaDiaria.segundos),
+        )
+        .join(RollupPrimeraRespuestaDiaria, RollupPrimeraRespuestaDiaria.id_area == Area.id_area)
+        .filter(RollupPrimeraRespuestaDiaria.dia >= inicio, RollupPrimeraRespuestaDiaria.dia <= fin)
+        .group_by(Area.nombre_area)
+        .all()
+    )
+
+    metricas = [
+        {
+            "nombre_area": nombre_area,
+            "respuestas": int(cantidad or 0),
+            "tiempo_promedio_primera_respuesta_minutos": round((segundos or 0) / cantidad / 60, 2) if cantidad else 0,
+        }
+        for nombre_area, cantidad, segundos in resultados
+    ]
+
+    return {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, "metricas": metricas}
+
+
+@router.get(
+    "/metricas/tiempo-en-estado-por-area",
+    summary="Tiempo promedio en cada estado por área (minutos)",
+)
+def metricas_tiempo_en_estado_por_area(
+    fecha_inicio: str = Query(..., description="YYYY-MM-DD"),
+    fecha_fin: str = Query(..., description="YYYY-MM-DD"),
+    db: Session = Depends(get_db),
+):
+    # Cada salida de un estado cuenta el tiempo que la solicitud estuvo en él,
+    # incluidas las reaperturas.
+    inicio, fin = _rango_dias(fecha_inicio, fecha_fin)
+    resultados = (
+        db.query(
+            Area.nombre_area,
+            RollupEstadoDiario.estado,
+            func.sum(RollupEstadoDiario.salidas),
+            func.sum(RollupEstadoDiario.segundos),
+        )
+        .join(RollupEstadoDiario, RollupEstadoDiario.id_area == Area.id_area)
+        .filter(RollupEstadoDiario.dia >= inicio, RollupEstadoDiario.dia <= fin)
+        .group_by(Area.nombre_area, RollupEstadoDiario.estado)
+        .order_by(Area.nombre_area)
+        .all()
+    )
+
+    metricas = [
+        {
+            "nombre_area": nombre_area,
+            "estado": estado.value,
+            "transiciones": int(salidas or 0),
+            "tiempo_promedio_minutos": round((segundos or 0) / salidas / 60, 2) if salidas else 0,
+        }
+        for nombre_area, estado, salidas, segundos in resultados
+    ]
+
+    return {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, "metricas": metricas}
@@ -1,64 +1,24 @@
-from sqlalchemy.orm import Session
-from db.session import SessionLocal, engine
-from models.models import Hospital, Habitacion, Cama, Area, Solicitud, EstadoSolicitud
-from datetime import datetime
+# seed.py
+"""Siembra mínima para desarrollo local (ver seed_full.py y generar_datos.py)."""
+import argparse
 
-# Función para limpiar e insertar datos
-def seed_data(db: Session):
-    # Borrar datos previos (opcional, útil en desarrollo)
-    db.query(Solicitud).delete()
-    db.query(Cama).delete()
-    db.query(Habitacion).delete()
-    db.query(Hospital).delete()
-    db.query(Area).delete()
-    db.commit()
+from db.session import engine
+from generar_datos import ConfigGenerador, generar
 
-    # Crear hospital demo
-    hospital = Hospital(nombre="Hospital UC Christus Demo")
-    db.add(hospital)
-    db.commit()
-    db.refresh(hospital)
 
-    # Crear habitaciones
-    habitacion1 = Habitacion(numero="101", hospital=hospital)
-    habitacion2 = Habitacion(numero="102", hospital=hospital)
-    db.add_all([habitacion1, habitacion2])
-    db.commit()
-    db.refresh(habitacion1)
-    db.refresh(habitacion2)
-
-    # Crear camas con QR
-    cama_101A = Cama(identificador_qr="H1-101-A", habitacion=habitacion1, activo=True)
-    cama_101B = Cama(identificador_qr="H1-101-B", habitacion=habitacion1, activo=False)  # inactiva para pruebas
-    cama_102A = Cama(identificador_qr="H1-102-A", habitacion=habitacion2, activo=True)
-    db.add_all([cama_101A, cama_101B, cama_102A]); db.commit()
-
-    # Crear áreas
-    area1 = Area(nombre="Mantención")
-    area2 = Area(nombre="Aseo")
-    area3 = Area(nombre="Alimentación")
-    db.add_all([area1, area2, area3])
-    db.commit()
-    db.refresh(area1)
-
-    # Crear solicitud de ejemplo
-    solicitud = Solicitud(
-        cama=cama_101A,
-        area=area1,
-        tipo="Reparación",
-        descripcion="La luz de la habitación no funciona",
-        estado_actual=EstadoSolicitud.PENDIENTE,
-        fecha_creacion=datetime.utcnow(),
+def seed_data(limpiar: bool = False, permitir_bd_remota: bool = False):
+    generar(
+        engine,
+        ConfigGenerador(instituciones=1, edificios=1, pisos=1, habitaciones=2, camas=2, solicitudes=10),
+        limpiar=limpiar,
+        permitir_bd_remota=permitir_bd_remota,
     )
-    db.add(solicitud)
-    db.commit()
+    print("✅ Datos de prueba insertados")
 
-    print("✅ Datos iniciales insertados con éxito")
 
-# Script principal
 if __name__ == "__main__":
-    db = SessionLocal()
-    try:
-        seed_data(db)
-    finally:
-        db.close()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limpiar", action="store_true", help="Borrar TODOS los datos antes de sembrar")
+    parser.add_argument("--permitir-bd-remota", action="store_true", help="Permitir --limpiar sobre una BD no local")
+    args = parser.parse_args()
+    seed_data(args.limpiar, args.permitir_bd_remota)
@@ -1,27 +1,12 @@
 # db/seed_areas.py
-from db.session import SessionLocal
-from models.models import Area
+from db.session import engine
+from generar_datos import sembrar_areas
 
-# Datos base
-AREAS = [
-    {"nombre": "Mantención"},
-    {"nombre": "Nutrición y Alimentación"},
-    {"nombre": "Limpieza"},
-    {"nombre": "Asistencia Social"},
-    {"nombre": "Acompañamiento Espiritual"},
-]
 
 def seed_areas():
-    db = SessionLocal()
-    try:
-        for area in AREAS:
-            exists = db.query(Area).filter(Area.nombre == area["nombre"]).first()
-            if not exists:
-                db.add(Area(**area))
-        db.commit()
-        print("✅ Áreas insertadas correctamente")
-    finally:
-        db.close()
+    sembrar_areas(engine)
+    print("✅ Áreas insertadas correctamente")
+
 
 if __name__ == "__main__":
     seed_areas()
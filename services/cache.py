@@ -0,0 +1,381 @@
+import json
+import logging
+import os
+import select
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from services.telemetry import REGISTRY
+
+logger = logging.getLogger("cache")
+
+CANAL = "cache_invalidacion"
+
+ACIERTOS_TOTAL = REGISTRY.counter("cache_aciertos_total", "Lecturas de caché con valor vigente.", ("cache",))
+FALLOS_TOTAL = REGISTRY.counter("cache_fallos_total", "Lecturas de caché sin valor.", ("cache",))
+ERRORES_TOTAL = REGISTRY.counter(
+    "cache_errores_total", "Errores del backend de caché (se tratan como fallo).", ("cache",)
+)
+INVALIDACIONES_TOTAL = REGISTRY.counter(
+    "cache_invalidaciones_recibidas_total", "Invalidaciones recibidas de otros workers vía NOTIFY.", ("cache",)
+)
+
+
+class MemoryBackend:
+    """LRU acotado con TTL en memoria del proceso; guarda los objetos tal cual."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, prefix: str = "") -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+
+class SQLiteBackend:
+    """
+    Archivo SQLite compartido por los workers de un mismo host. Los valores se
+    guardan como JSON (orjson): sólo dicts, listas y escalares.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._escrituras = 0
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (clave TEXT PRIMARY KEY, valor BLOB, expira REAL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def get(self, key: str) -> Any:
+        # time.time() y no monotonic: el reloj debe ser comparable entre procesos.
+        row = self._conn().execute(
+            "SELECT valor FROM cache WHERE clave = ? AND expira > ?", (key, time.time())
+        ).fetchone()
+        return orjson.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        conn = self._conn()
+        ahora = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (clave, valor, expira) VALUES (?, ?, ?)",
+            (key, orjson.dumps(value), ahora + ttl),
+        )
+        self._escrituras += 1
+        if self._escrituras % 500 == 0:
+            conn.execute("DELETE FROM cache WHERE expira <= ?", (ahora,))
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache WHERE clave = ?", (key,))
+
+    def clear(self, prefix: str = "") -> None:
+        self._conn().execute("DELETE FROM cache WHERE substr(clave, 1, ?) = ?", (len(prefix), prefix))
+
+
+class RedisBackend:
+    """
+    Redis (o Valkey/KeyDB) vía redis-py, con su pool de conexiones seguro
+    entre hilos. Los valores van como JSON, igual que en SQLite: nada de lo
+    que se lea del servidor se ejecuta.
+    """
+
+    def __init__(self, url: str, timeout: float = 1.0):
+        import redis  # sólo con CACHE_BACKEND=redis
+
+        self._client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    def get(self, key: str) -> Any:
+        dato = self._client.get(key)
+        return orjson.loads(dato) if dato is not None else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._client.set(key, orjson.dumps(value), px=max(1, int(ttl * 1000)))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def clear(self, prefix: str = "") -> None:
+        patron = "".join("\\" + c if c in "*?[]\\" else c for c in prefix) + "*"
+        lote = []
+        for clave in self._client.scan_iter(match=patron, count=500):
+            lote.append(clave)
+            if len(lote) >= 500:
+                self._client.delete(*lote)
+                lote = []
+        if lote:
+            self._client.delete(*lote)
+
+
+def _build_backend():
+    tipo = os.getenv("CACHE_BACKEND", "memory").lower()
+    if tipo == "sqlite":
+        return SQLiteBackend(os.getenv("CACHE_SQLITE_PATH", "/tmp/uc_cache.sqlite3"))
+    if tipo == "redis":
+        return RedisBackend(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    return MemoryBackend(int(os.getenv("CACHE_MAX_ENTRIES", "10000")))
+
+
+backend = _build_backend()
+_registro: Dict[str, "Cache"] = {}
+
+
+class Cache:
+    """
+    Espacio de nombres `nombre` sobre un backend (el compartido, configurado
+    con CACHE_BACKEND, salvo que se indique otro). Un error del backend se
+    registra y cuenta como fallo: la caché nunca rompe una petición.
+    `invalidar()` borra localmente y avisa a los demás workers.
+    """
+
+    def __init__(self, nombre: str, ttl: float, backend=None):
+        self.nombre = nombre
+        self.ttl = ttl
+        self._backend = backend
+        self.generacion = 0
+        self._lock = threading.Lock()
+        # Un lock por clave en carga (con contador de interesados): una carga
+        # lenta de una clave no frena lecturas ni cargas de las demás.
+        self._cargando: Dict[str, list] = {}
+        _registro[nombre] = self
+
+    @property
+    def backend(self):
+        return self._backend if self._backend is not None else backend
+
+    def _clave(self, key: str) -> str:
+        return f"{self.nombre}:{key}"
+
+    def _leer(self, key: str) -> Any:
+        try:
+            return self.backend.get(self._clave(key))
+        except Exception:
+            ERRORES_TOTAL.inc(self.nombre)
+            logger.warning("Caché %s: error leyendo %s", self.nombre, key, exc_info=True)
+            return None
+
+    def get(self, key: str) -> Any:
+        valor = self._leer(key)
+        (FALLOS_TOTAL if valor is None else ACIERTOS_TOTAL).inc(self.nombre)
+        return valor
+
+    def set(self, key: str, valor: Any, ttl: Optional[float] = None) -> None:
+        try:
+            self.backend.set(self._clave(key), valor, self.ttl if ttl is None else ttl)
+        except Exception:
+            ERRORES_TOTAL.inc(self.nombre)
+            logger.warning("Caché %s: error escribiendo %s", self.nombre, key, exc_info=True)
+
+    def obtener(self, key: str, cargar: Callable[[], Any]) -> Any:
+        """
+        Valor de `key` o el resultado de `cargar()`, que corre una sola vez
+        por clave aunque haya peticiones concurrentes en el worker. Si se
+        invalidó durante la carga, el resultado se devuelve pero no se guarda.
+        """
+        if self.ttl <= 0:
+            return cargar()
+        valor = self.get(key)
+        if valor is not None:
+            return valor
+        with self._lock:
+            entrada = self._cargando.setdefault(key, [threading.Lock(), 0])
+            entrada[1] += 1
+        try:
+            with entrada[0]:
+                valor = self._leer(key)
+                if valor is None:
+                    generacion = self.generacion
+                    valor = cargar()
+                    if generacion == self.generacion:
+                        self.set(key, valor)
+                return valor
+        finally:
+            with self._lock:
+                entrada[1] -= 1
+                if entrada[1] == 0:
+                    del self._cargando[key]
+
+    def descartar(self, key: Optional[str] = None) -> None:
+        """Borra `key` (o todo el espacio de nombres) sólo en este worker/backend."""
+        self.generacion += 1
+        try:
+            if key is None:
+                self.backend.clear(f"{self.nombre}:")
+            else:
+                self.backend.delete(self._clave(key))
+        except Exception:
+            ERRORES_TOTAL.inc(self.nombre)
+            logger.warning("Caché %s: error invalidando", self.nombre, exc_info=True)
+
+    def invalidar(self, key: Optional[str] = None) -> None:
+        self.descartar(key)
+        if invalidaciones is not None:
+            invalidaciones.publicar(self.nombre, key)
+
+
+def aplicar(mensaje: str) -> None:
+    """Aplica una invalidación recibida por NOTIFY ({"cache": ..., "clave": ...})."""
+    try:
+        datos = json.loads(mensaje)
+        cache = _registro.get(datos["cache"])
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Invalidación de caché malformada: %r", mensaje)
+        return
+    if cache is not None:
+        INVALIDACIONES_TOTAL.inc(cache.nombre)
+        cache.descartar(datos.get("clave"))
+
+
+def descartar_todo() -> None:
+    for cache in list(_registro.values()):
+        cache.descartar()
+
+
+class Invalidaciones:
+    """
+    Reparte las invalidaciones entre workers con LISTEN/NOTIFY de Postgres,
+    sobre una conexión dedicada (fuera del pool) en modo autocommit. Al
+    (re)conectar se vacían todas las cachés: pudieron perderse mensajes.
+    En motores sin NOTIFY (SQLite) no hace nada y quedan los TTL.
+    """
+
+    def __init__(self, engine: Engine, reintento_seconds: float = 5):
+        self._enabled = engine.dialect.name == "postgresql"
+        self._engine = create_engine(engine.url, poolclass=NullPool) if self._enabled else None
+        self.reintento_seconds = reintento_seconds
+        self._conn = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not self._enabled:
+            return
+        self._thread = threading.Thread(target=self._run, name="cache-invalidaciones", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._lock:
+            self._cerrar()
+        if self._engine is not None:
+            self._engine.dispose()
+
+    def publicar(self, nombre: str, key: Optional[str]) -> None:
+        mensaje = json.dumps({"cache": nombre, "clave": key})
+        with self._lock:
+            if self._conn is None:
+                return  # sin conexión: los demás workers dependen del TTL
+            try:
+                self._conn.execute(text("SELECT pg_notify(:canal, :mensaje)"), {"canal": CANAL, "mensaje": mensaje})
+            except Exception:
+                logger.warning("No se pudo publicar la invalidación de %s", nombre, exc_info=True)
+                self._cerrar()
+
+    def _conectar(self) -> None:
+        # Se guarda la Connection (no sólo la conexión DBAPI): con NullPool,
+        # al recolectarse el proxy del pool se cierra la conexión y el LISTEN.
+        conn = self._engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            conn.execute(text(f"LISTEN {CANAL}"))
+        except Exception:
+            conn.close()
+            raise
+        with self._lock:
+            self._conn = conn
+        descartar_todo()
+
+    def _dbapi(self):
+        return self._conn.connection.dbapi_connection
+
+    def _cerrar(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._conn is None:
+                try:
+                    self._conectar()
+                except Exception:
+                    logger.warning("No se pudo escuchar invalidaciones de caché", exc_info=True)
+                    self._stop.wait(self.reintento_seconds)
+                    continue
+            try:
+                listos, _, _ = select.select([self._dbapi()], [], [], 1.0)
+                if not listos:
+                    continue
+                with self._lock:
+                    raw = self._dbapi()
+                    raw.poll()
+                    mensajes = [n.payload for n in raw.notifies]
+                    raw.notifies.clear()
+                for mensaje in mensajes:
+                    aplicar(mensaje)
+            except Exception:
+                logger.warning("Se perdió la conexión de invalidaciones de caché", exc_info=True)
+                with self._lock:
+                    self._cerrar()
+
+
+invalidaciones: Optional[Invalidaciones] = None
+
+
+def iniciar_invalidaciones(engine: Engine) -> None:
+    global invalidaciones
+    invalidaciones = Invalidaciones(engine)
+    invalidaciones.start()
+
+
+def detener_invalidaciones() -> None:
+    global invalidaciones
+    if invalidaciones is not None:
+        invalidaciones.stop()
+        invalidaciones = None
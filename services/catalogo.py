@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.models import Area, Cama, Edificio, Habitacion, Institucion, Piso, Servicio
+from services import cache
+from utils import etag
+from utils.campos import project
+
+# Red de seguridad por si se pierde una invalidación (p. ej. sin Postgres).
+TTL_SECONDS = float(os.getenv("CATALOGO_TTL_SECONDS", "300"))
+
+# Campos de cada entidad, para validar fields=.
+CAMPOS_HOSPITAL = ("id_hospital", "nombre")
+CAMPOS_EDIFICIO = ("id_edificio", "nombre", "id_hospital")
+CAMPOS_PISO = ("id_piso", "numero", "id_edificio")
+CAMPOS_SERVICIO = ("id_servicio", "nombre")
+CAMPOS_HABITACION = ("id_habitacion", "nombre", "id_piso", "id_servicio", "id_hospital")
+CAMPOS_CAMA = ("id_cama", "id_habitacion", "letra", "qr", "activo")
+CAMPOS_AREA = ("id_area", "nombre")
+
+# Niveles bajo la institución: edificios, pisos, habitaciones, camas.
+PROFUNDIDAD_MAXIMA = 4
+# Atributos opcionales de cada nodo del árbol, por clave de ID del nivel.
+CAMPOS_ARBOL = {
+    "id_hospital": ("nombre",),
+    "id_edificio": ("nombre",),
+    "id_piso": ("numero",),
+    "id_habitacion": ("nombre", "id_servicio"),
+    "id_cama": ("letra", "qr", "activo"),
+}
+
+
+class Catalogo:
+    """
+    Foto inmutable de la jerarquía de ubicaciones ya serializada, con índices
+    por ID y por padre. Los dicts se comparten entre peticiones: no mutarlos.
+    """
+
+    def __init__(self, hospitales, edificios, pisos, servicios, habitaciones, camas, areas):
+        self.hospitales = hospitales
+        self.edificios = edificios
+        self.pisos = pisos
+        self.servicios = servicios
+        self.habitaciones = habitaciones
+        self.camas = camas
+        self.areas = areas
+
+        self.hospital_por_id = {h["id_hospital"]: h for h in hospitales}
+        self.edificio_por_id = {e["id_edificio"]: e for e in edificios}
+        self.habitacion_por_id = {h["id_habitacion"]: h for h in habitaciones}
+        self.cama_por_id = {c["id_cama"]: c for c in camas}
+        self.cama_por_qr = {c["qr"]: c for c in camas}
+
+        self.edificios_por_hospital = defaultdict(list)
+        for e in edificios:
+            self.edificios_por_hospital[e["id_hospital"]].append(e)
+        self.pisos_por_edificio = defaultdict(list)
+        for p in pisos:
+            self.pisos_por_edificio[p["id_edificio"]].append(p)
+        self.habitaciones_por_hospital = defaultdict(list)
+        self.habitaciones_por_piso = defaultdict(list)
+        for h in habitaciones:
+            self.habitaciones_por_hospital[h["id_hospital"]].append(h)
+            self.habitaciones_por_piso[h["id_piso"]].append(h)
+        self.camas_por_habitacion = defaultdict(list)
+        for c in camas:
+            self.camas_por_habitacion[c["id_habitacion"]].append(c)
+
+        # Hash del contenido y no un contador: así todos los workers calculan
+        # el mismo ETag para los mismos datos.
+        digest = hashlib.sha1(
+            json.dumps(
+                [hospitales, edificios, pisos, servicios, habitaciones, camas, areas],
+                sort_keys=True,
+                ensure_ascii=False,
+            ).encode("utf-8")
+        ).hexdigest()
+        self.etag = f'"cat-{digest[:20]}"'
+        self._arboles = {}
+
+    def arbol(self, id_hospital: int, profundidad: int = PROFUNDIDAD_MAXIMA, campos=None) -> Optional[dict]:
+        """
+        Árbol institución → edificio → piso → habitación → cama armado desde los
+        índices. `profundidad` cuenta los niveles bajo la institución y `campos`
+        filtra los atributos de cada nodo (los IDs y los hijos siempre van).
+        """
+        clave = (id_hospital, profundidad, campos)
+        arbol = self._arboles.get(clave)
+        if arbol is not None:
+            return arbol
+        hospital = self.hospital_por_id.get(id_hospital)
+        if hospital is None:
+            return None
+
+        # (clave de ID, clave de hijos, índice de hijos) por nivel, de la raíz a las hojas.
+        niveles = [
+            ("id_hospital", "edificios", self.edificios_por_hospital),
+            ("id_edificio", "pisos", self.pisos_por_edificio),
+            ("id_piso", "habitaciones", self.habitaciones_por_piso),
+            ("id_habitacion", "camas", self.camas_por_habitacion),
+            ("id_cama", None, None),
+        ]
+
+        def nodo(item, nivel):
+            id_key, hijos_key, indice = niveles[nivel]
+            salida = {id_key: item[id_key]}
+            for k in CAMPOS_ARBOL[id_key]:
+                if campos is None or k in campos:
+                    salida[k] = item[k]
+            if hijos_key is not None and nivel < profundidad:
+                salida[hijos_key] = [nodo(hijo, nivel + 1) for hijo in indice.get(item[id_key], [])]
+            return salida
+
+        arbol = nodo(hospital, 0)
+        if len(self._arboles) < 256:
+            self._arboles[clave] = arbol
+        return arbol
+
+
+def cargar(db: Session) -> Catalogo:
+    """Lee toda la jerarquía con una consulta por tabla, sin instanciar objetos ORM."""
+    hospitales = [
+        {"id_hospital": i, "nombre": n}
+        for i, n in db.execute(
+            select(Institucion.id_institucion, Institucion.nombre_institucion).order_by(Institucion.id_institucion)
+        )
+    ]
+    edificios = [
+        {"id_edificio": i, "nombre": n, "id_hospital": h}
+        for i, n, h in db.execute(
+            select(Edificio.id_edificio, Edificio.nombre_edificio, Edificio.id_institucion).order_by(Edificio.id_edificio)
+        )
+    ]
+    pisos = [
+        {"id_piso": i, "numero": n, "id_edificio": e}
+        for i, n, e in db.execute(select(Piso.id_piso, Piso.numero_piso, Piso.id_edificio).order_by(Piso.id_piso))
+    ]
+    servicios = [
+        {"id_servicio": i, "nombre": n}
+        for i, n in db.execute(select(Servicio.id_servicio, Servicio.nombre_servicio).order_by(Servicio.id_servicio))
+    ]
+    habitaciones = [
+        {"id_habitacion": i, "nombre": n, "id_piso": p, "id_servicio": s, "id_hospital": h}
+        for i, n, p, s, h in db.execute(
+            select(
+                Habitacion.id_habitacion,
+                Habitacion.nombre_habitacion,
+                Habitacion.id_piso,
+                Habitacion.id_servicio,
+                Edificio.id_institucion,
+            )
+            .join(Piso, Piso.id_piso == Habitacion.id_piso)
+            .join(Edificio, Edificio.id_edificio == Piso.id_edificio)
+            .order_by(Habitacion.id_habitacion)
+        )
+    ]
+    camas = [
+        {"id_cama": i, "id_habitacion": h, "letra": letra, "qr": q, "activo": a}
+        for i, h, letra, q, a in db.execute(
+            select(Cama.id_cama, Cama.id_habitacion, Cama.letra_cama, Cama.identificador_qr, Cama.activo)
+            .order_by(Cama.id_cama)
+        )
+    ]
+    areas = [
+        {"id_area": i, "nombre": n}
+        for i, n in db.execute(select(Area.id_area, Area.nombre_area).order_by(Area.id_area))
+    ]
+    return Catalogo(hospitales, edificios, pisos, servicios, habitaciones, camas, areas)
+
+
+# El Catalogo ya armado (índices, árboles memoizados) vive en memoria de cada
+# worker; lo compartido entre workers es la invalidación.
+_cache = cache.Cache("catalogo", TTL_SECONDS, backend=cache.MemoryBackend(max_entries=1))
+
+
+def obtener(db: Session) -> Catalogo:
+    """Catálogo vigente; lo carga (una sola vez aunque haya peticiones concurrentes) si no hay."""
+    return _cache.obtener("actual", lambda: cargar(db))
+
+
+def invalidar() -> None:
+    """Descarta el catálogo en todos los workers; lo llaman los endpoints que crean o modifican ubicaciones."""
+    _cache.invalidar()
+
+
+def responder(request: Request, contenido, catalogo: Catalogo, campos: Optional[frozenset] = None) -> Response:
+    """
+    JSON con ETag del catálogo, o 304 si el cliente ya tiene esa versión.
+    `campos` proyecta cada elemento de una lista (o el dict) a esos campos.
+    """
+    headers = {"ETag": catalogo.etag, "Cache-Control": "no-cache"}
+    if etag.coincide(request.headers.get("if-none-match"), catalogo.etag):
+        return Response(status_code=304, headers=headers)
+    if campos is not None:
+        if isinstance(contenido, list):
+            contenido = [project(item, campos) for item in contenido]
+        else:
+            contenido = project(contenido, campos)
+    return ORJSONResponse(contenido, headers=headers)
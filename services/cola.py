@@ -0,0 +1,103 @@
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.models import Area, Cama, EstadoSolicitud, Solicitud
+from services import cache
+
+SLA_MINUTOS_DEFAULT = int(os.getenv("SLA_MINUTOS_DEFAULT", "240"))
+# Fracción del SLA desde la que una solicitud se marca "por_vencer".
+SLA_UMBRAL_AVISO = float(os.getenv("SLA_UMBRAL_AVISO", "0.8"))
+# Muchos jefes de área refrescando la cola comparten la misma consulta durante
+# este intervalo; la espera y el estado SLA se recalculan en cada respuesta.
+CACHE_SECONDS = float(os.getenv("COLA_CACHE_SECONDS", "5"))
+LIMITE_DEFAULT = 200
+
+# Con un backend compartido (CACHE_BACKEND) todos los workers usan la misma consulta.
+_cache = cache.Cache("cola", CACHE_SECONDS)
+
+
+def _cargar(db: Session, id_area: Optional[int], limite: int) -> list:
+    stmt = (
+        select(
+            Solicitud.id_solicitud.label("id"),
+            Solicitud.id_cama,
+            Solicitud.id_area,
+            Solicitud.tipo,
+            Solicitud.estado_actual.label("estado"),
+            Solicitud.fecha_creacion,
+            Solicitud.fecha_actualizacion,
+            Solicitud.inicio_sla,
+            Solicitud.escalada,
+            Cama.identificador_qr,
+            Area.sla_minutos,
+        )
+        .join(Cama, Cama.id_cama == Solicitud.id_cama)
+        .join(Area, Area.id_area == Solicitud.id_area)
+        # Mismo predicado que el índice parcial ix_solicitud_cola_area.
+        .where(Solicitud.estado_actual != EstadoSolicitud.CERRADA)
+        .order_by(Solicitud.fecha_creacion.asc())
+        .limit(limite)
+    )
+    if id_area is not None:
+        stmt = stmt.where(Solicitud.id_area == id_area)
+    keys = None
+    filas = []
+    for row in db.execute(stmt):
+        if keys is None:
+            keys = list(row._fields)
+        filas.append(dict(zip(keys, row)))
+    # Sólo tipos JSON (fechas ISO, enums como texto): lo mismo se guarda y se
+    # lee en cualquier backend de la caché.
+    return orjson.loads(orjson.dumps(filas))
+
+
+def _abiertas(db: Session, id_area: Optional[int], limite: int) -> list:
+    return _cache.obtener(f"{id_area}:{limite}", lambda: _cargar(db, id_area, limite))
+
+
+def invalidar() -> None:
+    """Vacía la caché en todos los workers (tests y cambios de SLA)."""
+    _cache.invalidar()
+
+
+def _estado_sla(espera_minutos: float, sla_minutos: int) -> str:
+    if espera_minutos >= sla_minutos:
+        return "vencida"
+    if espera_minutos >= sla_minutos * SLA_UMBRAL_AVISO:
+        return "por_vencer"
+    return "en_plazo"
+
+
+def cola(db: Session, id_area: Optional[int], limite: int = LIMITE_DEFAULT, ahora: Optional[datetime] = None) -> dict:
+    """Solicitudes abiertas del área (o de todas), la más antigua primero, con espera y SLA."""
+    ahora = ahora or datetime.now(timezone.utc)
+    solicitudes = []
+    vencidas = 0
+    for fila in _abiertas(db, id_area, limite):
+        # Mismo reloj que el escalamiento: desde la creación o la última reapertura.
+        inicio = datetime.fromisoformat(fila["inicio_sla"])
+        if inicio.tzinfo is None:  # SQLite devuelve fechas naive (UTC)
+            inicio = inicio.replace(tzinfo=timezone.utc)
+        espera = max(0.0, (ahora - inicio).total_seconds() / 60)
+        sla = fila["sla_minutos"] or SLA_MINUTOS_DEFAULT
+        estado_sla = _estado_sla(espera, sla)
+        vencidas += estado_sla == "vencida"
+        solicitudes.append({
+            **fila,
+            "sla_minutos": sla,
+            "espera_minutos": int(espera),
+            "sla_restante_minutos": int(sla - espera),
+            "sla_estado": estado_sla,
+        })
+    return {
+        "generado_en": ahora,
+        "id_area": id_area,
+        "total": len(solicitudes),
+        "vencidas": vencidas,
+        "solicitudes": solicitudes,
+    }
@@ -0,0 +1,102 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, update
+
+from models.models import Area, EstadoSolicitud, Solicitud
+from services import outbox
+from services.cola import SLA_MINUTOS_DEFAULT
+from services.telemetry import REGISTRY
+
+logger = logging.getLogger("escalamiento")
+
+INTERVALO_SECONDS = float(os.getenv("ESCALAMIENTO_INTERVALO_SECONDS", "60"))
+LOTE = int(os.getenv("ESCALAMIENTO_LOTE", "200"))
+# Tope de lotes por ejecución: lo que quede se escala en la siguiente.
+MAX_LOTES = int(os.getenv("ESCALAMIENTO_MAX_LOTES", "50"))
+
+ESCALADAS_TOTAL = REGISTRY.counter(
+    "solicitudes_escaladas_total", "Solicitudes marcadas como escaladas por SLA vencido.", ("id_area",)
+)
+
+
+def escalar_vencidas(
+    session_factory,
+    ahora: Optional[datetime] = None,
+    lote: int = LOTE,
+    max_lotes: int = MAX_LOTES,
+) -> int:
+    """
+    Marca como escaladas las solicitudes abiertas que superaron el SLA de su
+    área y encola `solicitud.escalada` en el outbox por cada una.
+
+    El SLA corre desde `inicio_sla` (la creación o la última reapertura).
+    Recorre área por área con el índice parcial ix_solicitud_por_escalar
+    (id_area, inicio_sla), en lotes de `lote` filas, cada uno en su propia
+    transacción corta; FOR UPDATE SKIP LOCKED evita pisarse con otra instancia.
+    """
+    ahora = ahora or datetime.now(timezone.utc)
+    with session_factory() as db:
+        areas = db.execute(select(Area.id_area, Area.sla_minutos).order_by(Area.id_area)).all()
+
+    total = 0
+    lotes = 0
+    cortado = False
+    for id_area, sla_minutos in areas:
+        if lotes >= max_lotes:
+            cortado = True
+            break
+        umbral = ahora - timedelta(minutes=sla_minutos or SLA_MINUTOS_DEFAULT)
+        while True:
+            lotes += 1
+            with session_factory() as db, db.begin():
+                filas = db.execute(
+                    select(
+                        Solicitud.id_solicitud,
+                        Solicitud.id_cama,
+                        Solicitud.tipo,
+                        Solicitud.fecha_creacion,
+                        Solicitud.inicio_sla,
+                    )
+                    .where(
+                        Solicitud.id_area == id_area,
+                        Solicitud.estado_actual != EstadoSolicitud.CERRADA,
+                        ~Solicitud.escalada,
+                        Solicitud.inicio_sla < umbral,
+                    )
+                    .order_by(Solicitud.inicio_sla)
+                    .limit(lote)
+                    .with_for_update(skip_locked=True)
+                ).all()
+                if filas:
+                    db.execute(
+                        update(Solicitud)
+                        .where(Solicitud.id_solicitud.in_([f.id_solicitud for f in filas]))
+                        .values(escalada=True, fecha_escalamiento=ahora)
+                    )
+                    # En la misma transacción: el relay del outbox avisa sólo de lo que quedó guardado.
+                    outbox.encolar_varios(db, "solicitud.escalada", [
+                        {
+                            "id_solicitud": f.id_solicitud,
+                            "id_area": id_area,
+                            "id_cama": f.id_cama,
+                            "tipo": f.tipo,
+                            "fecha_creacion": f.fecha_creacion.isoformat(),
+                            "inicio_sla": f.inicio_sla.isoformat(),
+                            "sla_minutos": sla_minutos or SLA_MINUTOS_DEFAULT,
+                        }
+                        for f in filas
+                    ])
+            if filas:
+                ESCALADAS_TOTAL.inc(str(id_area), amount=len(filas))
+            total += len(filas)
+            if len(filas) < lote:
+                break
+            if lotes >= max_lotes:
+                cortado = True
+                break
+    if cortado:
+        logger.warning("Escalamiento cortado tras %s lotes; continúa en la próxima ejecución", lotes)
+    return total
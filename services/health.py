@@ -0,0 +1,173 @@
+"""
+Chequeos de liveness/readiness para el orquestador.
+
+`/healthz` sólo confirma que el proceso responde. `/readyz` revisa, en este
+worker, que la BD conteste dentro de un timeout corto, que el pool no tenga
+una cola de espera larga y que el esquema esté en el head de Alembic. Cuando
+el pool está saturado se responde "no listo" sin tocar la BD, así la
+plataforma deja de enrutar a la instancia sobrecargada en vez de encolarle
+más trabajo.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from services.telemetry import REGISTRY
+
+logger = logging.getLogger("health")
+
+PING_TIMEOUT_SECONDS = float(os.getenv("READYZ_DB_TIMEOUT_SECONDS", "2"))
+# Demanda del pool = (conexiones en uso + hilos esperando) / capacidad. Sobre
+# este umbral la cola de espera ya es más larga que el pool completo.
+POOL_SATURACION_MAX = float(os.getenv("READYZ_POOL_SATURACION_MAX", "2"))
+VERIFICAR_MIGRACIONES = os.getenv("READYZ_VERIFICAR_MIGRACIONES", "1") not in ("0", "false", "False")
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+POOL_EN_USO = REGISTRY.gauge("db_pool_conexiones_en_uso", "Conexiones del pool prestadas en este worker.")
+POOL_ESPERANDO = REGISTRY.gauge("db_pool_esperando", "Hilos esperando una conexión del pool en este worker.")
+READY = REGISTRY.gauge("readyz_listo", "1 si el último /readyz de este worker respondió listo.")
+
+_apagando = threading.Event()
+_head: Optional[str] = None
+_migraciones_al_dia = False
+_aviso_sin_version = False
+_sondas: Dict[str, Engine] = {}
+_sondas_lock = threading.Lock()
+
+
+def marcar_apagando() -> None:
+    """A partir de aquí /readyz responde 503 para drenar el tráfico antes de salir."""
+    _apagando.set()
+
+
+def reiniciar() -> None:
+    global _head, _migraciones_al_dia, _aviso_sin_version
+    _apagando.clear()
+    _head = None
+    _migraciones_al_dia = False
+    _aviso_sin_version = False
+    with _sondas_lock:
+        for sonda in _sondas.values():
+            sonda.dispose()
+        _sondas.clear()
+
+
+def estado_pool(engine) -> dict:
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {"ok": True}  # StaticPool/NullPool: no hay cola que medir
+    capacidad = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+    en_uso = pool.checkedout()
+    esperando = pool.waiting() if hasattr(pool, "waiting") else 0
+    saturacion = (en_uso + esperando) / capacidad if capacidad else 0.0
+    POOL_EN_USO.set(en_uso)
+    POOL_ESPERANDO.set(esperando)
+    return {
+        "ok": saturacion <= POOL_SATURACION_MAX,
+        "capacidad": capacidad,
+        "en_uso": en_uso,
+        "esperando": esperando,
+        "saturacion": round(saturacion, 2),
+    }
+
+
+def head_alembic() -> str:
+    global _head
+    if _head is None:
+        from alembic.config import Config
+        from alembic.script import ScriptDirectory
+
+        _head = ",".join(sorted(ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_heads()))
+    return _head
+
+
+def _engine_sonda(engine) -> Engine:
+    """
+    Engine propio del chequeo (NullPool) con los timeouts en la conexión
+    misma: no ocupa un cupo del pool de la app y, si la BD no responde, el
+    driver corta a los PING_TIMEOUT_SECONDS en vez de dejar un hilo colgado.
+    """
+    clave = engine.url.render_as_string(hide_password=False)
+    with _sondas_lock:
+        sonda = _sondas.get(clave)
+        if sonda is None:
+            if engine.dialect.name == "postgresql":
+                # libpq sólo acepta segundos enteros y sube a 2 cualquier valor menor.
+                connect_args = {
+                    "connect_timeout": max(2, math.ceil(PING_TIMEOUT_SECONDS)),
+                    "options": f"-c statement_timeout={int(PING_TIMEOUT_SECONDS * 1000)}",
+                }
+            elif engine.dialect.name == "sqlite":
+                connect_args = {"timeout": PING_TIMEOUT_SECONDS}
+            else:
+                connect_args = {}
+            sonda = _sondas[clave] = create_engine(engine.url, poolclass=NullPool, connect_args=connect_args)
+        return sonda
+
+
+def ping_bd(engine) -> dict:
+    """SELECT 1 (y la versión de Alembic) con tope de PING_TIMEOUT_SECONDS."""
+    resultado: dict = {}
+    try:
+        inicio = time.perf_counter()
+        with _engine_sonda(engine).connect() as conn:
+            conn.execute(text("SELECT 1"))
+            resultado["ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+            if VERIFICAR_MIGRACIONES and not _migraciones_al_dia:
+                # Sólo la ausencia de la tabla cuenta como "sin versionar"; cualquier
+                # otro error al leerla deja al worker no listo.
+                if not inspect(conn).has_table("alembic_version"):
+                    resultado["version"] = None
+                else:
+                    try:
+                        filas = conn.execute(text("SELECT version_num FROM alembic_version")).scalars().all()
+                        resultado["version"] = ",".join(sorted(filas)) or None
+                    except Exception as exc:  # noqa: BLE001
+                        resultado["error_version"] = str(exc).splitlines()[0][:200]
+    except Exception as exc:  # noqa: BLE001
+        resultado["error"] = str(exc).splitlines()[0][:200]
+    resultado["ok"] = "error" not in resultado
+    return resultado
+
+
+def estado_migraciones(version: Optional[str], error: Optional[str] = None) -> dict:
+    global _migraciones_al_dia, _aviso_sin_version
+    if not VERIFICAR_MIGRACIONES or _migraciones_al_dia:
+        return {"ok": True}
+    esperada = head_alembic()
+    if error is not None:
+        return {"ok": False, "esperada": esperada, "error": error}
+    if version is None:
+        # BD nunca estampada por Alembic (creada a mano o con create_all): no
+        # se puede comparar. Se avisa en vez de bloquear todos los deploys.
+        if not _aviso_sin_version:
+            logger.warning("La BD no tiene alembic_version; no se verifica que el esquema esté en %s", esperada)
+            _aviso_sin_version = True
+        return {"ok": True, "actual": None, "esperada": esperada, "advertencia": "esquema sin versionar"}
+    # Las migraciones no retroceden con la app corriendo: basta verlo una vez.
+    _migraciones_al_dia = version == esperada
+    return {"ok": _migraciones_al_dia, "actual": version, "esperada": esperada}
+
+
+def readiness(engine) -> dict:
+    if _apagando.is_set():
+        READY.set(0)
+        return {"listo": False, "checks": {"apagando": {"ok": False}}}
+    checks = {"pool": estado_pool(engine)}
+    if checks["pool"]["ok"]:
+        bd = ping_bd(engine)
+        version = bd.pop("version", None)
+        error_version = bd.pop("error_version", None)
+        checks["bd"] = bd
+        if bd["ok"]:
+            checks["migraciones"] = estado_migraciones(version, error_version)
+    listo = all(c["ok"] for c in checks.values())
+    READY.set(1 if listo else 0)
+    return {"listo": listo, "checks": checks}
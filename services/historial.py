@@ -0,0 +1,431 @@
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Integer, and_, any_, bindparam, case, false, func, insert, null, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models.models import (
+    EstadoSolicitud,
+    RollupEstadoDiario,
+    RollupMarca,
+    RollupPrimeraRespuestaDiaria,
+    Solicitud,
+    SolicitudEvento,
+)
+from services import outbox
+from services.telemetry import REGISTRY
+
+logger = logging.getLogger("historial")
+
+INTERVALO_SECONDS = float(os.getenv("ROLLUP_INTERVALO_SECONDS", "60"))
+LOTE = int(os.getenv("ROLLUP_LOTE", "5000"))
+MAX_LOTES = int(os.getenv("ROLLUP_MAX_LOTES", "20"))
+# Los eventos más recientes que esto esperan a la próxima pasada, para no
+# saltarse IDs menores de transacciones que todavía no hacen commit.
+MARGEN_SECONDS = float(os.getenv("ROLLUP_MARGEN_SECONDS", "30"))
+MARCA = "historial"
+# SolicitudEvento.tipo
+TIPO_ESTADO = "estado"
+TIPO_AGRUPACION = "agrupacion"
+
+EVENTOS_ACUMULADOS = REGISTRY.counter(
+    "historial_eventos_acumulados_total", "Eventos de estado acumulados en los rollups diarios."
+)
+
+
+def _utc(fecha: datetime) -> datetime:
+    # SQLite devuelve fechas naive (UTC).
+    return fecha.replace(tzinfo=timezone.utc) if fecha.tzinfo is None else fecha
+
+
+def _segundos(desde: Optional[datetime], hasta: datetime) -> Optional[float]:
+    if desde is None:
+        return None
+    return max(0.0, (_utc(hasta) - _utc(desde)).total_seconds())
+
+
+def inicios_de_estado(db: Session, ids: Iterable[int]) -> Dict[int, datetime]:
+    """Fecha del último evento de cada solicitud: desde cuándo está en su estado actual."""
+    ids = list(ids)
+    if not ids:
+        return {}
+    return dict(
+        db.execute(
+            select(SolicitudEvento.id_solicitud, func.max(SolicitudEvento.fecha))
+            .where(SolicitudEvento.id_solicitud.in_(ids), SolicitudEvento.tipo == TIPO_ESTADO)
+            .group_by(SolicitudEvento.id_solicitud)
+        ).all()
+    )
+
+
+def _inicio_sin_historial(
+    anterior: EstadoSolicitud, fecha_creacion: datetime, fecha_actualizacion: Optional[datetime]
+) -> datetime:
+    # Solicitudes anteriores al historial: la creación es exacta para
+    # "pendiente"; para el resto, el último cambio registrado.
+    if anterior == EstadoSolicitud.PENDIENTE:
+        return fecha_creacion
+    return fecha_actualizacion or fecha_creacion
+
+
+def _payload_estado(id_solicitud, id_area, anterior, nuevo, fecha: datetime) -> dict:
+    return {
+        "id_solicitud": id_solicitud,
+        "id_area": id_area,
+        "estado_anterior": anterior.value if anterior is not None else None,
+        "estado_nuevo": nuevo.value,
+        "fecha": _utc(fecha).isoformat(),
+    }
+
+
+def registrar_creacion(db: Session, solicitud: Solicitud) -> SolicitudEvento:
+    """
+    Evento inicial (sin estado anterior) de una solicitud recién agregada a la
+    sesión, más `solicitud.creada` en el outbox.
+    """
+    db.flush()  # id_solicitud para el payload del outbox
+    evento = SolicitudEvento(
+        solicitud=solicitud,
+        id_area=solicitud.id_area,
+        estado_anterior=None,
+        estado_nuevo=solicitud.estado_actual,
+        fecha=solicitud.fecha_creacion,
+    )
+    db.add(evento)
+    outbox.encolar(db, "solicitud.creada", {
+        **_payload_estado(
+            solicitud.id_solicitud, solicitud.id_area, None, solicitud.estado_actual, solicitud.fecha_creacion
+        ),
+        "id_cama": solicitud.id_cama,
+        "tipo": solicitud.tipo,
+    })
+    return evento
+
+
+def registrar_agrupacion(db: Session, solicitud: Solicitud, ahora: datetime) -> SolicitudEvento:
+    """
+    Evento de auditoría cuando otra solicitud equivalente se fusiona en
+    `solicitud`, más `solicitud.agrupada` en el outbox. No cambia el estado:
+    no cuenta como salida en los rollups ni mueve el inicio del estado vigente.
+    """
+    evento = SolicitudEvento(
+        id_solicitud=solicitud.id_solicitud,
+        id_area=solicitud.id_area,
+        tipo=TIPO_AGRUPACION,
+        estado_anterior=solicitud.estado_actual,
+        estado_nuevo=solicitud.estado_actual,
+        fecha=ahora,
+    )
+    db.add(evento)
+    outbox.encolar(db, "solicitud.agrupada", {
+        **_payload_estado(
+            solicitud.id_solicitud, solicitud.id_area, solicitud.estado_actual, solicitud.estado_actual, ahora
+        ),
+        "id_cama": solicitud.id_cama,
+        "tipo": solicitud.tipo,
+    })
+    return evento
+
+
+def registrar_transicion(
+    db: Session,
+    solicitud: Solicitud,
+    estado_nuevo: EstadoSolicitud,
+    ahora: datetime,
+    inicio_estado: Optional[datetime] = None,
+) -> Optional[SolicitudEvento]:
+    """
+    Aplica el cambio de estado a `solicitud` y agrega su evento (y el de
+    outbox) a la sesión, sin hacer commit: todo queda en la transacción del
+    llamador.
+    `inicio_estado` evita la consulta cuando ya se obtuvo con inicios_de_estado().
+    Devuelve None si la solicitud ya estaba en ese estado.
+    """
+    anterior = solicitud.estado_actual
+    if anterior == estado_nuevo:
+        return None
+
+    if inicio_estado is None:
+        inicio_estado = inicios_de_estado(db, [solicitud.id_solicitud]).get(solicitud.id_solicitud)
+    if inicio_estado is None:
+        inicio_estado = _inicio_sin_historial(anterior, solicitud.fecha_creacion, solicitud.fecha_actualizacion)
+
+    evento = SolicitudEvento(
+        id_solicitud=solicitud.id_solicitud,
+        id_area=solicitud.id_area,
+        estado_anterior=anterior,
+        estado_nuevo=estado_nuevo,
+        fecha=ahora,
+        segundos_en_estado=_segundos(inicio_estado, ahora),
+    )
+    if anterior == EstadoSolicitud.PENDIENTE and solicitud.fecha_primera_respuesta is None:
+        solicitud.fecha_primera_respuesta = ahora
+        evento.segundos_primera_respuesta = _segundos(solicitud.fecha_creacion, ahora)
+
+    if anterior == EstadoSolicitud.CERRADA:
+        # Reapertura: el SLA vuelve a correr y la solicitud puede escalarse otra vez.
+        solicitud.escalada = False
+        solicitud.fecha_escalamiento = None
+        solicitud.inicio_sla = ahora
+
+    solicitud.estado_actual = estado_nuevo
+    solicitud.fecha_actualizacion = ahora
+    solicitud.fecha_cierre = ahora if estado_nuevo == EstadoSolicitud.CERRADA else None
+    db.add(evento)
+    outbox.encolar(
+        db,
+        "solicitud.estado_actualizado",
+        _payload_estado(solicitud.id_solicitud, solicitud.id_area, anterior, estado_nuevo, ahora),
+    )
+    return evento
+
+
+def registrar_transiciones(
+    db: Session,
+    ids: Iterable[int],
+    estado_nuevo: EstadoSolicitud,
+    ahora: datetime,
+    id_area: Optional[int] = None,
+    columnas: Optional[dict] = None,
+) -> list:
+    """
+    Cambio de estado masivo: en Postgres un solo UPDATE ... FROM (SELECT ...
+    FOR UPDATE) RETURNING que trae el estado anterior de cada fila, más un
+    INSERT de todos sus eventos, en la transacción del llamador. Se omiten las
+    solicitudes que no existen, son de otra área (`id_area`) o ya están en
+    `estado_nuevo`.
+    Devuelve un dict por fila actualizada con `columnas` ({nombre: columna}).
+    """
+    ids = sorted(set(ids))
+    columnas = columnas or {"id": Solicitud.id_solicitud}
+    if not ids:
+        return []
+    # SQLite no admite columnas del FROM en RETURNING: va fila por fila.
+    if db.get_bind().dialect.name != "postgresql":
+        return _registrar_transiciones_orm(db, ids, estado_nuevo, ahora, id_area, columnas)
+
+    salida, eventos = [], []
+    for fila in db.execute(_update_transiciones(ids, estado_nuevo, ahora, id_area, columnas)).mappings():
+        anterior = fila["_estado_anterior"]
+        inicio = fila["_inicio_estado"] or _inicio_sin_historial(
+            anterior, fila["_fecha_creacion"], fila["_actualizacion_anterior"]
+        )
+        eventos.append({
+            "id_solicitud": fila["_id_solicitud"],
+            "id_area": fila["_id_area"],
+            "estado_anterior": anterior,
+            "estado_nuevo": estado_nuevo,
+            "fecha": ahora,
+            "segundos_en_estado": _segundos(inicio, ahora),
+            "segundos_primera_respuesta": _segundos(fila["_fecha_creacion"], ahora) if fila["_es_primera"] else None,
+        })
+        salida.append({nombre: fila[nombre] for nombre in columnas})
+    if eventos:
+        db.execute(insert(SolicitudEvento), eventos)
+        outbox.encolar_varios(db, "solicitud.estado_actualizado", [
+            _payload_estado(e["id_solicitud"], e["id_area"], e["estado_anterior"], estado_nuevo, ahora)
+            for e in eventos
+        ])
+    return salida
+
+
+def _update_transiciones(ids: list, estado_nuevo: EstadoSolicitud, ahora: datetime, id_area, columnas: dict):
+    """UPDATE ... FROM (SELECT ... FOR UPDATE) ... RETURNING de registrar_transiciones (Postgres)."""
+    previa = (
+        select(
+            Solicitud.id_solicitud,
+            Solicitud.estado_actual.label("estado_anterior"),
+            Solicitud.fecha_actualizacion.label("actualizacion_anterior"),
+            Solicitud.fecha_primera_respuesta.label("primera_respuesta_anterior"),
+            select(func.max(SolicitudEvento.fecha))
+            .where(SolicitudEvento.id_solicitud == Solicitud.id_solicitud, SolicitudEvento.tipo == TIPO_ESTADO)
+            .scalar_subquery()
+            .label("inicio_estado"),
+        )
+        .where(
+            # = ANY(:ids) con un solo parámetro: el texto SQL no cambia con la cantidad de IDs.
+            Solicitud.id_solicitud == any_(bindparam("ids", ids, type_=postgresql.ARRAY(Integer))),
+            Solicitud.estado_actual != estado_nuevo,
+        )
+        # Bloqueo en orden de ID: dos cambios masivos solapados no se bloquean mutuamente.
+        .order_by(Solicitud.id_solicitud)
+        .with_for_update(of=Solicitud)
+    )
+    if id_area is not None:
+        previa = previa.where(Solicitud.id_area == id_area)
+    previa = previa.subquery("previa")
+
+    es_primera = and_(
+        previa.c.estado_anterior == EstadoSolicitud.PENDIENTE,
+        previa.c.primera_respuesta_anterior.is_(None),
+    )
+    valores = dict(
+        estado_actual=estado_nuevo,
+        fecha_actualizacion=ahora,
+        fecha_cierre=ahora if estado_nuevo == EstadoSolicitud.CERRADA else None,
+        fecha_primera_respuesta=case((es_primera, ahora), else_=Solicitud.fecha_primera_respuesta),
+        # Un UPDATE Core no pasa por version_id_col: se incrementa a mano.
+        version=Solicitud.version + 1,
+    )
+    if estado_nuevo != EstadoSolicitud.CERRADA:
+        # Las que se reabren vuelven a correr el SLA y pueden escalarse otra vez.
+        reabre = previa.c.estado_anterior == EstadoSolicitud.CERRADA
+        valores.update(
+            escalada=case((reabre, false()), else_=Solicitud.escalada),
+            fecha_escalamiento=case((reabre, null()), else_=Solicitud.fecha_escalamiento),
+            inicio_sla=case((reabre, ahora), else_=Solicitud.inicio_sla),
+        )
+    return (
+        update(Solicitud)
+        .where(Solicitud.id_solicitud == previa.c.id_solicitud)
+        .values(**valores)
+        .returning(
+            *(columna.label(nombre) for nombre, columna in columnas.items()),
+            Solicitud.id_solicitud.label("_id_solicitud"),
+            Solicitud.id_area.label("_id_area"),
+            Solicitud.fecha_creacion.label("_fecha_creacion"),
+            previa.c.estado_anterior.label("_estado_anterior"),
+            previa.c.actualizacion_anterior.label("_actualizacion_anterior"),
+            previa.c.inicio_estado.label("_inicio_estado"),
+            es_primera.label("_es_primera"),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _registrar_transiciones_orm(db, ids, estado_nuevo, ahora, id_area, columnas) -> list:
+    """Otros motores: fila por fila con registrar_transicion(), misma semántica."""
+    query = (
+        db.query(Solicitud)
+        .filter(Solicitud.id_solicitud.in_(ids), Solicitud.estado_actual != estado_nuevo)
+        .order_by(Solicitud.id_solicitud)
+        .with_for_update()
+    )
+    if id_area is not None:
+        query = query.filter(Solicitud.id_area == id_area)
+    solicitudes = query.all()
+    inicios = inicios_de_estado(db, [s.id_solicitud for s in solicitudes])
+    for solicitud in solicitudes:
+        registrar_transicion(db, solicitud, estado_nuevo, ahora, inicios.get(solicitud.id_solicitud))
+    db.flush()
+    return [
+        {nombre: getattr(s, columna.key) for nombre, columna in columnas.items()}
+        for s in solicitudes
+    ]
+
+
+def _sumar(db: Session, model, filas: list, claves: tuple, sumas: tuple) -> None:
+    """INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x, en un solo executemany."""
+    if not filas:
+        return
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "postgresql":
+        insert_upsert = postgresql.insert
+    elif dialecto == "sqlite":
+        insert_upsert = sqlite.insert
+    else:
+        for fila in filas:
+            actual = db.get(model, tuple(fila[c] for c in claves))
+            if actual is None:
+                db.add(model(**fila))
+            else:
+                for c in sumas:
+                    setattr(actual, c, getattr(actual, c) + fila[c])
+        return
+    tabla = model.__table__
+    stmt = insert_upsert(tabla)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(claves),
+        set_={c: tabla.c[c] + stmt.excluded[c] for c in sumas},
+    )
+    db.execute(stmt, filas)
+
+
+def acumular_rollups(
+    session_factory,
+    ahora: Optional[datetime] = None,
+    lote: int = LOTE,
+    max_lotes: int = MAX_LOTES,
+    margen_seconds: float = MARGEN_SECONDS,
+) -> int:
+    """
+    Suma a los rollups diarios los eventos posteriores a la marca, en lotes de
+    `lote` eventos; cada lote actualiza rollups y marca en una sola transacción,
+    así que un corte a mitad nunca cuenta un evento dos veces.
+    """
+    corte = (ahora or datetime.now(timezone.utc)) - timedelta(seconds=margen_seconds)
+    total = 0
+    for _ in range(max_lotes):
+        with session_factory() as db, db.begin():
+            marca = db.get(RollupMarca, MARCA, with_for_update=True)
+            if marca is None:
+                marca = RollupMarca(nombre=MARCA, ultimo_id=0)
+                db.add(marca)
+            eventos = db.execute(
+                select(
+                    SolicitudEvento.id_evento,
+                    SolicitudEvento.id_area,
+                    SolicitudEvento.estado_anterior,
+                    SolicitudEvento.fecha,
+                    SolicitudEvento.segundos_en_estado,
+                    SolicitudEvento.segundos_primera_respuesta,
+                )
+                .where(SolicitudEvento.id_evento > marca.ultimo_id)
+                .order_by(SolicitudEvento.id_evento)
+                .limit(lote)
+            ).all()
+            leidos = len(eventos)
+            # Se corta en el primer evento reciente aunque haya otros más viejos
+            # después: la marca sólo avanza sobre un prefijo continuo de IDs.
+            for i, e in enumerate(eventos):
+                if _utc(e.fecha) >= corte:
+                    eventos = eventos[:i]
+                    break
+            if not eventos:
+                break
+
+            por_estado = defaultdict(lambda: [0, 0.0])
+            primeras = defaultdict(lambda: [0, 0.0])
+            for e in eventos:
+                dia = _utc(e.fecha).date()
+                if e.estado_anterior is not None and e.segundos_en_estado is not None:
+                    acc = por_estado[(dia, e.id_area, e.estado_anterior)]
+                    acc[0] += 1
+                    acc[1] += e.segundos_en_estado
+                if e.segundos_primera_respuesta is not None:
+                    acc = primeras[(dia, e.id_area)]
+                    acc[0] += 1
+                    acc[1] += e.segundos_primera_respuesta
+
+            _sumar(
+                db,
+                RollupEstadoDiario,
+                [
+                    {"dia": d, "id_area": a, "estado": est, "salidas": n, "segundos": s}
+                    for (d, a, est), (n, s) in por_estado.items()
+                ],
+                ("dia", "id_area", "estado"),
+                ("salidas", "segundos"),
+            )
+            _sumar(
+                db,
+                RollupPrimeraRespuestaDiaria,
+                [
+                    {"dia": d, "id_area": a, "cantidad": n, "segundos": s}
+                    for (d, a), (n, s) in primeras.items()
+                ],
+                ("dia", "id_area"),
+                ("cantidad", "segundos"),
+            )
+            marca.ultimo_id = eventos[-1].id_evento
+        total += len(eventos)
+        EVENTOS_ACUMULADOS.inc(amount=len(eventos))
+        if len(eventos) < leidos or leidos < lote:
+            break
+    else:
+        logger.warning("Rollup del historial cortado tras %s lotes; continúa en la próxima ejecución", max_lotes)
+    return total
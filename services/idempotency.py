@@ -0,0 +1,127 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.models import IdempotenciaSolicitud
+
+
+class IdempotencyConflict(Exception):
+    """La misma Idempotency-Key se reutilizó con un cuerpo distinto."""
+
+
+class IdempotencyStore:
+    """
+    Respuestas por Idempotency-Key en la tabla idempotencia_solicitud, con TTL.
+
+    La PK de la tabla es la clave, así que con varios workers sólo uno logra
+    reservarla; la primera petición queda "en vuelo" y los reintentos, caigan
+    en el worker que caigan, esperan a que termine y reciben la misma
+    respuesta en lugar de insertar otra fila. Cada operación hace commit en la
+    sesión que recibe para que los demás workers la vean de inmediato.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 86400,
+        wait_seconds: float = 30,
+        poll_seconds: float = 0.05,
+        purge_every: int = 500,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self.purge_every = purge_every
+        self._reservas = 0
+        self._lock = threading.Lock()
+
+    def begin(self, db: Session, key: str, fingerprint: str) -> Optional[dict]:
+        """
+        Reserva la clave. Retorna None si el llamador debe procesar la petición,
+        o la respuesta guardada si es un reintento de una petición ya resuelta.
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            ahora = _ahora()
+            try:
+                # En vuelo vence a los wait_seconds: si el worker muere a mitad
+                # de camino, un reintento posterior puede retomar la clave.
+                db.add(IdempotenciaSolicitud(
+                    clave=key, huella=fingerprint, expira_en=ahora + timedelta(seconds=self.wait_seconds)
+                ))
+                db.commit()
+                self._purgar_si_toca(db, ahora)
+                return None
+            except IntegrityError:
+                db.rollback()
+
+            vencida = db.execute(
+                delete(IdempotenciaSolicitud).where(
+                    IdempotenciaSolicitud.clave == key, IdempotenciaSolicitud.expira_en <= ahora
+                )
+            ).rowcount
+            fila = None if vencida else db.execute(
+                select(IdempotenciaSolicitud.huella, IdempotenciaSolicitud.respuesta)
+                .where(IdempotenciaSolicitud.clave == key)
+            ).first()
+            # Cierra la transacción antes de esperar para no retener la conexión.
+            db.commit()
+            if fila is None:
+                continue  # vencida o abortada entre medio: se vuelve a intentar reservar
+
+            if fila.huella != fingerprint:
+                raise IdempotencyConflict(key)
+
+            if fila.respuesta is not None:
+                return fila.respuesta
+
+            # Otra petición con la misma clave sigue en curso (en este u otro worker).
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Petición con Idempotency-Key {key!r} aún en curso")
+            time.sleep(self.poll_seconds)
+
+    def complete(self, db: Session, key: str, response: dict) -> None:
+        db.execute(
+            update(IdempotenciaSolicitud)
+            .where(IdempotenciaSolicitud.clave == key)
+            .values(respuesta=response, expira_en=_ahora() + timedelta(seconds=self.ttl_seconds))
+        )
+        db.commit()
+
+    def abort(self, db: Session, key: str) -> None:
+        """Libera la clave tras un error para que un reintento pueda procesarse."""
+        db.rollback()
+        db.execute(
+            delete(IdempotenciaSolicitud).where(
+                IdempotenciaSolicitud.clave == key, IdempotenciaSolicitud.respuesta.is_(None)
+            )
+        )
+        db.commit()
+
+    def _purgar_si_toca(self, db: Session, ahora: datetime) -> None:
+        # Cada purge_every reservas se borran las claves vencidas de todos los workers.
+        with self._lock:
+            self._reservas += 1
+            if self._reservas % self.purge_every:
+                return
+        db.execute(delete(IdempotenciaSolicitud).where(IdempotenciaSolicitud.expira_en <= ahora))
+        db.commit()
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def fingerprint(raw: str) -> str:
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+store = IdempotencyStore(
+    ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")),
+)
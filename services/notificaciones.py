@@ -0,0 +1,29 @@
+import logging
+import threading
+from typing import Callable, List
+
+logger = logging.getLogger("notificaciones")
+
+_suscriptores: List[Callable[[str, dict], None]] = []
+_lock = threading.Lock()
+
+
+def suscribir(fn: Callable[[str, dict], None]) -> None:
+    with _lock:
+        _suscriptores.append(fn)
+
+
+def desuscribir(fn: Callable[[str, dict], None]) -> None:
+    with _lock:
+        if fn in _suscriptores:
+            _suscriptores.remove(fn)
+
+
+def emitir(evento: str, payload: dict) -> None:
+    """Registra el evento y lo entrega a los suscriptores; un suscriptor que falla no afecta al resto."""
+    logger.info("%s %s", evento, payload)
+    for fn in list(_suscriptores):
+        try:
+            fn(evento, payload)
+        except Exception:
+            logger.exception("Suscriptor de notificaciones falló para %s", evento)
@@ -0,0 +1,266 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from models.models import EventoOutbox
+from services import notificaciones
+from services.telemetry import REGISTRY
+
+logger = logging.getLogger("outbox")
+
+INTERVALO_SECONDS = float(os.getenv("OUTBOX_INTERVALO_SECONDS", "2"))
+LOTE = int(os.getenv("OUTBOX_LOTE", "200"))
+MAX_LOTES = int(os.getenv("OUTBOX_MAX_LOTES", "50"))
+LOG_PATH = os.getenv("OUTBOX_LOG_PATH")
+WEBHOOK_URL = os.getenv("OUTBOX_WEBHOOK_URL")
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("OUTBOX_WEBHOOK_TIMEOUT_SECONDS", "5"))
+# Tiempo que un lote queda reservado mientras se entrega fuera de la
+# transacción; si el relay muere a mitad, al vencer otro lo vuelve a tomar.
+RECLAMO_SECONDS = float(os.getenv("OUTBOX_RECLAMO_SECONDS", "60"))
+# Los eventos entregados se conservan este tiempo (reentregas manuales,
+# auditoría) y luego se borran; 0 los conserva para siempre.
+RETENCION_DIAS = float(os.getenv("OUTBOX_RETENCION_DIAS", "7"))
+PURGA_INTERVALO_SECONDS = float(os.getenv("OUTBOX_PURGA_INTERVALO_SECONDS", "3600"))
+
+ENTREGADOS_TOTAL = REGISTRY.counter(
+    "outbox_eventos_entregados_total", "Eventos del outbox entregados, por sink.", ("sink",)
+)
+ERRORES_TOTAL = REGISTRY.counter(
+    "outbox_errores_total", "Lotes del outbox que un sink no pudo recibir.", ("sink",)
+)
+LAG_SECONDS = REGISTRY.gauge(
+    "outbox_lag_seconds", "Antigüedad del evento pendiente más viejo tras la última pasada del relay."
+)
+PENDIENTES = REGISTRY.gauge("outbox_pendientes", "Eventos del outbox aún no entregados.")
+PURGADOS_TOTAL = REGISTRY.counter(
+    "outbox_eventos_purgados_total", "Eventos entregados borrados del outbox por retención."
+)
+
+_proxima_purga: Optional[datetime] = None
+
+
+def encolar(db: Session, tipo: str, payload: dict) -> None:
+    """Agrega un evento al outbox en la transacción del llamador (sin commit)."""
+    db.add(EventoOutbox(tipo=tipo, payload=payload))
+
+
+def encolar_varios(db: Session, tipo: str, payloads: List[dict]) -> None:
+    """Como encolar(), con un solo INSERT para todo el lote."""
+    if payloads:
+        db.execute(insert(EventoOutbox), [{"tipo": tipo, "payload": p} for p in payloads])
+
+
+class Sink:
+    """Destino de eventos. `enviar` recibe el lote completo y lanza excepción si no lo aceptó."""
+
+    nombre = "sink"
+
+    def enviar(self, eventos: List[dict]) -> None:
+        raise NotImplementedError
+
+
+class SinkSuscriptores(Sink):
+    """Suscriptores en proceso registrados con notificaciones.suscribir()."""
+
+    nombre = "suscriptores"
+
+    def enviar(self, eventos: List[dict]) -> None:
+        for e in eventos:
+            notificaciones.emitir(e["tipo"], e["payload"])
+
+
+class SinkArchivo(Sink):
+    """Una línea JSON por evento, con fsync antes de darlos por entregados."""
+
+    nombre = "archivo"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def enviar(self, eventos: List[dict]) -> None:
+        lineas = "".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in eventos)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lineas)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class SinkWebhook(Sink):
+    """POST del lote como {"eventos": [...]}; cualquier respuesta no 2xx se reintenta."""
+
+    nombre = "webhook"
+
+    def __init__(self, url: str, timeout: float = WEBHOOK_TIMEOUT_SECONDS):
+        self.url = url
+        self.timeout = timeout
+
+    def enviar(self, eventos: List[dict]) -> None:
+        import requests
+
+        respuesta = requests.post(
+            self.url,
+            data=json.dumps({"eventos": eventos}, ensure_ascii=False, default=str).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            timeout=self.timeout,
+        )
+        respuesta.raise_for_status()
+
+
+def sinks_configurados() -> List[Sink]:
+    """Suscriptores en proceso siempre; archivo y webhook si están configurados por entorno."""
+    sinks: List[Sink] = [SinkSuscriptores()]
+    if LOG_PATH:
+        sinks.append(SinkArchivo(LOG_PATH))
+    if WEBHOOK_URL:
+        sinks.append(SinkWebhook(WEBHOOK_URL))
+    return sinks
+
+
+def _lag(db: Session, ahora: datetime) -> None:
+    pendientes, mas_viejo = db.execute(
+        select(func.count(), func.min(EventoOutbox.fecha_creacion)).where(EventoOutbox.fecha_envio.is_(None))
+    ).one()
+    PENDIENTES.set(pendientes)
+    if mas_viejo is None:
+        LAG_SECONDS.set(0)
+        return
+    if mas_viejo.tzinfo is None:  # SQLite devuelve fechas naive (UTC)
+        mas_viejo = mas_viejo.replace(tzinfo=timezone.utc)
+    LAG_SECONDS.set(max(0.0, (ahora - mas_viejo).total_seconds()))
+
+
+def drenar(
+    session_factory,
+    sinks: Optional[List[Sink]] = None,
+    lote: int = LOTE,
+    max_lotes: int = MAX_LOTES,
+    ahora: Optional[Callable[[], datetime]] = None,
+) -> int:
+    """
+    Entrega los eventos pendientes en orden de id, por lotes. Cada lote se
+    reserva en una transacción corta (FOR UPDATE SKIP LOCKED + `reclamado_hasta`),
+    se envía a los sinks sin transacción ni conexión abiertas y el resultado se
+    guarda en otra transacción corta: un receptor lento no retiene locks ni
+    conexiones del pool. Si un sink falla o el proceso muere a mitad, el lote
+    vuelve a entregarse (al menos una vez; los consumidores deduplican por
+    `id`). Devuelve la cantidad entregada.
+    """
+    sinks = sinks_configurados() if sinks is None else sinks
+    ahora = ahora or (lambda: datetime.now(timezone.utc))
+    total = 0
+    for _ in range(max_lotes):
+        eventos = _reclamar_lote(session_factory, lote, ahora())
+        if not eventos:
+            break
+        error = None
+        for sink in sinks:
+            try:
+                sink.enviar(eventos)
+                ENTREGADOS_TOTAL.inc(sink.nombre, amount=len(eventos))
+            except Exception as exc:
+                ERRORES_TOTAL.inc(sink.nombre)
+                logger.exception("Sink %s falló; el lote se reintenta en la próxima pasada", sink.nombre)
+                error = f"{sink.nombre}: {exc}"[:500]
+                break
+        _registrar_resultado(session_factory, [e["id"] for e in eventos], error, ahora())
+        if error is not None:
+            break
+        total += len(eventos)
+        if len(eventos) < lote:
+            break
+    with session_factory() as db:
+        _lag(db, ahora())
+    _purgar_si_toca(session_factory, ahora())
+    return total
+
+
+def _reclamar_lote(session_factory, lote: int, ahora: datetime) -> List[dict]:
+    with session_factory() as db, db.begin():
+        filas = db.execute(
+            select(EventoOutbox)
+            .where(
+                EventoOutbox.fecha_envio.is_(None),
+                or_(EventoOutbox.reclamado_hasta.is_(None), EventoOutbox.reclamado_hasta <= ahora),
+            )
+            .order_by(EventoOutbox.id_evento)
+            .limit(lote)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        for f in filas:
+            f.reclamado_hasta = ahora + timedelta(seconds=RECLAMO_SECONDS)
+        return [
+            {
+                "id": f.id_evento,
+                "tipo": f.tipo,
+                "payload": f.payload,
+                "fecha": f.fecha_creacion.isoformat() if f.fecha_creacion else None,
+            }
+            for f in filas
+        ]
+
+
+def _registrar_resultado(session_factory, ids: List[int], error: Optional[str], ahora: datetime) -> None:
+    if error is None:
+        valores = {"fecha_envio": ahora, "reclamado_hasta": None}
+    else:
+        # Se libera la reserva para reintentar en la próxima pasada.
+        valores = {"intentos": EventoOutbox.intentos + 1, "ultimo_error": error, "reclamado_hasta": None}
+    with session_factory() as db, db.begin():
+        db.execute(
+            update(EventoOutbox)
+            .where(EventoOutbox.id_evento.in_(ids))
+            .values(**valores)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def purgar(
+    session_factory,
+    ahora: datetime,
+    retencion_dias: float = RETENCION_DIAS,
+    lote: int = LOTE * 10,
+    max_lotes: int = MAX_LOTES,
+) -> int:
+    """
+    Borra los eventos entregados hace más de `retencion_dias`, por lotes cortos
+    en orden de id (índice de la PK) para no retener locks. Los pendientes no
+    se tocan nunca. Devuelve la cantidad borrada.
+    """
+    if retencion_dias <= 0:
+        return 0
+    corte = ahora - timedelta(days=retencion_dias)
+    total = 0
+    for _ in range(max_lotes):
+        with session_factory() as db, db.begin():
+            ids = select(EventoOutbox.id_evento).where(
+                EventoOutbox.fecha_envio.is_not(None), EventoOutbox.fecha_envio < corte
+            ).order_by(EventoOutbox.id_evento).limit(lote).scalar_subquery()
+            borrados = db.execute(
+                delete(EventoOutbox).where(EventoOutbox.id_evento.in_(ids)).execution_options(synchronize_session=False)
+            ).rowcount
+        total += borrados
+        if borrados < lote:
+            break
+    if total:
+        PURGADOS_TOTAL.inc(amount=total)
+        logger.info("Outbox: %s eventos entregados purgados (retención %s días)", total, retencion_dias)
+    return total
+
+
+def _purgar_si_toca(session_factory, ahora: datetime) -> None:
+    # El relay corre cada pocos segundos; la purga basta con una vez por intervalo.
+    global _proxima_purga
+    if _proxima_purga is not None and ahora < _proxima_purga:
+        return
+    _proxima_purga = ahora + timedelta(seconds=PURGA_INTERVALO_SECONDS)
+    try:
+        purgar(session_factory, ahora)
+    except Exception:
+        logger.exception("No se pudo purgar el outbox; se reintenta en el próximo intervalo")
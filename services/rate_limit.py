@@ -0,0 +1,203 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+
+# Proxies cuyo X-Forwarded-For se acepta. El balanceador de Render llega desde
+# la red privada; la IP del cliente es el primer salto no confiable leyendo
+# X-Forwarded-For de derecha a izquierda, así lo que el cliente escriba a la
+# izquierda no cambia su clave de límite.
+TRUSTED_PROXIES = os.getenv(
+    "TRUSTED_PROXY_IPS", "127.0.0.1,::1,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+)
+
+
+class MemoryBackend:
+    """Token buckets en memoria del proceso (LRU acotado)."""
+
+    def __init__(self, max_keys: int = 50000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        """Consume un token. Retorna 0 si se permitió o los segundos a esperar."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * refill_per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / refill_per_second
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBackend:
+    """
+    Token buckets en un archivo SQLite compartido por todos los workers del host.
+
+    Cada toma es una transacción BEGIN IMMEDIATE corta, por lo que los workers
+    se serializan sobre el archivo y ven el mismo estado. Cada fila guarda
+    cuándo su bucket vuelve a estar lleno (`full_at`); pasado ese momento
+    equivale a no tenerla y se borra cada PRUNE_EVERY escrituras.
+    """
+
+    PRUNE_EVERY = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL, ts REAL, full_at REAL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(bucket)")}
+            if "full_at" not in columns:  # archivo creado por una versión anterior
+                conn.execute("ALTER TABLE bucket ADD COLUMN full_at REAL")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        # time.time() y no monotonic: el reloj debe ser comparable entre procesos.
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, ts FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens, last = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - last) * refill_per_second)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / refill_per_second
+            conn.execute(
+                "INSERT OR REPLACE INTO bucket (key, tokens, ts, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (capacity - tokens) / refill_per_second),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self.prune(now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def prune(self, now: float = None) -> int:
+        """Borra los buckets que ya se recargaron por completo (o sin full_at)."""
+        now = time.time() if now is None else now
+        cursor = self._conn().execute("DELETE FROM bucket WHERE full_at IS NULL OR full_at <= ?", (now,))
+        return cursor.rowcount
+
+    def reset(self) -> None:
+        self._conn().execute("DELETE FROM bucket")
+
+
+def _build_backend():
+    if os.getenv("RATE_LIMIT_BACKEND", "memory").lower() == "sqlite":
+        return SQLiteBackend(os.getenv("RATE_LIMIT_SQLITE_PATH", "/tmp/uc_rate_limit.sqlite3"))
+    return MemoryBackend()
+
+
+backend = _build_backend()
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") not in ("0", "false", "False")
+
+
+class RateLimit:
+    """Límite token-bucket: `capacity` peticiones de ráfaga, recarga `per_minute` por minuto."""
+
+    def __init__(self, name: str, capacity: int, per_minute: float):
+        self.name = name
+        self.capacity = capacity
+        self.refill_per_second = per_minute / 60.0
+
+    def check(self, key: str) -> None:
+        if not ENABLED:
+            return
+        wait = backend.take(f"{self.name}:{key}", self.capacity, self.refill_per_second)
+        if wait > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiadas solicitudes, intente nuevamente en unos segundos",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+    def __call__(self, request: Request) -> None:
+        """Uso como dependencia de FastAPI: limita por IP del cliente."""
+        self.check(client_ip(request))
+
+
+class ConcurrencyLimit:
+    """Cupo global de peticiones simultáneas; rechaza con 503 en vez de encolar."""
+
+    def __init__(self, limit: int, retry_after: int = 5):
+        self.limit = limit
+        self.retry_after = retry_after
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            if ENABLED and self._in_flight >= self.limit:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servicio ocupado, intente nuevamente en unos segundos",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+def client_ip(request: Request) -> str:
+    # ProxyHeadersMiddleware (main.py, con TRUSTED_PROXIES) ya reemplazó el
+    # cliente por el primer salto no confiable de X-Forwarded-For.
+    return request.client.host if request.client else "desconocido"
+
+
+def _limit(name: str, default_capacity: int, default_per_minute: float) -> RateLimit:
+    prefix = f"RATE_LIMIT_{name.upper()}"
+    return RateLimit(
+        name,
+        capacity=int(os.getenv(f"{prefix}_CAPACITY", str(default_capacity))),
+        per_minute=float(os.getenv(f"{prefix}_PER_MINUTE", str(default_per_minute))),
+    )
+
+
+def reset() -> None:
+    backend.reset()
+
+
+# Límites de los endpoints públicos (accesibles con cualquier QR de cama).
+solicitudes_por_ip = _limit("solicitudes_ip", 20, 10)
+solicitudes_por_cama = _limit("solicitudes_cama", 6, 2)
+qr_por_ip = _limit("qr_ip", 60, 60)
+qr_por_codigo = _limit("qr_codigo", 30, 30)
+chat_por_ip = _limit("chat_ip", 10, 6)
+chat_concurrencia = ConcurrencyLimit(int(os.getenv("CHAT_MAX_CONCURRENCY", "4")))
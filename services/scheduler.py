@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from services.telemetry import REGISTRY
+
+logger = logging.getLogger("scheduler")
+
+RUN_DURATION = REGISTRY.histogram(
+    "scheduler_run_duration_seconds", "Duración de cada ejecución de tarea periódica.", ("task",)
+)
+RUNS_TOTAL = REGISTRY.counter(
+    "scheduler_runs_total", "Ejecuciones de tareas periódicas por resultado.", ("task", "resultado")
+)
+IS_LEADER = REGISTRY.gauge("scheduler_leader", "1 si este proceso tiene el lock de líder.")
+
+
+class LeaderLock:
+    """
+    Elección de líder con pg_try_advisory_lock sobre una conexión dedicada
+    (fuera del pool) que se mantiene abierta mientras el proceso sea líder.
+    En motores sin advisory locks (SQLite) el proceso siempre es líder.
+    """
+
+    def __init__(self, engine: Engine, key: int):
+        self.key = key
+        self._enabled = engine.dialect.name == "postgresql"
+        self._engine = create_engine(engine.url, poolclass=NullPool) if self._enabled else None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        if not self._enabled:
+            return True
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute(text("SELECT 1"))
+                    return True
+                except Exception:
+                    logger.warning("Se perdió la conexión del lock de líder")
+                    self._close()
+            try:
+                conn = self._engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            except Exception:
+                logger.exception("No se pudo conectar para el lock de líder")
+                return False
+            if conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": self.key}).scalar():
+                self._conn = conn
+                logger.info("Proceso elegido líder del scheduler")
+                return True
+            conn.close()
+            return False
+
+    def _close(self) -> None:
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def release(self) -> None:
+        if not self._enabled:
+            return
+        with self._lock:
+            if self._conn is not None:
+                # Cerrar la sesión libera el advisory lock.
+                self._close()
+            self._engine.dispose()
+
+
+class _Task:
+    def __init__(self, name: str, interval: float, fn: Callable[[], object]):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+
+
+class Scheduler:
+    """Tareas periódicas en hilos daemon; sólo corren en el proceso líder."""
+
+    def __init__(self, leader: Optional[LeaderLock] = None):
+        self.leader = leader
+        self._tasks: List[_Task] = []
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    def add(self, name: str, interval: float, fn: Callable[[], object]) -> None:
+        self._tasks.append(_Task(name, interval, fn))
+
+    def run_once(self, task: _Task) -> bool:
+        """Ejecuta la tarea si este proceso es líder. Retorna si se ejecutó."""
+        leader = self.leader is None or self.leader.acquire()
+        IS_LEADER.set(1 if leader else 0)
+        if not leader:
+            return False
+        start = time.perf_counter()
+        try:
+            task.fn()
+            RUNS_TOTAL.inc(task.name, "ok")
+        except Exception:
+            RUNS_TOTAL.inc(task.name, "error")
+            logger.exception("Tarea %s falló", task.name)
+        finally:
+            RUN_DURATION.observe(time.perf_counter() - start, task.name)
+        return True
+
+    def _loop(self, task: _Task) -> None:
+        while not self._stop.wait(task.interval):
+            self.run_once(task)
+
+    def start(self) -> None:
+        self._stop.clear()
+        for task in self._tasks:
+            thread = threading.Thread(target=self._loop, args=(task,), name=f"scheduler-{task.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self.leader is not None:
+            self.leader.release()
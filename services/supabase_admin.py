@@ -1,12 +1,130 @@
+import logging
 import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
 
-import requests
+from services.telemetry import REGISTRY
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger("supabase_admin")
+
+# Connect corto: si Supabase no responde, mejor fallar rápido que ocupar un hilo.
+TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_CONNECT_TIMEOUT_SECONDS", "3"))
+REINTENTOS = int(os.getenv("SUPABASE_REINTENTOS", "2"))
+BACKOFF_BASE_SECONDS = float(os.getenv("SUPABASE_BACKOFF_BASE_SECONDS", "0.2"))
+BACKOFF_MAX_SECONDS = float(os.getenv("SUPABASE_BACKOFF_MAX_SECONDS", "2"))
+CIRCUITO_UMBRAL = int(os.getenv("SUPABASE_CIRCUITO_UMBRAL", "5"))
+CIRCUITO_ESPERA_SECONDS = float(os.getenv("SUPABASE_CIRCUITO_ESPERA_SECONDS", "30"))
+
+# Para POST (no idempotente) sólo se reintenta lo que Supabase seguro no procesó.
+_REINTENTABLES_POST = {502, 503, 504}
+
+LLAMADAS_TOTAL = REGISTRY.counter(
+    "supabase_admin_llamadas_total", "Llamadas a la API Admin de Supabase por resultado.", ("resultado",)
+)
+CIRCUITO_ABIERTO = REGISTRY.gauge("supabase_admin_circuito_abierto", "1 si el circuit breaker está abierto.")
 
 
 class SupabaseAdminError(Exception):
     """Error al interactuar con la API Admin de Supabase."""
 
 
+class CircuitBreaker:
+    """
+    Cerrado mientras las llamadas funcionan; tras `umbral` fallos seguidos se
+    abre y rechaza todo durante `espera` segundos. Luego deja pasar una sola
+    llamada de prueba (semiabierto): si funciona se cierra, si no vuelve a abrirse.
+    """
+
+    def __init__(self, umbral: int = CIRCUITO_UMBRAL, espera: float = CIRCUITO_ESPERA_SECONDS, reloj=time.monotonic):
+        self.umbral = umbral
+        self.espera = espera
+        self._reloj = reloj
+        self._fallos = 0
+        self._abierto_hasta: Optional[float] = None
+        # Hilo que hace la llamada de prueba en semiabierto (None si no hay).
+        self._probando: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            if self._abierto_hasta is None:
+                return "cerrado"
+            return "abierto" if self._reloj() < self._abierto_hasta else "semiabierto"
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self._abierto_hasta is None:
+                return True
+            if self._reloj() < self._abierto_hasta or self._probando is not None:
+                return False
+            self._probando = threading.get_ident()
+            return True
+
+    def exito(self) -> None:
+        with self._lock:
+            self._fallos = 0
+            self._abierto_hasta = None
+            self._probando = None
+        CIRCUITO_ABIERTO.set(0)
+
+    def liberar_prueba(self) -> None:
+        """
+        Si la llamada de prueba terminó sin registrar éxito ni fallo (una
+        excepción inesperada), se suelta para que la siguiente pueda probar;
+        si no, el circuito quedaría abierto hasta reiniciar el proceso.
+        """
+        with self._lock:
+            if self._probando == threading.get_ident():
+                self._probando = None
+
+    def fallo(self) -> None:
+        with self._lock:
+            self._fallos += 1
+            if self._probando is not None or self._fallos >= self.umbral:
+                if self._abierto_hasta is None:
+                    logger.warning("Circuito de Supabase abierto tras %s fallos", self._fallos)
+                self._abierto_hasta = self._reloj() + self.espera
+                self._probando = None
+                CIRCUITO_ABIERTO.set(1)
+
+
+breaker = CircuitBreaker()
+
+_client: Optional["httpx.Client"] = None
+_client_lock = threading.Lock()
+
+
+def _get_client() -> "httpx.Client":
+    """Cliente compartido con keep-alive: reutiliza conexiones TLS entre llamadas."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import httpx  # se importa con la primera llamada, no al arrancar
+
+                _client = httpx.Client(
+                    timeout=httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+                    limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+                )
+    return _client
+
+
+def cerrar() -> None:
+    """Cierra el pool de conexiones (lifespan y tests)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
 def _get_base_url() -> str:
     base_url = os.getenv("SUPABASE_URL")
     if not base_url:
@@ -21,74 +139,99 @@ def _get_service_key() -> str:
     return key
 
 
-def create_auth_user(email: str, password: str) -> dict:
-    """
-    Crea un usuario en Supabase Auth usando la API Admin.
+def _backoff(intento: int) -> float:
+    # "Full jitter": evita que varios workers reintenten todos a la vez.
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** intento)))
 
-    Retorna el diccionario con la información del usuario creado.
+
+def _request(method: str, path: str, payload: Optional[dict] = None) -> "httpx.Response":
+    """
+    Llamada a la API Admin con reintentos acotados ante 5xx y timeouts. Sólo
+    lanza SupabaseAdminError si no hubo respuesta; un 4xx/5xx final se
+    devuelve para que el llamador arme el mensaje.
     """
     base_url = _get_base_url()
     service_key = _get_service_key()
+    if not breaker.permitir():
+        LLAMADAS_TOTAL.inc("circuito_abierto")
+        raise SupabaseAdminError("Supabase no está disponible en este momento; intente nuevamente más tarde.")
 
-    url = f"{base_url}/auth/v1/admin/users"
-    payload = {
-        "email": email,
-        "password": password,
-        "email_confirm": True,
-    }
+    try:
+        return _intentar(method, f"{base_url}{path}", payload, service_key)
+    finally:
+        breaker.liberar_prueba()
 
-    headers = {
-        "Content-Type": "application/json",
-        "apikey": service_key,
-        "Authorization": f"Bearer {service_key}",
-    }
 
-    try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        response.raise_for_status()
-    except requests.HTTPError as exc:
-        detail = ""
+def _intentar(method: str, url: str, payload: Optional[dict], service_key: str) -> "httpx.Response":
+    import httpx
+
+    headers = {"apikey": service_key, "Authorization": f"Bearer {service_key}"}
+    idempotente = method != "POST"
+    client = _get_client()
+    for intento in range(REINTENTOS + 1):
+        ultimo = intento == REINTENTOS
         try:
-            detail = response.json().get("message")  # type: ignore[union-attr]
-        except Exception:  # noqa: BLE001
-            detail = response.text  # type: ignore[union-attr]
-        message = detail or str(exc)
-        raise SupabaseAdminError(f"Error creando usuario en Supabase: {message}") from exc
-    except requests.RequestException as exc:
-        raise SupabaseAdminError(f"No se pudo conectar a Supabase: {exc}") from exc
+            response = client.request(method, url, json=payload, headers=headers)
+        except httpx.TransportError as exc:
+            # Un timeout de lectura en POST pudo haber creado el recurso: no se repite.
+            reintentable = idempotente or isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout))
+            if ultimo or not reintentable:
+                breaker.fallo()
+                LLAMADAS_TOTAL.inc("error_conexion")
+                raise SupabaseAdminError(f"No se pudo conectar a Supabase: {exc}") from exc
+        else:
+            if response.status_code < 500:
+                breaker.exito()
+                LLAMADAS_TOTAL.inc("ok")
+                return response
+            reintentable = idempotente or response.status_code in _REINTENTABLES_POST
+            if ultimo or not reintentable:
+                breaker.fallo()
+                LLAMADAS_TOTAL.inc("error_5xx")
+                return response
+        time.sleep(_backoff(intento))
+    raise AssertionError("inalcanzable")
+
+
+def _mensaje(response: "httpx.Response") -> str:
+    try:
+        detail = response.json().get("message")
+    except Exception:  # noqa: BLE001
+        detail = response.text
+    return detail or f"HTTP {response.status_code}"
 
+
+def _json(response: "httpx.Response") -> dict:
     try:
         return response.json()
     except ValueError as exc:
         raise SupabaseAdminError("Respuesta inválida de Supabase") from exc
 
 
-def delete_auth_user(user_id: str) -> None:
-    """Elimina un usuario de Supabase Auth."""
-    base_url = _get_base_url()
-    service_key = _get_service_key()
+def create_auth_user(email: str, password: str) -> dict:
+    """
+    Crea un usuario en Supabase Auth usando la API Admin.
 
-    url = f"{base_url}/auth/v1/admin/users/{user_id}"
-    headers = {
-        "apikey": service_key,
-        "Authorization": f"Bearer {service_key}",
+    Retorna el diccionario con la información del usuario creado.
+    """
+    payload = {
+        "email": email,
+        "password": password,
+        "email_confirm": True,
     }
+    response = _request("POST", "/auth/v1/admin/users", payload)
+    if response.is_error:
+        raise SupabaseAdminError(f"Error creando usuario en Supabase: {_mensaje(response)}")
+    return _json(response)
 
-    try:
-        response = requests.delete(url, headers=headers, timeout=10)
-        if response.status_code == 404:
-            return
-        response.raise_for_status()
-    except requests.HTTPError as exc:
-        detail = ""
-        try:
-            detail = response.json().get("message")  # type: ignore[union-attr]
-        except Exception:  # noqa: BLE001
-            detail = response.text  # type: ignore[union-attr]
-        message = detail or str(exc)
-        raise SupabaseAdminError(f"Error eliminando usuario en Supabase: {message}") from exc
-    except requests.RequestException as exc:
-        raise SupabaseAdminError(f"No se pudo conectar a Supabase: {exc}") from exc
+
+def delete_auth_user(user_id: str) -> None:
+    """Elimina un usuario de Supabase Auth."""
+    response = _request("DELETE", f"/auth/v1/admin/users/{user_id}")
+    if response.status_code == 404:
+        return
+    if response.is_error:
+        raise SupabaseAdminError(f"Error eliminando usuario en Supabase: {_mensaje(response)}")
 
 
 def update_auth_user(user_id: str, *, password: str | None = None) -> dict:
@@ -96,32 +239,7 @@ def update_auth_user(user_id: str, *, password: str | None = None) -> dict:
     if password is None:
         return {}
 
-    base_url = _get_base_url()
-    service_key = _get_service_key()
-
-    url = f"{base_url}/auth/v1/admin/users/{user_id}"
-    payload = {"password": password}
-    headers = {
-        "Content-Type": "application/json",
-        "apikey": service_key,
-        "Authorization": f"Bearer {service_key}",
-    }
-
-    try:
-        response = requests.put(url, json=payload, headers=headers, timeout=10)
-        response.raise_for_status()
-    except requests.HTTPError as exc:
-        detail = ""
-        try:
-            detail = response.json().get("message")  # type: ignore[union-attr]
-        except Exception:  # noqa: BLE001
-            detail = response.text  # type: ignore[union-attr]
-        message = detail or str(exc)
-        raise SupabaseAdminError(f"Error actualizando usuario en Supabase: {message}") from exc
-    except requests.RequestException as exc:
-        raise SupabaseAdminError(f"No se pudo conectar a Supabase: {exc}") from exc
-
-    try:
-        return response.json()
-    except ValueError as exc:
-        raise SupabaseAdminError("Respuesta inválida de Supabase") from exc
+    response = _request("PUT", f"/auth/v1/admin/users/{user_id}", {"password": password})
+    if response.is_error:
+        raise SupabaseAdminError(f"Error actualizando usuario en Supabase: {_mensaje(response)}")
+    return _json(response)
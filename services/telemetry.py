@@ -0,0 +1,252 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list:
+        lines = self._header()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list:
+        lines = self._header()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [conteo por bucket (no acumulado) + overflow, suma, total]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, *labels) -> Tuple[int, float]:
+        """(cantidad, suma) observadas para una combinación de labels."""
+        series = self._series.get(labels)
+        return (series[2], series[1]) if series else (0, 0.0)
+
+    def render(self) -> list:
+        lines = self._header()
+        for labels, (counts, total_sum, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.label_names, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.label_names, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            base = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{base} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{base} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, label_names: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Iterable[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Latencia de peticiones HTTP por ruta.", ("method", "route")
+)
+REQUESTS_TOTAL = REGISTRY.counter(
+    "http_requests_total", "Peticiones HTTP por ruta y código de estado.", ("method", "route", "status")
+)
+REQUESTS_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "Peticiones HTTP en curso.")
+REQUEST_SIZE = REGISTRY.histogram(
+    "http_request_size_bytes", "Tamaño del cuerpo de la petición.", ("method", "route"), SIZE_BUCKETS
+)
+RESPONSE_SIZE = REGISTRY.histogram(
+    "http_response_size_bytes", "Tamaño del cuerpo de la respuesta.", ("method", "route"), SIZE_BUCKETS
+)
+
+DB_STATEMENTS = REGISTRY.histogram(
+    "http_request_db_statements", "Sentencias SQL ejecutadas por petición.", ("method", "route"), STATEMENT_BUCKETS
+)
+DB_DURATION = REGISTRY.histogram(
+    "http_request_db_seconds", "Tiempo acumulado en la BD por petición.", ("method", "route")
+)
+
+UNMATCHED_ROUTE = "<sin_ruta>"
+
+
+class QueryStats:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Lo activa db.session.enable_query_timing(); mientras esté apagado el middleware
+# no crea QueryStats ni agrega Server-Timing.
+QUERY_TIMING_ENABLED = False
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def route_template(scope) -> str:
+    """Plantilla de la ruta (p. ej. /solicitudes/{id_solicitud}) para acotar cardinalidad."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class TelemetryMiddleware:
+    """
+    Middleware ASGI puro (sin BaseHTTPMiddleware) que mide latencia, códigos de
+    estado, peticiones en curso y tamaños de payload por ruta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        state = {"status": 500, "size": 0}
+        query_stats = None
+        if QUERY_TIMING_ENABLED:
+            query_stats = QueryStats()
+            token = current_query_stats.set(query_stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                if query_stats is not None:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", _server_timing(query_stats, start))
+                    ]
+            elif message["type"] == "http.response.body":
+                state["size"] += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            elapsed = time.perf_counter() - start
+            method = scope["method"]
+            route = route_template(scope)
+            if query_stats is not None:
+                current_query_stats.reset(token)
+                DB_STATEMENTS.observe(query_stats.statements, method, route)
+                DB_DURATION.observe(query_stats.seconds, method, route)
+            REQUEST_DURATION.observe(elapsed, method, route)
+            REQUESTS_TOTAL.inc(method, route, str(state["status"]))
+            RESPONSE_SIZE.observe(state["size"], method, route)
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    REQUEST_SIZE.observe(int(value), method, route)
+                    break
+
+
+def _server_timing(stats: QueryStats, start: float) -> bytes:
+    total_ms = (time.perf_counter() - start) * 1000
+    return (
+        f'db;dur={stats.seconds * 1000:.2f};desc="{stats.statements} queries", app;dur={total_ms:.2f}'
+    ).encode("latin-1")
@@ -37,6 +37,18 @@ if not os.getenv('SUPABASE_SERVICE_ROLE_KEY'):
 if not os.getenv('OPENAI_API_KEY'):
     os.environ['OPENAI_API_KEY'] = 'sk-fake-key'
 
+@pytest.fixture(autouse=True)
+def reset_estado_en_memoria():
+    """Limpia límites de tasa y cachés entre tests."""
+    from services import catalogo, cola, health, rate_limit
+
+    rate_limit.reset()
+    catalogo.invalidar()
+    cola.invalidar()
+    health.reiniciar()
+    yield
+
+
 @pytest.fixture
 def client():
     """Cliente básico de FastAPI para tests."""
@@ -52,3 +64,60 @@ def mock_db():
     from unittest.mock import MagicMock
     mock = MagicMock()
     return mock
+
+
+@pytest.fixture
+def db_session():
+    """Sesión sobre SQLite en memoria con el esquema creado y datos mínimos."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from db.session import Base
+    from models.models import Area, Cama, Edificio, Habitacion, Institucion, Piso, Servicio
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = TestingSession()
+    inst = Institucion(id_institucion=1, nombre_institucion="Hospital Test")
+    edif = Edificio(id_edificio=1, nombre_edificio="Torre A", id_institucion=1)
+    piso = Piso(id_piso=1, numero_piso=1, id_edificio=1)
+    serv = Servicio(id_servicio=1, nombre_servicio="Medicina")
+    hab = Habitacion(id_habitacion=1, nombre_habitacion="101", id_piso=1, id_servicio=1)
+    cama = Cama(id_cama=1, letra_cama="A", id_habitacion=1, identificador_qr="QR-TEST-1", activo=True)
+    area = Area(id_area=1, nombre_area="Mantención")
+    db.add_all([inst, edif, piso, serv, hab, cama, area])
+    db.commit()
+    db.close()
+
+    yield TestingSession
+
+    engine.dispose()
+
+
+@pytest.fixture
+def db_client(db_session):
+    """Cliente de FastAPI cuyas dependencias get_db apuntan a la BD SQLite de prueba."""
+    from main import app
+    from auth import dependencies
+    from routers import admin, qr, solicitudes
+
+    def override_get_db():
+        db = db_session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    for get_db in (solicitudes.get_db, admin.get_db, qr.get_db, dependencies.get_db):
+        app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
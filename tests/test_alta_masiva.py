@@ -0,0 +1,181 @@
+"""
+Tests del alta masiva de jefes de área (POST /admin/users/bulk)
+"""
+import threading
+import time
+import uuid
+
+import pytest
+
+from auth.dependencies import require_admin
+from main import app
+from models.models import RolUsuario, Usuario
+from routers import admin
+from services.supabase_admin import SupabaseAdminError
+
+
+class SupabaseFalso:
+    def __init__(self, fallar=(), demora=0.0):
+        self.fallar = set(fallar)
+        self.demora = demora
+        self.creados = {}
+        self.borrados = []
+        self.simultaneos = 0
+        self.max_simultaneos = 0
+        self._lock = threading.Lock()
+
+    def create_auth_user(self, email, password):
+        with self._lock:
+            self.simultaneos += 1
+            self.max_simultaneos = max(self.max_simultaneos, self.simultaneos)
+        try:
+            time.sleep(self.demora)
+            if email in self.fallar:
+                raise SupabaseAdminError("Error creando usuario en Supabase: rechazado")
+            user_id = str(uuid.uuid4())
+            with self._lock:
+                self.creados[email] = user_id
+            return {"id": user_id}
+        finally:
+            with self._lock:
+                self.simultaneos -= 1
+
+    def delete_auth_user(self, user_id):
+        self.borrados.append(user_id)
+
+
+@pytest.fixture
+def alta(db_client, monkeypatch):
+    app.dependency_overrides[require_admin] = lambda: Usuario(rol=RolUsuario.ADMIN, correo="admin@example.com")
+    supabase = SupabaseFalso()
+    monkeypatch.setattr(admin, "create_auth_user", supabase.create_auth_user)
+    monkeypatch.setattr(admin, "delete_auth_user", supabase.delete_auth_user)
+    return db_client, supabase
+
+
+def _usuarios(db_session):
+    db = db_session()
+    try:
+        return sorted(u.correo for u in db.query(Usuario))
+    finally:
+        db.close()
+
+
+class TestAltaMasiva:
+    """Validación previa, concurrencia acotada, errores parciales y compensación."""
+
+    def test_crea_todos(self, alta, db_session):
+        client, supabase = alta
+        correos = [f"jefe{i}@hospital.cl" for i in range(6)]
+        res = client.post("/admin/users/bulk", json={"usuarios": [{"email": c, "id_area": 1} for c in correos]})
+        assert res.status_code == 201
+        cuerpo = res.json()
+        assert cuerpo["errores"] == []
+        assert [c["usuario"]["correo"] for c in cuerpo["creados"]] == correos
+        assert all(c["temp_password"] and c["usuario"]["area_nombre"] == "Mantención" for c in cuerpo["creados"])
+        assert _usuarios(db_session) == sorted(correos)
+
+    def test_validacion_previa_y_fallos_parciales(self, alta, db_session):
+        client, supabase = alta
+        db = db_session()
+        db.add(Usuario(
+            id=uuid.uuid4(), rol=RolUsuario.JEFE_AREA, correo="existe@hospital.cl",
+            nombre="N", apellido="A", id_area=1,
+        ))
+        db.commit()
+        db.close()
+        supabase.fallar = {"rechazado@hospital.cl"}
+
+        res = client.post("/admin/users/bulk", json={"usuarios": [
+            {"email": "ok@hospital.cl", "id_area": 1},
+            {"email": "existe@hospital.cl", "id_area": 1},
+            {"email": "sin-area@hospital.cl", "id_area": 99},
+            {"email": "ok@hospital.cl", "id_area": 1},
+            {"email": "rechazado@hospital.cl", "id_area": 1},
+        ]})
+        assert res.status_code == 207
+        cuerpo = res.json()
+        assert [c["usuario"]["correo"] for c in cuerpo["creados"]] == ["ok@hospital.cl"]
+        errores = {e["email"]: e["error"] for e in cuerpo["errores"]}
+        assert errores["existe@hospital.cl"] == "Ya existe un usuario con ese correo"
+        assert errores["sin-area@hospital.cl"] == "Área no encontrada"
+        assert "repetido" in errores["ok@hospital.cl"]
+        assert "rechazado" in errores["rechazado@hospital.cl"]
+        # Los inválidos nunca llegan a Supabase.
+        assert set(supabase.creados) == {"ok@hospital.cl"}
+        assert _usuarios(db_session) == ["existe@hospital.cl", "ok@hospital.cl"]
+
+    def test_concurrencia_acotada(self, alta, monkeypatch):
+        client, supabase = alta
+        supabase.demora = 0.05
+        monkeypatch.setattr(admin, "SUPABASE_CONCURRENCIA", 3)
+        client.post("/admin/users/bulk", json={"usuarios": [
+            {"email": f"j{i}@hospital.cl", "id_area": 1} for i in range(9)
+        ]})
+        assert 1 < supabase.max_simultaneos <= 3
+
+    def test_falla_bd_revierte_en_supabase(self, alta, db_session, monkeypatch):
+        client, supabase = alta
+
+        def commit_roto(self):
+            raise RuntimeError("BD caída")
+
+        monkeypatch.setattr("sqlalchemy.orm.Session.commit", commit_roto)
+        with pytest.raises(RuntimeError):
+            client.post("/admin/users/bulk", json={"usuarios": [
+                {"email": "a@hospital.cl", "id_area": 1},
+                {"email": "b@hospital.cl", "id_area": 1},
+            ]})
+        assert sorted(supabase.borrados) == sorted(supabase.creados.values())
+
+    def test_id_invalido_de_supabase_no_deja_huerfanos(self, alta, db_session, monkeypatch):
+        client, supabase = alta
+        original = supabase.create_auth_user
+
+        def id_roto(email, password):
+            respuesta = original(email, password)
+            return {"id": "no-es-uuid"} if email == "roto@hospital.cl" else respuesta
+
+        monkeypatch.setattr(admin, "create_auth_user", id_roto)
+        res = client.post("/admin/users/bulk", json={"usuarios": [
+            {"email": "a@hospital.cl", "id_area": 1},
+            {"email": "roto@hospital.cl", "id_area": 1},
+            {"email": "b@hospital.cl", "id_area": 1},
+        ]})
+        assert res.status_code == 207
+        assert [e["email"] for e in res.json()["errores"]] == ["roto@hospital.cl"]
+        assert _usuarios(db_session) == ["a@hospital.cl", "b@hospital.cl"]
+        # Los creados bien se guardan; sólo el ID roto se intenta borrar.
+        assert supabase.borrados == ["no-es-uuid"]
+
+    def test_lote_vacio(self, alta):
+        client, _ = alta
+        assert client.post("/admin/users/bulk", json={"usuarios": []}).status_code == 422
+
+    def test_no_retiene_conexion_durante_supabase(self, alta, db_session, monkeypatch):
+        client, supabase = alta
+        sesiones = []
+
+        def get_db_espiado():
+            db = db_session()
+            sesiones.append(db)
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[admin.get_db] = get_db_espiado
+        en_transaccion = []
+        original = supabase.create_auth_user
+
+        def crear(email, password):
+            en_transaccion.append(sesiones[-1].in_transaction())
+            return original(email, password)
+
+        monkeypatch.setattr(admin, "create_auth_user", crear)
+        res = client.post("/admin/users/bulk", json={"usuarios": [
+            {"email": f"j{i}@hospital.cl", "id_area": 1} for i in range(3)
+        ]})
+        assert res.status_code == 201 and len(res.json()["creados"]) == 3
+        assert en_transaccion == [False, False, False]
+        assert _usuarios(db_session) == [f"j{i}@hospital.cl" for i in range(3)]
@@ -0,0 +1,28 @@
+"""
+Presupuesto de importación del proceso de la API (python -X importtime)
+"""
+import os
+
+import pytest
+
+from benchmarks.bench_arranque import PESADOS, importacion
+
+# Holgado a propósito: la garantía firme es que las dependencias pesadas no se
+# importen; el tope de tiempo sólo detecta regresiones grandes.
+PRESUPUESTO_MS = float(os.getenv("ARRANQUE_PRESUPUESTO_MS", "3000"))
+
+
+@pytest.fixture(scope="module")
+def tiempos():
+    return importacion()
+
+
+class TestArranque:
+    """Importar main no debe cargar openai, qrcode/PIL, requests ni httpx."""
+
+    def test_sin_dependencias_pesadas(self, tiempos):
+        assert "main" in tiempos
+        assert [m for m in PESADOS if m in tiempos] == []
+
+    def test_dentro_del_presupuesto(self, tiempos):
+        assert tiempos["main"] / 1000 < PRESUPUESTO_MS
@@ -0,0 +1,40 @@
+"""
+Tests de las utilidades del harness de benchmarks
+"""
+from auth.dependencies import _verify_jwt
+from benchmarks.carga import comparar, firmar_jwt, percentil
+
+
+class TestHarnessCarga:
+    """Tests de percentiles, comparación contra baseline y JWT de prueba."""
+
+    def test_percentil_nearest_rank(self):
+        valores = list(range(1, 101))
+        assert percentil(valores, 50) == 50
+        assert percentil(valores, 95) == 95
+        assert percentil(valores, 99) == 99
+        assert percentil([], 95) == 0.0
+
+    def test_comparar_detecta_regresiones(self):
+        baseline = {"endpoints": {"GET /x": {"p95_ms": 100, "rps": 50}}}
+        ok = {"GET /x": {"p95_ms": 110, "rps": 45}}
+        lento = {"GET /x": {"p95_ms": 200, "rps": 20}}
+        assert comparar(ok, baseline, 0.25) == []
+        assert len(comparar(lento, baseline, 0.25)) == 2
+
+    def test_jwt_firmado_es_valido(self):
+        token = firmar_jwt("00000000-0000-4000-8000-00000000be0c", "secreto")
+        payload = _verify_jwt(token, "secreto")
+        assert payload["sub"] == "00000000-0000-4000-8000-00000000be0c"
+
+
+class TestBenchSerializacion:
+    """La ruta orjson debe producir el mismo JSON que la anterior."""
+
+    def test_mismo_contenido(self):
+        import json
+
+        from benchmarks.bench_serializacion import filas_sinteticas, ruta_anterior, ruta_orjson
+
+        filas = filas_sinteticas(200)
+        assert json.loads(ruta_orjson(filas)) == json.loads(ruta_anterior(filas))
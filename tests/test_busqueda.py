@@ -0,0 +1,60 @@
+"""
+Tests de búsqueda libre (q=) y paginación en /solicitudes
+"""
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from routers.solicitudes import buscar_solicitudes, select_solicitudes
+
+
+@pytest.fixture
+def con_solicitudes(db_client):
+    datos = [
+        ("BAÑO", "Fuga de agua en el lavamanos", "María Pérez", "maria@example.com"),
+        ("CLIMATIZACIÓN", "Hace mucho calor", "Juan Soto", "jsoto@example.com"),
+        ("DIETA", "Pide comida sin sal", "Ana 100%", "ana_r@example.com"),
+    ]
+    for tipo, descripcion, nombre, correo in datos:
+        response = db_client.post("/solicitudes", json={
+            "id_cama": 1, "id_area": 1, "tipo": tipo, "descripcion": descripcion,
+            "nombre_solicitante": nombre, "correo_solicitante": correo,
+        })
+        assert response.status_code == 200
+    return db_client
+
+
+class TestBusquedaSolicitudes:
+    """Tests del fallback LIKE (SQLite) y de la consulta para Postgres."""
+
+    def test_busca_en_todos_los_campos(self, con_solicitudes):
+        def ids(q):
+            return [s["tipo"] for s in con_solicitudes.get("/solicitudes", params={"q": q}).json()]
+
+        assert ids("fuga") == ["BAÑO"]
+        assert ids("SOTO") == ["CLIMATIZACIÓN"]
+        assert ids("jsoto@") == ["CLIMATIZACIÓN"]
+        assert ids("dieta") == ["DIETA"]
+        assert ids("zzz") == []
+
+    def test_comodines_se_escapan(self, con_solicitudes):
+        assert len(con_solicitudes.get("/solicitudes", params={"q": "0%"}).json()) == 1
+        assert len(con_solicitudes.get("/solicitudes", params={"q": "a_r"}).json()) == 1
+
+    def test_paginacion(self, con_solicitudes):
+        primera = con_solicitudes.get("/solicitudes", params={"q": "example", "limite": 2}).json()
+        segunda = con_solicitudes.get("/solicitudes", params={"q": "example", "limite": 2, "offset": 2}).json()
+        assert len(primera) == 2
+        assert len(segunda) == 1
+        assert {s["id"] for s in primera}.isdisjoint({s["id"] for s in segunda})
+
+    def test_validacion(self, db_client):
+        assert db_client.get("/solicitudes", params={"q": "a"}).status_code == 422
+        assert db_client.get("/solicitudes", params={"limite": 0}).status_code == 422
+
+    def test_consulta_postgres(self):
+        stmt = buscar_solicitudes(select_solicitudes(), "fuga agua", "postgresql")
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "solicitud.busqueda @@ websearch_to_tsquery" in sql
+        assert "similarity(solicitud.nombre_solicitante" in sql
+        assert "ILIKE" in sql
+        assert "ORDER BY ts_rank" in sql
@@ -0,0 +1,299 @@
+"""
+Tests de la caché con backends intercambiables e invalidación entre workers
+"""
+import fnmatch
+import gc
+import json
+import socketserver
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool
+
+from services import cache
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    """Subconjunto de Redis (AUTH, SELECT, GET, SET PX, DEL, SCAN) sobre RESP2; el resto responde error."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=None):
+        self.datos = {}
+        self.password = password
+        self.comandos = []
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), self._handler())
+
+    def _handler(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def _leer(self):
+                linea = self.rfile.readline()
+                if not linea:
+                    return None
+                args = []
+                for _ in range(int(linea[1:])):
+                    largo = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(largo + 2)[:-2])
+                return args
+
+            def _bulk(self, dato):
+                return b"$-1\r\n" if dato is None else b"$%d\r\n%s\r\n" % (len(dato), dato)
+
+            def handle(self):
+                while True:
+                    args = self._leer()
+                    if args is None:
+                        return
+                    self.wfile.write(fake.ejecutar(args, self._bulk))
+
+        return Handler
+
+    def ejecutar(self, args, bulk):
+        comando = args[0].decode().upper()
+        with self.lock:
+            self.comandos.append(comando)
+            ahora = time.time()
+            for clave in [k for k, (_, vence) in self.datos.items() if vence is not None and vence <= ahora]:
+                del self.datos[clave]
+            if comando == "AUTH":
+                return b"+OK\r\n" if args[1].decode() == self.password else b"-ERR invalid password\r\n"
+            if comando == "SELECT":
+                return b"+OK\r\n"
+            if comando == "GET":
+                entrada = self.datos.get(args[1])
+                return bulk(entrada[0] if entrada else None)
+            if comando == "SET":
+                vence = ahora + int(args[4]) / 1000 if len(args) > 3 and args[3].upper() == b"PX" else None
+                self.datos[args[1]] = (args[2], vence)
+                return b"+OK\r\n"
+            if comando == "DEL":
+                borradas = sum(self.datos.pop(k, None) is not None for k in args[1:])
+                return b":%d\r\n" % borradas
+            if comando == "SCAN":
+                patron = args[args.index(b"MATCH") + 1].decode()
+                claves = [k for k in self.datos if fnmatch.fnmatchcase(k.decode(), patron)]
+                return b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(claves) + b"".join(bulk(k) for k in claves)
+        return b"-ERR unknown command\r\n"
+
+
+@pytest.fixture
+def fake_redis():
+    server = FakeRedis(password="clave")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return cache.MemoryBackend()
+    if request.param == "sqlite":
+        return cache.SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    server = request.getfixturevalue("fake_redis")
+    return cache.RedisBackend(f"redis://:clave@127.0.0.1:{server.server_address[1]}/2")
+
+
+class TestBackends:
+    """Mismo contrato en memoria, SQLite y Redis."""
+
+    def test_get_set_delete(self, backend):
+        assert backend.get("a:1") is None
+        backend.set("a:1", {"x": [1, 2]}, 60)
+        assert backend.get("a:1") == {"x": [1, 2]}
+        backend.delete("a:1")
+        assert backend.get("a:1") is None
+
+    def test_ttl(self, backend):
+        backend.set("a:1", "v", 0.05)
+        time.sleep(0.1)
+        assert backend.get("a:1") is None
+
+    def test_clear_por_prefijo(self, backend):
+        backend.set("cola:1", 1, 60)
+        backend.set("cola:2", 2, 60)
+        backend.set("jwt:1", 3, 60)
+        backend.clear("cola:")
+        assert backend.get("cola:1") is None and backend.get("cola:2") is None
+        assert backend.get("jwt:1") == 3
+
+    def test_memoria_acotada(self):
+        memoria = cache.MemoryBackend(max_entries=2)
+        for i in range(3):
+            memoria.set(f"k{i}", i, 60)
+        assert memoria.get("k0") is None and memoria.get("k2") == 2
+
+    def test_sqlite_compartido_entre_workers(self, tmp_path):
+        ruta = str(tmp_path / "cache.sqlite3")
+        worker_a, worker_b = cache.SQLiteBackend(ruta), cache.SQLiteBackend(ruta)
+        worker_a.set("cola:1", [1, 2, 3], 60)
+        assert worker_b.get("cola:1") == [1, 2, 3]
+
+
+class TestSerializacion:
+    """Los backends compartidos guardan JSON; nunca deserializan objetos arbitrarios."""
+
+    def test_redis_guarda_json(self, fake_redis):
+        url = f"redis://:clave@127.0.0.1:{fake_redis.server_address[1]}/0"
+        cache.RedisBackend(url).set("jwt:x", {"sub": "u", "exp": 1}, 60)
+        assert json.loads(fake_redis.datos[b"jwt:x"][0]) == {"sub": "u", "exp": 1}
+
+    def test_payload_pickle_no_se_ejecuta(self, fake_redis):
+        import pickle
+
+        url = f"redis://:clave@127.0.0.1:{fake_redis.server_address[1]}/0"
+        c = cache.Cache("jwt_prueba_pickle", 60, backend=cache.RedisBackend(url))
+        c.backend._client.set("jwt_prueba_pickle:x", pickle.dumps({"a": 1}))
+        assert c.get("x") is None  # JSON inválido: cuenta como error/fallo
+
+    def test_cola_sobrevive_al_backend_compartido(self, tmp_path, db_session, monkeypatch):
+        from services import cola
+
+        from datetime import datetime, timedelta, timezone
+
+        from models.models import EstadoSolicitud, Solicitud
+
+        monkeypatch.setattr(cola._cache, "_backend", cache.SQLiteBackend(str(tmp_path / "c.sqlite3")))
+        db = db_session()
+        db.add(Solicitud(
+            id_solicitud=1, id_cama=1, id_area=1, tipo="T", estado_actual=EstadoSolicitud.PENDIENTE,
+            fecha_creacion=datetime.now(timezone.utc) - timedelta(minutes=30),
+        ))
+        db.commit()
+        try:
+            primera = cola.cola(db, None)
+            segunda = cola.cola(db, None)  # leída del archivo, ya como JSON
+        finally:
+            db.close()
+        assert primera["solicitudes"] == segunda["solicitudes"]
+        assert segunda["solicitudes"][0]["estado"] == "pendiente"
+        assert segunda["solicitudes"][0]["espera_minutos"] >= 29
+
+
+class TestCache:
+    """Espacio de nombres, carga única, errores e invalidación."""
+
+    def test_obtener_carga_una_vez(self):
+        c = cache.Cache("prueba_carga", 60, backend=cache.MemoryBackend())
+        cargas = []
+
+        def cargar():
+            cargas.append(1)
+            time.sleep(0.05)
+            return "valor"
+
+        hilos = [threading.Thread(target=c.obtener, args=("k", cargar)) for _ in range(8)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        assert len(cargas) == 1
+        assert c.get("k") == "valor"
+
+    def test_invalidacion_durante_la_carga_no_se_guarda(self):
+        c = cache.Cache("prueba_carrera", 60, backend=cache.MemoryBackend())
+
+        def cargar():
+            c.invalidar()  # llega una mutación mientras se leía
+            return "viejo"
+
+        assert c.obtener("k", cargar) == "viejo"
+        assert c.get("k") is None
+
+    def test_carga_lenta_no_frena_otras_claves(self):
+        c = cache.Cache("prueba_por_clave", 60, backend=cache.MemoryBackend())
+        liberar = threading.Event()
+        lenta = threading.Thread(target=c.obtener, args=("area:1", lambda: liberar.wait(5) and "lenta"))
+        lenta.start()
+        time.sleep(0.05)
+        inicio = time.perf_counter()
+        assert c.obtener("area:2", lambda: "rapida") == "rapida"
+        assert time.perf_counter() - inicio < 0.5
+        liberar.set()
+        lenta.join()
+        assert c.get("area:1") == "lenta"
+        assert c._cargando == {}
+
+    def test_ttl_cero_no_cachea(self):
+        c = cache.Cache("prueba_sin_ttl", 0, backend=cache.MemoryBackend())
+        assert c.obtener("k", lambda: 1) == 1
+        assert c.obtener("k", lambda: 2) == 2
+
+    def test_backend_caido_es_un_fallo(self):
+        c = cache.Cache("prueba_caido", 60, backend=cache.RedisBackend("redis://127.0.0.1:1", timeout=0.2))
+        assert c.obtener("k", lambda: "desde_bd") == "desde_bd"
+        assert 'cache_errores_total{cache="prueba_caido"}' in "\n".join(cache.ERRORES_TOTAL.render())
+
+    def test_invalidar_publica(self, monkeypatch):
+        publicadas = []
+
+        class Bus:
+            def publicar(self, nombre, key):
+                publicadas.append((nombre, key))
+
+        monkeypatch.setattr(cache, "invalidaciones", Bus())
+        c = cache.Cache("prueba_publica", 60, backend=cache.MemoryBackend())
+        c.set("k", 1)
+        c.invalidar("k")
+        assert c.get("k") is None
+        assert publicadas == [("prueba_publica", "k")]
+
+
+class TestInvalidacionEntreWorkers:
+    """Mensajes NOTIFY aplicados a las cachés registradas."""
+
+    def test_aplicar_mensaje(self):
+        c = cache.Cache("prueba_notify", 60, backend=cache.MemoryBackend())
+        c.set("a", 1)
+        c.set("b", 2)
+        cache.aplicar(json.dumps({"cache": "prueba_notify", "clave": "a"}))
+        assert c.get("a") is None and c.get("b") == 2
+        cache.aplicar(json.dumps({"cache": "prueba_notify", "clave": None}))
+        assert c.get("b") is None
+
+    def test_mensaje_malformado_o_desconocido(self):
+        cache.aplicar("no es json")
+        cache.aplicar(json.dumps({"cache": "no_existe"}))
+
+    def test_catalogo_cola_y_jwt_registrados(self):
+        import auth.dependencies  # noqa: F401
+        from services import catalogo, cola  # noqa: F401
+
+        assert {"catalogo", "cola", "jwt"} <= set(cache._registro)
+
+    def test_sin_postgres_no_escucha(self, tmp_path):
+        bus = cache.Invalidaciones(create_engine(f"sqlite:///{tmp_path / 'x.db'}"))
+        bus.start()
+        bus.publicar("cola", None)
+        bus.stop()
+
+    def test_conexion_del_listener_sobrevive_al_gc(self, tmp_path):
+        """Con NullPool, si sólo se guardara la conexión DBAPI el GC cerraría el LISTEN."""
+        bus = cache.Invalidaciones(create_engine(f"sqlite:///{tmp_path / 'x.db'}"))
+        bus._enabled = True
+        bus._engine = create_engine(f"sqlite:///{tmp_path / 'x.db'}", poolclass=NullPool)
+        sentencias = []
+
+        @event.listens_for(bus._engine, "before_cursor_execute", retval=True)
+        def sin_listen(conn, cursor, statement, parameters, context, executemany):
+            # SQLite no tiene LISTEN: se registra y se reemplaza por un no-op.
+            sentencias.append(statement)
+            return ("SELECT 1", ()) if statement.startswith("LISTEN") else (statement, parameters)
+
+        bus._conectar()
+        try:
+            gc.collect()
+            assert sentencias == [f"LISTEN {cache.CANAL}"]
+            bus._dbapi().execute("SELECT 1")  # sigue abierta
+        finally:
+            bus.stop()
+        assert bus._conn is None
@@ -0,0 +1,79 @@
+"""
+Tests de selección de campos (fields=) en listados
+"""
+import pytest
+from sqlalchemy import event
+
+from auth.dependencies import require_authenticated_user
+from main import app
+from models.models import RolUsuario, Usuario
+
+
+@pytest.fixture
+def con_solicitud(db_client):
+    response = db_client.post(
+        "/solicitudes",
+        json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO", "descripcion": "Fuga", "correo_solicitante": "p@example.com"},
+    )
+    assert response.status_code == 200
+    return db_client
+
+
+@pytest.fixture
+def sentencias(db_session):
+    capturadas = []
+    engine = db_session.kw["bind"]
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        capturadas.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capturar)
+    yield capturadas
+    event.remove(engine, "before_cursor_execute", capturar)
+
+
+class TestCamposSolicitudes:
+    """Tests de fields= en /solicitudes y /admin/bootstrap."""
+
+    def test_sin_fields_devuelve_todo(self, con_solicitud):
+        solicitud = con_solicitud.get("/solicitudes").json()[0]
+        assert solicitud["identificador_qr"] == "QR-TEST-1"
+        assert solicitud["estado"] == "pendiente"
+        assert len(solicitud) == 13
+
+    def test_fields_reduce_salida_y_columnas(self, con_solicitud, sentencias):
+        response = con_solicitud.get("/solicitudes?fields=id,estado,id_area,fecha_creacion")
+        assert response.status_code == 200
+        solicitud = response.json()[0]
+        assert set(solicitud) == {"id", "estado", "id_area", "fecha_creacion"}
+
+        sql = next(s for s in sentencias if "FROM solicitud" in s)
+        assert "descripcion" not in sql
+        assert "correo_solicitante" not in sql
+        assert "JOIN cama" not in sql
+
+    def test_una_sola_consulta_con_qr(self, con_solicitud, sentencias):
+        con_solicitud.get("/solicitudes?fields=id,identificador_qr&id_hospital=1")
+        assert len([s for s in sentencias if "FROM solicitud" in s]) == 1
+
+    def test_campo_invalido(self, db_client):
+        response = db_client.get("/solicitudes?fields=id,password")
+        assert response.status_code == 400
+        assert "password" in response.json()["detail"]
+
+    def test_bootstrap_con_fields(self, con_solicitud):
+        app.dependency_overrides[require_authenticated_user] = lambda: Usuario(
+            rol=RolUsuario.ADMIN, correo="admin@example.com", nombre="Admin"
+        )
+        data = con_solicitud.get("/admin/bootstrap?fields=id,estado").json()
+        assert data["solicitudes"] == [{"id": 1, "estado": "pendiente"}]
+        assert data["camas"][0]["qr"] == "QR-TEST-1"
+
+
+class TestCamposCatalogo:
+    """Tests de fields= en los endpoints del catálogo."""
+
+    def test_proyecta_catalogo(self, db_client):
+        assert db_client.get("/camas?fields=id_cama,qr").json() == [{"id_cama": 1, "qr": "QR-TEST-1"}]
+        assert db_client.get("/hospitales/1/habitaciones?fields=nombre").json() == [{"nombre": "101"}]
+        assert db_client.get("/areas?fields=letra").status_code == 400
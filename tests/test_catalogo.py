@@ -0,0 +1,105 @@
+"""
+Tests del catálogo de ubicaciones en caché con ETag
+"""
+import pytest
+
+from auth.dependencies import require_admin
+from main import app
+from models.models import RolUsuario, Usuario
+
+
+@pytest.fixture
+def admin_client(db_client):
+    app.dependency_overrides[require_admin] = lambda: Usuario(rol=RolUsuario.ADMIN, correo="admin@example.com")
+    return db_client
+
+
+class TestCatalogo:
+    """Tests de caché, 304 e invalidación por mutaciones de admin."""
+
+    def test_listados_con_etag(self, db_client):
+        response = db_client.get("/hospitales")
+        assert response.status_code == 200
+        assert response.json() == [{"id_hospital": 1, "nombre": "Hospital Test"}]
+        assert response.headers["etag"].startswith('"cat-')
+        assert db_client.get("/habitaciones").json()[0]["id_hospital"] == 1
+        assert db_client.get("/camas/by-qr/QR-TEST-1").json()["id_cama"] == 1
+        assert db_client.get("/hospitales/1/habitaciones").headers["etag"] == response.headers["etag"]
+
+    def test_if_none_match_devuelve_304(self, db_client):
+        etag = db_client.get("/camas").headers["etag"]
+        response = db_client.get("/camas", headers={"If-None-Match": f'W/{etag}, "otro"'})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert db_client.get("/camas", headers={"If-None-Match": '"otro"'}).status_code == 200
+
+    def test_404_desde_el_catalogo(self, db_client):
+        assert db_client.get("/hospitales/99/edificios").status_code == 404
+        assert db_client.get("/camas/by-qr/NO-EXISTE").status_code == 404
+
+    def test_no_consulta_la_bd_con_catalogo_cargado(self, db_client, db_session):
+        from db import session as sesion_db
+
+        db_client.get("/areas")
+        engine = db_session.kw["bind"]
+        sesion_db.enable_query_timing(engine)
+        try:
+            response = db_client.get("/areas")
+        finally:
+            sesion_db.disable_query_timing(engine)
+        assert '"0 queries"' in response.headers["server-timing"]
+
+    def test_mutaciones_invalidan(self, admin_client):
+        etag = admin_client.get("/camas").headers["etag"]
+        creada = admin_client.post("/admin/camas", json={"id_habitacion": 1, "letra": "B"})
+        assert creada.status_code == 201
+
+        response = admin_client.get("/camas", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+        assert response.headers["etag"] != etag
+
+        id_cama = creada.json()["cama"]["id_cama"]
+        admin_client.patch(f"/admin/camas/{id_cama}", json={"activo": False})
+        assert admin_client.get(f"/camas/{id_cama}").json()["activo"] is False
+
+
+class TestArbolHospital:
+    """Tests del endpoint /hospitales/{id}/arbol."""
+
+    def test_arbol_completo(self, db_client):
+        arbol = db_client.get("/hospitales/1/arbol").json()
+        assert arbol == {
+            "id_hospital": 1,
+            "nombre": "Hospital Test",
+            "edificios": [{
+                "id_edificio": 1,
+                "nombre": "Torre A",
+                "pisos": [{
+                    "id_piso": 1,
+                    "numero": 1,
+                    "habitaciones": [{
+                        "id_habitacion": 1,
+                        "nombre": "101",
+                        "id_servicio": 1,
+                        "camas": [{"id_cama": 1, "letra": "A", "qr": "QR-TEST-1", "activo": True}],
+                    }],
+                }],
+            }],
+        }
+
+    def test_profundidad_y_campos(self, db_client):
+        arbol = db_client.get("/hospitales/1/arbol?profundidad=2&fields=nombre").json()
+        assert arbol == {
+            "id_hospital": 1,
+            "nombre": "Hospital Test",
+            "edificios": [{"id_edificio": 1, "nombre": "Torre A", "pisos": [{"id_piso": 1}]}],
+        }
+        camas = db_client.get("/hospitales/1/arbol?fields=qr").json()["edificios"][0]["pisos"][0]["habitaciones"][0]
+        assert camas == {"id_habitacion": 1, "camas": [{"id_cama": 1, "qr": "QR-TEST-1"}]}
+
+    def test_errores(self, db_client):
+        assert db_client.get("/hospitales/99/arbol").status_code == 404
+        assert db_client.get("/hospitales/1/arbol?fields=correo").status_code == 400
+        assert db_client.get("/hospitales/1/arbol?profundidad=9").status_code == 422
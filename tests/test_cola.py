@@ -0,0 +1,78 @@
+"""
+Tests de la cola de solicitudes abiertas con SLA
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from auth.dependencies import require_authenticated_user
+from main import app
+from models.models import Area, EstadoSolicitud, RolUsuario, Solicitud, Usuario
+from services import cola
+
+
+def _como(rol, id_area=None):
+    app.dependency_overrides[require_authenticated_user] = lambda: Usuario(
+        rol=rol, correo="u@example.com", id_area=id_area
+    )
+
+
+@pytest.fixture
+def con_cola(db_client, db_session):
+    ahora = datetime.now(timezone.utc)
+    db = db_session()
+    db.add(Area(id_area=2, nombre_area="Limpieza", sla_minutos=60))
+    for id_sol, id_area, minutos, estado in [
+        (1, 1, 10, EstadoSolicitud.PENDIENTE),
+        (2, 1, 300, EstadoSolicitud.EN_PROCESO),
+        (3, 1, 500, EstadoSolicitud.CERRADA),
+        (4, 2, 50, EstadoSolicitud.PENDIENTE),
+    ]:
+        db.add(Solicitud(
+            id_solicitud=id_sol, id_cama=1, id_area=id_area, tipo="T", estado_actual=estado,
+            fecha_creacion=ahora - timedelta(minutes=minutos),
+        ))
+    db.commit()
+    db.close()
+    return db_client
+
+
+class TestCola:
+    """Tests de orden, cálculo de SLA y alcance por rol."""
+
+    def test_jefe_ve_su_area_mas_antigua_primero(self, con_cola):
+        _como(RolUsuario.JEFE_AREA, id_area=1)
+        data = con_cola.get("/admin/cola", params={"id_area": 2}).json()
+        assert data["id_area"] == 1
+        assert [s["id"] for s in data["solicitudes"]] == [2, 1]
+        vieja, nueva = data["solicitudes"]
+        assert vieja["sla_minutos"] == cola.SLA_MINUTOS_DEFAULT
+        assert vieja["sla_estado"] == "vencida"
+        assert vieja["espera_minutos"] >= 299
+        assert nueva["sla_estado"] == "en_plazo"
+        assert nueva["identificador_qr"] == "QR-TEST-1"
+        assert data["vencidas"] == 1
+
+    def test_sla_por_area(self, con_cola):
+        _como(RolUsuario.ADMIN)
+        data = con_cola.get("/admin/cola", params={"id_area": 2}).json()
+        assert data["solicitudes"][0]["sla_minutos"] == 60
+        assert data["solicitudes"][0]["sla_estado"] == "por_vencer"
+        assert con_cola.get("/admin/cola").json()["total"] == 3
+
+    def test_cache_comparte_consulta(self, con_cola, db_session):
+        _como(RolUsuario.ADMIN)
+        assert con_cola.get("/admin/cola").json()["total"] == 3
+        db = db_session()
+        db.query(Solicitud).filter(Solicitud.id_solicitud == 1).update(
+            {"estado_actual": EstadoSolicitud.CERRADA}
+        )
+        db.commit()
+        db.close()
+        assert con_cola.get("/admin/cola").json()["total"] == 3
+        cola.invalidar()
+        assert con_cola.get("/admin/cola").json()["total"] == 2
+
+    def test_jefe_sin_area(self, db_client):
+        _como(RolUsuario.JEFE_AREA)
+        assert db_client.get("/admin/cola").status_code == 400
@@ -0,0 +1,152 @@
+"""
+Tests del escalamiento SLA en segundo plano y del scheduler
+"""
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models.models import Area, EstadoSolicitud, Solicitud
+from services import escalamiento, notificaciones, outbox
+from services.scheduler import RUN_DURATION, RUNS_TOTAL, LeaderLock, Scheduler
+
+AHORA = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def eventos():
+    recibidos = []
+
+    def suscriptor(evento, payload):
+        recibidos.append((evento, payload))
+
+    notificaciones.suscribir(suscriptor)
+    yield recibidos
+    notificaciones.desuscribir(suscriptor)
+
+
+@pytest.fixture
+def sesiones(db_session):
+    db = db_session()
+    db.add(Area(id_area=2, nombre_area="Limpieza", sla_minutos=30))
+    filas = [
+        # (id, area, minutos de antigüedad, estado)
+        (1, 1, 300, EstadoSolicitud.PENDIENTE),   # vencida (SLA por defecto 240)
+        (2, 1, 100, EstadoSolicitud.PENDIENTE),   # en plazo
+        (3, 1, 500, EstadoSolicitud.CERRADA),     # cerrada: no se escala
+        (4, 2, 45, EstadoSolicitud.EN_PROCESO),   # vencida (SLA 30)
+        (5, 2, 40, EstadoSolicitud.PENDIENTE),    # vencida (SLA 30)
+    ]
+    for id_sol, id_area, minutos, estado in filas:
+        db.add(Solicitud(
+            id_solicitud=id_sol, id_cama=1, id_area=id_area, tipo="T", estado_actual=estado,
+            fecha_creacion=AHORA - timedelta(minutes=minutos),
+        ))
+    db.commit()
+    db.close()
+    return db_session
+
+
+def _escaladas(sesiones):
+    db = sesiones()
+    try:
+        return sorted(s.id_solicitud for s in db.query(Solicitud).filter(Solicitud.escalada.is_(True)))
+    finally:
+        db.close()
+
+
+class TestEscalamiento:
+    """Tests de selección por SLA de área, lotes y notificaciones."""
+
+    def test_escala_vencidas_por_area(self, sesiones, eventos):
+        assert escalamiento.escalar_vencidas(sesiones, ahora=AHORA, lote=1) == 3
+        assert _escaladas(sesiones) == [1, 4, 5]
+        # Los avisos salen por el outbox, recién cuando corre el relay.
+        assert eventos == []
+        outbox.drenar(sesiones, [outbox.SinkSuscriptores()])
+        assert sorted(p["id_solicitud"] for e, p in eventos if e == "solicitud.escalada") == [1, 4, 5]
+        assert {p["sla_minutos"] for _, p in eventos if p["id_area"] == 2} == {30}
+
+    def test_no_repite(self, sesiones, eventos):
+        escalamiento.escalar_vencidas(sesiones, ahora=AHORA)
+        assert escalamiento.escalar_vencidas(sesiones, ahora=AHORA) == 0
+        outbox.drenar(sesiones, [outbox.SinkSuscriptores()])
+        assert len(eventos) == 3
+
+    def test_reabierta_puede_escalar_de_nuevo(self, sesiones):
+        from services import historial
+
+        escalamiento.escalar_vencidas(sesiones, ahora=AHORA)
+        reapertura = AHORA + timedelta(minutes=5)
+        db = sesiones()
+        solicitud = db.get(Solicitud, 1)
+        historial.registrar_transicion(db, solicitud, EstadoSolicitud.CERRADA, AHORA + timedelta(minutes=1))
+        db.commit()
+        historial.registrar_transicion(db, solicitud, EstadoSolicitud.PENDIENTE, reapertura)
+        db.commit()
+        assert solicitud.escalada is False and solicitud.fecha_escalamiento is None
+        db.close()
+
+        # El SLA corre desde la reapertura, no desde la creación.
+        assert escalamiento.escalar_vencidas(sesiones, ahora=reapertura + timedelta(minutes=10)) == 0
+        escalamiento.escalar_vencidas(sesiones, ahora=reapertura + timedelta(minutes=241))
+        assert 1 in _escaladas(sesiones)
+
+    def test_cambio_entre_abiertos_no_limpia(self, sesiones):
+        from services import historial
+
+        escalamiento.escalar_vencidas(sesiones, ahora=AHORA)
+        db = sesiones()
+        solicitud = db.get(Solicitud, 5)
+        historial.registrar_transicion(db, solicitud, EstadoSolicitud.EN_PROCESO, AHORA + timedelta(minutes=1))
+        db.commit()
+        assert solicitud.escalada is True
+        db.close()
+
+    def test_tope_de_lotes(self, sesiones):
+        corridas = [escalamiento.escalar_vencidas(sesiones, ahora=AHORA, lote=1, max_lotes=2) for _ in range(4)]
+        assert max(corridas) <= 2
+        assert sum(corridas) == 3
+        assert _escaladas(sesiones) == [1, 4, 5]
+
+
+class _Lider:
+    def __init__(self, es_lider):
+        self.es_lider = es_lider
+
+    def acquire(self):
+        return self.es_lider
+
+    def release(self):
+        pass
+
+
+class TestScheduler:
+    """Tests de ejecución periódica, liderazgo y métricas."""
+
+    def test_solo_el_lider_ejecuta(self):
+        llamadas = []
+        scheduler = Scheduler(_Lider(False))
+        scheduler.add("prueba_seguidor", 60, lambda: llamadas.append(1))
+        assert scheduler.run_once(scheduler._tasks[0]) is False
+        assert llamadas == []
+
+    def test_metricas_y_errores(self):
+        scheduler = Scheduler(_Lider(True))
+        scheduler.add("prueba_falla", 60, lambda: 1 / 0)
+        assert scheduler.run_once(scheduler._tasks[0]) is True
+        assert RUN_DURATION.snapshot("prueba_falla")[0] == 1
+        assert 'scheduler_runs_total{task="prueba_falla",resultado="error"} 1' in "\n".join(RUNS_TOTAL.render())
+
+    def test_hilo_periodico(self):
+        corrio = threading.Event()
+        scheduler = Scheduler()
+        scheduler.add("prueba_hilo", 0.01, corrio.set)
+        scheduler.start()
+        try:
+            assert corrio.wait(2)
+        finally:
+            scheduler.stop()
+
+    def test_sqlite_siempre_lider(self, db_session):
+        assert LeaderLock(db_session.kw["bind"], 1).acquire() is True
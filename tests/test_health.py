@@ -0,0 +1,163 @@
+"""
+Tests de /healthz, /readyz y la saturación del pool
+"""
+import socket
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from db.session import WaitTrackingQueuePool
+from services import health
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'health.db'}",
+        poolclass=WaitTrackingQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=5,
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        conn.execute(text("INSERT INTO alembic_version VALUES (:v)"), {"v": health.head_alembic()})
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "engine", engine)
+    return TestClient(main.app)
+
+
+class TestHealthz:
+    def test_responde_sin_tocar_la_bd(self, client, engine, monkeypatch):
+        monkeypatch.setattr(engine, "connect", lambda: (_ for _ in ()).throw(AssertionError("I/O")))
+        respuesta = client.get("/healthz")
+        assert respuesta.status_code == 200
+        assert respuesta.json() == {"estado": "ok"}
+
+
+class TestReadyz:
+    def test_listo(self, client):
+        respuesta = client.get("/readyz")
+        assert respuesta.status_code == 200
+        cuerpo = respuesta.json()
+        assert cuerpo["listo"] is True
+        assert set(cuerpo["checks"]) == {"pool", "bd", "migraciones"}
+
+    def test_head_es_el_de_alembic(self):
+        assert health.head_alembic() == "f3a4b5c6d7e8"
+
+    def test_migraciones_pendientes(self, client, engine):
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE alembic_version SET version_num = 'a8b9c0d1e2f3'"))
+        respuesta = client.get("/readyz")
+        assert respuesta.status_code == 503
+        assert respuesta.json()["checks"]["migraciones"] == {
+            "ok": False, "actual": "a8b9c0d1e2f3", "esperada": "f3a4b5c6d7e8",
+        }
+
+    def test_esquema_sin_versionar(self, client, engine, caplog):
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE alembic_version"))
+        with caplog.at_level("WARNING", logger="health"):
+            respuesta = client.get("/readyz")
+            client.get("/readyz")
+        assert respuesta.status_code == 200
+        migraciones = respuesta.json()["checks"]["migraciones"]
+        assert migraciones["ok"] is True and migraciones["actual"] is None
+        assert migraciones["advertencia"] == "esquema sin versionar"
+        assert len([r for r in caplog.records if "alembic_version" in r.getMessage()]) == 1
+
+    def test_error_leyendo_la_version_no_esta_listo(self, client, engine):
+        # La tabla existe pero no se puede leer: no es "sin versionar".
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE alembic_version"))
+            conn.execute(text("CREATE TABLE alembic_version (otra_columna VARCHAR(32))"))
+        respuesta = client.get("/readyz")
+        assert respuesta.status_code == 503
+        migraciones = respuesta.json()["checks"]["migraciones"]
+        assert migraciones["ok"] is False
+        assert "version_num" in migraciones["error"]
+        assert respuesta.json()["checks"]["bd"]["ok"] is True
+
+    def test_bd_que_no_responde(self, monkeypatch):
+        """El timeout lo aplica el driver a la conexión: no quedan hilos colgados."""
+        monkeypatch.setattr(health, "PING_TIMEOUT_SECONDS", 1)
+        mudo = socket.socket()
+        mudo.bind(("127.0.0.1", 0))
+        mudo.listen(1)  # acepta TCP pero nunca contesta el handshake de Postgres
+        engine = create_engine(f"postgresql+psycopg2://u:p@127.0.0.1:{mudo.getsockname()[1]}/x")
+        hilos = threading.active_count()
+        try:
+            inicio = time.perf_counter()
+            resultado = health.ping_bd(engine)
+            assert time.perf_counter() - inicio < 4
+        finally:
+            mudo.close()
+        assert resultado["ok"] is False
+        assert "timeout expired" in resultado["error"]
+        assert threading.active_count() == hilos
+
+    def test_sonda_no_usa_el_pool_de_la_app(self, client, engine):
+        with engine.connect():  # pool_size=1 ocupado
+            assert client.get("/readyz").json()["checks"]["bd"]["ok"] is True
+        assert engine.pool.checkedout() == 0
+
+    def test_apagando(self, client):
+        health.marcar_apagando()
+        assert client.get("/readyz").status_code == 503
+        assert client.get("/healthz").status_code == 200
+
+
+class TestSaturacionDelPool:
+    """Con cola de espera larga se deja de recibir tráfico sin pedir otra conexión."""
+
+    def test_cuenta_los_que_esperan(self, client, engine, monkeypatch):
+        monkeypatch.setattr(health, "POOL_SATURACION_MAX", 1)
+        ocupada = engine.connect()
+        esperando = threading.Thread(target=lambda: engine.connect().close())
+        esperando.start()
+        try:
+            for _ in range(100):
+                if engine.pool.waiting():
+                    break
+                time.sleep(0.01)
+            respuesta = client.get("/readyz")
+            assert respuesta.status_code == 503
+            pool = respuesta.json()["checks"]["pool"]
+            assert pool == {"ok": False, "capacidad": 1, "en_uso": 1, "esperando": 1, "saturacion": 2.0}
+            assert "bd" not in respuesta.json()["checks"]
+        finally:
+            ocupada.close()
+            esperando.join()
+        assert engine.pool.waiting() == 0
+        assert client.get("/readyz").status_code == 200
+
+    def test_checkout_sin_espera_no_cuenta(self, engine, monkeypatch):
+        from sqlalchemy.pool import QueuePool
+
+        vistos = []
+        original = QueuePool._do_get
+
+        def espiar(pool):
+            vistos.append(pool.waiting())
+            return original(pool)
+
+        monkeypatch.setattr(QueuePool, "_do_get", espiar)
+        engine.connect().close()  # pool libre: no espera
+        assert vistos == [0]
+
+    def test_metricas_del_pool(self, client, engine):
+        with engine.connect():
+            texto = client.get("/metrics").text
+        assert "db_pool_conexiones_en_uso 1" in texto
+        assert "db_pool_esperando 0" in texto
@@ -0,0 +1,292 @@
+"""
+Tests del historial de estados (solicitud_evento) y sus rollups diarios
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from auth.dependencies import require_authenticated_user
+from main import app
+from models.models import (
+    Area,
+    EstadoSolicitud,
+    RolUsuario,
+    RollupEstadoDiario,
+    RollupMarca,
+    RollupPrimeraRespuestaDiaria,
+    Solicitud,
+    SolicitudEvento,
+    Usuario,
+)
+from services import historial
+
+AHORA = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _eventos(db_session, id_solicitud):
+    db = db_session()
+    try:
+        return [
+            (e.estado_anterior, e.estado_nuevo)
+            for e in db.query(SolicitudEvento)
+            .filter(SolicitudEvento.id_solicitud == id_solicitud)
+            .order_by(SolicitudEvento.id_evento)
+        ]
+    finally:
+        db.close()
+
+
+def _transicion(db_session, id_solicitud, estado, ahora):
+    db = db_session()
+    try:
+        solicitud = db.get(Solicitud, id_solicitud)
+        historial.registrar_transicion(db, solicitud, estado, ahora)
+        db.commit()
+    finally:
+        db.close()
+
+
+class TestEventosEnEndpoints:
+    """Crear y cambiar de estado escribe eventos en la misma transacción."""
+
+    def test_creacion_y_transiciones(self, db_client, db_session):
+        creada = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "Luz"}).json()
+        id_sol = creada["solicitud"]["id"]
+        db_client.put(f"/solicitudes/{id_sol}/estado", params={"nuevo_estado": "en_proceso"})
+        db_client.put(f"/solicitudes/{id_sol}/estado", params={"nuevo_estado": "en_proceso"})
+        db_client.put(f"/solicitudes/{id_sol}/estado", params={"nuevo_estado": "cerrada"})
+
+        assert _eventos(db_session, id_sol) == [
+            (None, EstadoSolicitud.PENDIENTE),
+            (EstadoSolicitud.PENDIENTE, EstadoSolicitud.EN_PROCESO),
+            (EstadoSolicitud.EN_PROCESO, EstadoSolicitud.CERRADA),
+        ]
+
+    def test_fusion_genera_evento_de_agrupacion(self, db_client, db_session):
+        from models.models import EventoOutbox
+
+        payload = {"id_cama": 1, "id_area": 1, "tipo": "Agua"}
+        id_sol = db_client.post("/solicitudes", json=payload).json()["solicitud"]["id"]
+        assert db_client.post("/solicitudes", json=payload).json()["fusionada"] is True
+
+        db = db_session()
+        try:
+            eventos = db.query(SolicitudEvento).order_by(SolicitudEvento.id_evento).all()
+            assert [e.tipo for e in eventos] == ["estado", historial.TIPO_AGRUPACION]
+            assert eventos[1].estado_anterior == eventos[1].estado_nuevo == EstadoSolicitud.PENDIENTE
+            assert eventos[1].segundos_en_estado is None
+            tipos = [e.tipo for e in db.query(EventoOutbox).order_by(EventoOutbox.id_evento)]
+            assert tipos == ["solicitud.creada", "solicitud.agrupada"]
+        finally:
+            db.close()
+
+    def test_agrupacion_no_mueve_el_inicio_del_estado(self, db_session):
+        db = db_session()
+        db.add(Solicitud(
+            id_solicitud=20, id_cama=1, id_area=1, tipo="T",
+            estado_actual=EstadoSolicitud.PENDIENTE, fecha_creacion=AHORA,
+        ))
+        db.commit()
+        historial.registrar_agrupacion(db, db.get(Solicitud, 20), AHORA + timedelta(minutes=5))
+        db.commit()
+        db.close()
+
+        _transicion(db_session, 20, EstadoSolicitud.EN_PROCESO, AHORA + timedelta(minutes=10))
+        db = db_session()
+        try:
+            ultimo = db.query(SolicitudEvento).order_by(SolicitudEvento.id_evento.desc()).first()
+            assert ultimo.segundos_en_estado == 600
+            assert historial.acumular_rollups(db_session, ahora=AHORA + timedelta(days=1)) == 2
+            assert db.query(RollupEstadoDiario).one().salidas == 1
+        finally:
+            db.close()
+
+
+class TestRegistrarTransicion:
+    """Duraciones por estado, primera respuesta y reapertura."""
+
+    def test_duraciones_y_reapertura(self, db_session):
+        db = db_session()
+        db.add(Solicitud(
+            id_solicitud=10, id_cama=1, id_area=1, tipo="T",
+            estado_actual=EstadoSolicitud.PENDIENTE, fecha_creacion=AHORA,
+        ))
+        db.commit()
+        db.close()
+
+        _transicion(db_session, 10, EstadoSolicitud.EN_PROCESO, AHORA + timedelta(minutes=10))
+        _transicion(db_session, 10, EstadoSolicitud.CERRADA, AHORA + timedelta(minutes=40))
+        _transicion(db_session, 10, EstadoSolicitud.PENDIENTE, AHORA + timedelta(minutes=50))
+        _transicion(db_session, 10, EstadoSolicitud.EN_PROCESO, AHORA + timedelta(minutes=55))
+
+        db = db_session()
+        eventos = db.query(SolicitudEvento).order_by(SolicitudEvento.id_evento).all()
+        # Sin evento de creación se parte desde fecha_creacion.
+        assert [e.segundos_en_estado for e in eventos] == [600, 1800, 600, 300]
+        # Sólo la primera salida de "pendiente" cuenta como primera respuesta.
+        assert [e.segundos_primera_respuesta for e in eventos] == [600, None, None, None]
+        solicitud = db.get(Solicitud, 10)
+        assert solicitud.fecha_cierre is None
+        assert solicitud.fecha_primera_respuesta.replace(tzinfo=timezone.utc) == AHORA + timedelta(minutes=10)
+        # El cierre anterior sigue en el historial aunque se reabrió.
+        assert any(e.estado_nuevo == EstadoSolicitud.CERRADA for e in eventos)
+        db.close()
+
+
+class TestRollups:
+    """Acumulación por lotes en los rollups diarios."""
+
+    def _preparar(self, db_session):
+        db = db_session()
+        for id_sol in (20, 21):
+            db.add(Solicitud(
+                id_solicitud=id_sol, id_cama=1, id_area=1, tipo="T",
+                estado_actual=EstadoSolicitud.PENDIENTE, fecha_creacion=AHORA,
+            ))
+        db.commit()
+        db.close()
+        _transicion(db_session, 20, EstadoSolicitud.EN_PROCESO, AHORA + timedelta(minutes=10))
+        _transicion(db_session, 21, EstadoSolicitud.EN_PROCESO, AHORA + timedelta(minutes=30))
+        _transicion(db_session, 20, EstadoSolicitud.CERRADA, AHORA + timedelta(minutes=70))
+
+    def test_acumula_una_sola_vez(self, db_session):
+        self._preparar(db_session)
+        despues = AHORA + timedelta(hours=2)
+        assert historial.acumular_rollups(db_session, ahora=despues, lote=2) == 3
+        assert historial.acumular_rollups(db_session, ahora=despues) == 0
+
+        db = db_session()
+        estados = {r.estado: (r.salidas, r.segundos) for r in db.query(RollupEstadoDiario)}
+        assert estados == {
+            EstadoSolicitud.PENDIENTE: (2, 2400),
+            EstadoSolicitud.EN_PROCESO: (1, 3600),
+        }
+        primera = db.query(RollupPrimeraRespuestaDiaria).one()
+        assert (primera.cantidad, primera.segundos) == (2, 2400)
+        assert db.get(RollupMarca, historial.MARCA).ultimo_id == 3
+        db.close()
+
+    def test_respeta_margen(self, db_session):
+        self._preparar(db_session)
+        # Con margen de 30 min, a los 45 min sólo el primer evento (minuto 10) es acumulable.
+        ahora = AHORA + timedelta(minutes=45)
+        assert historial.acumular_rollups(db_session, ahora=ahora, margen_seconds=1800) == 1
+        assert historial.acumular_rollups(db_session, ahora=AHORA + timedelta(hours=2)) == 2
+
+    def test_endpoints_de_metricas(self, db_client, db_session):
+        self._preparar(db_session)
+        historial.acumular_rollups(db_session, ahora=AHORA + timedelta(hours=2))
+
+        res = db_client.get(
+            "/metricas/tiempo-primera-respuesta-por-area",
+            params={"fecha_inicio": "2025-06-01", "fecha_fin": "2025-06-01"},
+        )
+        assert res.status_code == 200
+        assert res.json()["metricas"] == [
+            {"nombre_area": "Mantención", "respuestas": 2, "tiempo_promedio_primera_respuesta_minutos": 20.0}
+        ]
+
+        res = db_client.get(
+            "/metricas/tiempo-en-estado-por-area",
+            params={"fecha_inicio": "2025-06-01", "fecha_fin": "2025-06-01"},
+        )
+        metricas = {m["estado"]: m for m in res.json()["metricas"]}
+        assert metricas["pendiente"]["tiempo_promedio_minutos"] == 20.0
+        assert metricas["en_proceso"]["transiciones"] == 1
+        assert metricas["en_proceso"]["tiempo_promedio_minutos"] == 60.0
+
+        res = db_client.get(
+            "/metricas/tiempo-en-estado-por-area",
+            params={"fecha_inicio": "2025-06-02", "fecha_fin": "2025-06-01"},
+        )
+        assert res.status_code == 400
+
+
+class TestCambioMasivo:
+    """PUT /solicitudes/estado: un UPDATE ... RETURNING con eventos y alcance por área."""
+
+    @pytest.fixture
+    def solicitudes(self, db_client, db_session):
+        db = db_session()
+        db.add(Area(id_area=2, nombre_area="Limpieza"))
+        filas = [
+            (30, 1, EstadoSolicitud.PENDIENTE),
+            (31, 1, EstadoSolicitud.EN_PROCESO),
+            (32, 1, EstadoSolicitud.CERRADA),
+            (33, 2, EstadoSolicitud.PENDIENTE),
+        ]
+        for id_sol, id_area, estado in filas:
+            db.add(Solicitud(
+                id_solicitud=id_sol, id_cama=1, id_area=id_area, tipo="T",
+                estado_actual=estado, fecha_creacion=AHORA, fecha_actualizacion=AHORA,
+                fecha_cierre=AHORA if estado == EstadoSolicitud.CERRADA else None,
+            ))
+        db.commit()
+        db.close()
+        return db_client
+
+    def _como(self, rol, id_area=None):
+        app.dependency_overrides[require_authenticated_user] = lambda: Usuario(
+            rol=rol, correo="u@example.com", id_area=id_area
+        )
+
+    def test_cierra_en_lote(self, solicitudes, db_session):
+        self._como(RolUsuario.ADMIN)
+        res = solicitudes.put("/solicitudes/estado", json={"ids": [30, 31, 32, 33, 999], "estado": "cerrada"})
+        assert res.status_code == 200
+        cuerpo = res.json()
+        assert cuerpo["actualizadas"] == 3
+        # 32 ya estaba cerrada: no se toca su fecha_cierre ni genera evento.
+        assert cuerpo["omitidas"] == [32, 999]
+        assert {s["id"] for s in cuerpo["solicitudes"]} == {30, 31, 33}
+        assert all(s["estado"] == "cerrada" and s["fecha_cierre"] for s in cuerpo["solicitudes"])
+
+        db = db_session()
+        assert db.get(Solicitud, 32).fecha_cierre.replace(tzinfo=timezone.utc) == AHORA
+        eventos = {e.id_solicitud: e for e in db.query(SolicitudEvento)}
+        assert set(eventos) == {30, 31, 33}
+        assert eventos[30].estado_anterior == EstadoSolicitud.PENDIENTE
+        assert eventos[30].segundos_primera_respuesta is not None
+        assert eventos[31].segundos_primera_respuesta is None
+        assert db.get(Solicitud, 30).fecha_primera_respuesta is not None
+        db.close()
+
+    def test_reabrir_limpia_fecha_cierre(self, solicitudes):
+        self._como(RolUsuario.ADMIN)
+        res = solicitudes.put("/solicitudes/estado", json={"ids": [32], "estado": "en_proceso"})
+        assert res.json()["solicitudes"][0]["fecha_cierre"] is None
+
+    def test_jefe_area_solo_su_area(self, solicitudes):
+        self._como(RolUsuario.JEFE_AREA, id_area=2)
+        res = solicitudes.put("/solicitudes/estado", json={"ids": [30, 33], "estado": "en_proceso"})
+        assert [s["id"] for s in res.json()["solicitudes"]] == [33]
+        assert res.json()["omitidas"] == [30]
+
+        self._como(RolUsuario.JEFE_AREA)
+        res = solicitudes.put("/solicitudes/estado", json={"ids": [30], "estado": "cerrada"})
+        assert res.status_code == 400
+
+    def test_validacion(self, solicitudes):
+        self._como(RolUsuario.ADMIN)
+        assert solicitudes.put("/solicitudes/estado", json={"ids": [], "estado": "cerrada"}).status_code == 422
+        assert solicitudes.put("/solicitudes/estado", json={"ids": [30], "estado": "x"}).status_code == 400
+
+    def test_sql_postgres_en_una_sentencia(self):
+        from sqlalchemy.dialects import postgresql
+
+        stmt = historial._update_transiciones(
+            [1, 2], EstadoSolicitud.CERRADA, AHORA, 3, {"id": Solicitud.id_solicitud}
+        )
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "= ANY (%(ids)s" in sql
+        assert "FOR UPDATE OF solicitud" in sql
+        assert "RETURNING" in sql and "previa.estado_anterior" in sql
+
+    def test_sql_postgres_reapertura_limpia_escalamiento(self):
+        from sqlalchemy.dialects import postgresql
+
+        reabre = historial._update_transiciones([1], EstadoSolicitud.PENDIENTE, AHORA, None, {"id": Solicitud.id_solicitud})
+        sql = str(reabre.compile(dialect=postgresql.dialect()))
+        assert "escalada=CASE WHEN (previa.estado_anterior" in sql and "inicio_sla=CASE" in sql
+        cierra = historial._update_transiciones([1], EstadoSolicitud.CERRADA, AHORA, None, {"id": Solicitud.id_solicitud})
+        assert "escalada" not in str(cierra.compile(dialect=postgresql.dialect()))
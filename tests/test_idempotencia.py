@@ -0,0 +1,126 @@
+"""
+Tests para Idempotency-Key en POST /solicitudes
+"""
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.models import IdempotenciaSolicitud
+from services.idempotency import IdempotencyConflict, IdempotencyStore
+
+
+@pytest.fixture
+def sesiones(tmp_path):
+    """Sesiones sobre un archivo SQLite, como las de dos workers distintos."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'idem.db'}", connect_args={"check_same_thread": False})
+    IdempotenciaSolicitud.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+class TestIdempotencyStore:
+    """Tests del almacén de idempotencia en la tabla idempotencia_solicitud."""
+
+    def test_primera_peticion_se_procesa(self, sesiones):
+        store, db = IdempotencyStore(), sesiones()
+        assert store.begin(db, "k1", "fp") is None
+        store.complete(db, "k1", {"id": 1})
+        assert store.begin(db, "k1", "fp") == {"id": 1}
+
+    def test_cuerpo_distinto_es_conflicto(self, sesiones):
+        store, db = IdempotencyStore(), sesiones()
+        store.begin(db, "k1", "fp-a")
+        with pytest.raises(IdempotencyConflict):
+            store.begin(db, "k1", "fp-b")
+
+    def test_abort_libera_la_clave(self, sesiones):
+        store, db = IdempotencyStore(), sesiones()
+        store.begin(db, "k1", "fp")
+        store.abort(db, "k1")
+        assert store.begin(db, "k1", "fp") is None
+
+    def test_ttl_expira(self, sesiones):
+        store, db = IdempotencyStore(ttl_seconds=0), sesiones()
+        store.begin(db, "k1", "fp")
+        store.complete(db, "k1", {"id": 1})
+        assert store.begin(db, "k1", "fp") is None
+
+    def test_en_vuelo_huerfana_se_retoma(self, sesiones):
+        """Si el worker que reservó la clave muere, la reserva vence a los wait_seconds."""
+        store, db = IdempotencyStore(wait_seconds=0.05), sesiones()
+        store.begin(db, "k1", "fp")
+        time.sleep(0.1)
+        assert store.begin(db, "k1", "fp") is None
+
+    def test_purga_las_vencidas(self, sesiones):
+        store, db = IdempotencyStore(ttl_seconds=0, purge_every=3), sesiones()
+        for i in range(3):
+            store.begin(db, f"k{i}", "fp")
+            store.complete(db, f"k{i}", {"id": i})
+        assert db.query(IdempotenciaSolicitud).count() == 1  # sólo queda la última
+
+    def test_compartida_entre_workers(self, sesiones):
+        """Un reintento que llega a otro worker recibe la respuesta del primero."""
+        worker_a, worker_b = IdempotencyStore(), IdempotencyStore()
+        db_a, db_b = sesiones(), sesiones()
+        assert worker_a.begin(db_a, "k1", "fp") is None
+        worker_a.complete(db_a, "k1", {"id": 7})
+        assert worker_b.begin(db_b, "k1", "fp") == {"id": 7}
+
+    def test_concurrentes_esperan_a_la_primera(self, sesiones):
+        db = sesiones()
+        assert IdempotencyStore().begin(db, "k1", "fp") is None
+        resultados = []
+
+        def reintento():
+            sesion = sesiones()
+            try:
+                resultados.append(IdempotencyStore().begin(sesion, "k1", "fp"))
+            finally:
+                sesion.close()
+
+        hilos = [threading.Thread(target=reintento) for _ in range(4)]
+        for h in hilos:
+            h.start()
+        time.sleep(0.1)
+        IdempotencyStore().complete(db, "k1", {"id": 7})
+        for h in hilos:
+            h.join(timeout=5)
+        assert resultados == [{"id": 7}] * 4
+
+    def test_en_curso_hasta_el_limite(self, sesiones):
+        IdempotencyStore().begin(sesiones(), "k1", "fp")  # en vuelo con reserva de 30 s
+        with pytest.raises(TimeoutError):
+            IdempotencyStore(wait_seconds=0.1).begin(sesiones(), "k1", "fp")
+
+
+class TestIdempotencyEndpoint:
+    """Tests de POST /solicitudes con Idempotency-Key."""
+
+    def test_reintento_no_duplica(self, db_client, db_session):
+        from models.models import Solicitud
+
+        body = {"id_cama": 1, "id_area": 1, "tipo": "BAÑO", "descripcion": "gotera"}
+        headers = {"Idempotency-Key": "scan-123"}
+        r1 = db_client.post("/solicitudes", json=body, headers=headers)
+        r2 = db_client.post("/solicitudes", json=body, headers=headers)
+
+        assert r1.status_code == 200
+        assert r2.status_code == 200
+        assert r2.headers.get("Idempotent-Replayed") == "true"
+        assert r1.json()["solicitud"]["id"] == r2.json()["solicitud"]["id"]
+
+        db = db_session()
+        try:
+            assert db.query(Solicitud).count() == 1
+        finally:
+            db.close()
+
+    def test_misma_clave_otro_cuerpo(self, db_client):
+        headers = {"Idempotency-Key": "scan-456"}
+        db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"}, headers=headers)
+        r = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "TV"}, headers=headers)
+        assert r.status_code == 422
@@ -0,0 +1,249 @@
+"""
+Tests de la verificación local de JWT con claves asimétricas (JWKS)
+"""
+import base64
+import json
+import threading
+import time
+import uuid
+
+import pytest
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from fastapi import HTTPException
+
+from auth import dependencies, jwks
+from models.models import RolUsuario, Usuario
+
+SUB = "00000000-0000-4000-8000-0000000000aa"
+
+# Claves de prueba generadas con openssl; los tokens *_OPENSSL también los
+# firmó openssl (sub=SUB, exp=2100-01-01), así la verificación se contrasta
+# con una implementación independiente.
+RSA_PRIVADA = {
+    "kty": "RSA", "kid": "rsa-1", "alg": "RS256", "use": "sig", "e": "AQAB",
+    "n": "3PusOwZ2VACgOTUyjlotQtWFk0i3STWYRlETgcj7ffxcEbQ31GgEJm9nIa3KMFtsjkk8JST98xKwKXaT08RpBHvogRXOVkhZQQeQh"
+         "cISUCFENLHrTVvAFCMBsO9Cn6TFsGKHstfs6NIK66PhWQypL-KPfE28kWRpctY3fojIYNdAsHjukORcCrIgTfve7LhnhwCcFVEUQR0w"
+         "j1ULc_9sZdKqewjOis8AjF8fJOhH5AeJyvJbhjxK4iU2zz0FFLKzxrMqZE1nI79LqTNw1RfyBOACY3jA5ziCMP057ZPvyXFEPgITayPg"
+         "TUZbFOsx7ibUBVQWl_vN72s8HBW4gO0nbw",
+    "d": "XZAhaAxgZUiujgo8EZGUwEtvduC-2bxbcMo7HCRgdwM2aDiJuuEfgLaCT_wpMzhCSiwvzvpOm3A6LhQKmwr5-_AKjT0SU-3l_GabhkaZQ"
+         "lwTaMw7-FD0jpIT0To8VyOIoBnXop1RrXHhNcv5SZ7Ws3OVlOfFAzoke36_mE-Jp5Yx4GxrAYwjwZHFtrQACZsA4s45eDbUceVmyGM_uEj"
+         "qYLi3NGA0K3a9JJ9-03yg0AhQy8wtJOHC1YVjgqPZKmkn2T4bQHViDPYvngAD5uIT5ZNM1V19W6uTDOhH6QWSDhh3DPTmGY-Fs-N1LaOd5"
+         "jqvLu9WMPS6rwT8hYu0wKHYgQ",
+}
+RSA_PUBLICA = {k: v for k, v in RSA_PRIVADA.items() if k != "d"}
+EC_PUBLICA = {
+    "kty": "EC", "kid": "ec-1", "crv": "P-256", "alg": "ES256", "use": "sig",
+    "x": "2LxfZ5vW6oMYmJSD2DM-DjBc4xuJ6s7M6TMGP9Odaxs",
+    "y": "MnTzK6ya6XSmGX-WQN5uhOfSxo4Jic9jYjCJr4_amWI",
+}
+RS256_OPENSSL = (
+    "eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCIsImtpZCI6InJzYS0xIn0."
+    "eyJzdWIiOiIwMDAwMDAwMC0wMDAwLTQwMDAtODAwMC0wMDAwMDAwMDAwYWEiLCJleHAiOjQxMDI0NDQ4MDB9."
+    "OkV5eBafQPXOqffM9Ls2o9zOyzGEJ4ngiqc0ijCFoLtsZbMtRQ66GaiOB7dgLdoji1V5dF4zbyspAtmclnvmWYkoF0NSKu7zwfULf7e5Rbb"
+    "DNkmYjLt0UvwXII5IluP_ni9zE4IMysJNGOg6-yh_FF7ov04GVycrScfr9a16BlCtWfywat19Br6w0sstuHOS4c05_9sS3BtwozKZFxaG3cm"
+    "up7VFkHEOx2P2d5sWMoffdIrg6GA6pDC_47G9h6XiMBRRHpM1V8l5aT2GNJNbIsEhFFoeZmvik0j0apOYqkrVH0ld94QRMbk5maeeyOmyk-E"
+    "cIBJg2QnzVmDwXrIO0w"
+)
+ES256_OPENSSL = (
+    "eyJhbGciOiJFUzI1NiIsInR5cCI6IkpXVCIsImtpZCI6ImVjLTEifQ."
+    "eyJzdWIiOiIwMDAwMDAwMC0wMDAwLTQwMDAtODAwMC0wMDAwMDAwMDAwYWEiLCJleHAiOjQxMDI0NDQ4MDB9."
+    "gCAzQ_rMo1kRM6qiJrpDWNSg-45JIK7PA2o1e9ZckO0Qc9ppgFugPSeZHEoZc4TNY7jqG5vXCI6uwtpYCUZHcg"
+)
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _rsa_privada():
+    n, e, d = (jwks._b64_entero(RSA_PRIVADA[k]) for k in ("n", "e", "d"))
+    p, q = rsa.rsa_recover_prime_factors(n, e, d)
+    numeros = rsa.RSAPrivateNumbers(
+        p, q, d, rsa.rsa_crt_dmp1(d, p), rsa.rsa_crt_dmq1(d, q), rsa.rsa_crt_iqmp(p, q),
+        rsa.RSAPublicNumbers(e, n),
+    )
+    return numeros.private_key()
+
+
+def firmar_rs256(payload: dict, kid: str = "rsa-1") -> str:
+    """Firma RS256 con la clave privada de prueba."""
+    header = _b64(json.dumps({"alg": "RS256", "typ": "JWT", "kid": kid}).encode())
+    cuerpo = _b64(json.dumps(payload).encode())
+    firma = _rsa_privada().sign(f"{header}.{cuerpo}".encode(), padding.PKCS1v15(), hashes.SHA256())
+    return f"{header}.{cuerpo}.{_b64(firma)}"
+
+
+@pytest.fixture
+def jwks_archivo(tmp_path, monkeypatch):
+    """JWKS local en disco y cachés limpias; devuelve una función para reescribirlo."""
+    ruta = tmp_path / "jwks.json"
+
+    def escribir(*claves):
+        ruta.write_text(json.dumps({"keys": list(claves)}), encoding="utf-8")
+
+    escribir(RSA_PUBLICA, EC_PUBLICA)
+    monkeypatch.setenv("SUPABASE_JWKS_FILE", str(ruta))
+    monkeypatch.delenv("SUPABASE_JWT_SECRET", raising=False)
+    monkeypatch.setattr(jwks, "cache", jwks.JWKSCache())
+    dependencies.verified_tokens.descartar()
+    yield escribir
+    dependencies.verified_tokens.descartar()
+
+
+def _lecturas(monkeypatch):
+    lecturas = []
+    original = jwks._descargar
+
+    def contar(fuente):
+        lecturas.append(fuente)
+        return original(fuente)
+
+    monkeypatch.setattr(jwks, "_descargar", contar)
+    return lecturas
+
+
+class TestFirmasAsimetricas:
+    """RS256 y ES256 contra tokens firmados por openssl."""
+
+    @pytest.mark.parametrize("token", [RS256_OPENSSL, ES256_OPENSSL])
+    def test_token_openssl_valido(self, jwks_archivo, token):
+        assert dependencies.verify_token(token)["sub"] == SUB
+
+    @pytest.mark.parametrize("token", [RS256_OPENSSL, ES256_OPENSSL])
+    def test_payload_alterado(self, jwks_archivo, token):
+        header, _, firma = token.split(".")
+        otro = _b64(json.dumps({"sub": str(uuid.uuid4()), "exp": 4102444800}).encode())
+        with pytest.raises(HTTPException) as exc:
+            dependencies.verify_token(f"{header}.{otro}.{firma}")
+        assert exc.value.detail == "Firma del token inválida"
+
+    def test_algoritmo_no_coincide_con_la_clave(self, jwks_archivo):
+        # Firma RS256 presentada con el kid de la clave EC.
+        header = _b64(json.dumps({"alg": "RS256", "kid": "ec-1"}).encode())
+        _, cuerpo, firma = RS256_OPENSSL.split(".")
+        with pytest.raises(HTTPException) as exc:
+            dependencies.verify_token(f"{header}.{cuerpo}.{firma}")
+        assert exc.value.status_code == 401
+
+    def test_alg_none_rechazado(self, jwks_archivo):
+        header = _b64(json.dumps({"alg": "none"}).encode())
+        cuerpo = _b64(json.dumps({"sub": SUB}).encode())
+        with pytest.raises(HTTPException) as exc:
+            dependencies.verify_token(f"{header}.{cuerpo}.")
+        assert exc.value.detail == "Algoritmo de firma no soportado"
+
+    def test_expirado(self, jwks_archivo):
+        token = firmar_rs256({"sub": SUB, "exp": int(time.time()) - 10})
+        with pytest.raises(HTTPException) as exc:
+            dependencies.verify_token(token)
+        assert exc.value.detail == "Token expirado"
+
+    def test_hs256_sigue_funcionando(self, jwks_archivo, monkeypatch):
+        from benchmarks.carga import firmar_jwt
+
+        monkeypatch.setenv("SUPABASE_JWT_SECRET", "secreto")
+        assert dependencies.verify_token(firmar_jwt(SUB, "secreto"))["sub"] == SUB
+
+    def test_hs256_sin_secreto(self, jwks_archivo):
+        from benchmarks.carga import firmar_jwt
+
+        with pytest.raises(HTTPException) as exc:
+            dependencies.verify_token(firmar_jwt(SUB, "secreto"))
+        assert exc.value.status_code == 500
+
+    def test_endpoint_autenticado(self, jwks_archivo, db_client, db_session):
+        db = db_session()
+        db.add(Usuario(id=uuid.UUID(SUB), rol=RolUsuario.ADMIN, correo="admin@hospital.cl", nombre="A", apellido="B"))
+        db.commit()
+        db.close()
+        res = db_client.get("/admin/me", headers={"Authorization": f"Bearer {ES256_OPENSSL}"})
+        assert res.status_code == 200
+        assert res.json()["usuario"]["correo"] == "admin@hospital.cl"
+
+
+class TestCaches:
+    """JWKS descargado una vez, refresco ante rotación y resultados por token."""
+
+    def test_verificacion_cacheada_por_token(self, jwks_archivo, monkeypatch):
+        llamadas = []
+        original = jwks.verificar_firma
+        monkeypatch.setattr(jwks, "verificar_firma", lambda *a: llamadas.append(a) or original(*a))
+        for _ in range(5):
+            dependencies.verify_token(ES256_OPENSSL)
+        assert len(llamadas) == 1
+
+    def test_token_cacheado_igual_expira(self, jwks_archivo):
+        exp = int(time.time()) + 2  # exp entero: con +1 podía vencer antes de la primera verificación
+        token = firmar_rs256({"sub": SUB, "exp": exp})
+        dependencies.verify_token(token)
+        time.sleep(exp - time.time() + 0.1)
+        with pytest.raises(HTTPException, match="expirado"):
+            dependencies.verify_token(token)
+
+    def test_jwks_se_lee_una_vez(self, jwks_archivo, monkeypatch):
+        lecturas = _lecturas(monkeypatch)
+        for i in range(3):
+            dependencies.verify_token(firmar_rs256({"sub": SUB, "n": i}))
+        dependencies.verify_token(ES256_OPENSSL)
+        assert len(lecturas) == 1
+
+    def test_rotacion_de_claves(self, jwks_archivo, monkeypatch):
+        ahora = [0.0]
+        monkeypatch.setattr(jwks, "cache", jwks.JWKSCache(ttl=600, refresco_min=30, reloj=lambda: ahora[0]))
+        lecturas = _lecturas(monkeypatch)
+        jwks_archivo(RSA_PUBLICA)
+        dependencies.verify_token(firmar_rs256({"sub": SUB}))
+
+        # Supabase publica la clave nueva; el primer token con ese kid fuerza la descarga.
+        jwks_archivo(RSA_PUBLICA, EC_PUBLICA)
+        ahora[0] = 31
+        assert dependencies.verify_token(ES256_OPENSSL)["sub"] == SUB
+        assert len(lecturas) == 2
+
+    def test_kid_desconocido_limitado(self, jwks_archivo, monkeypatch):
+        ahora = [0.0]
+        monkeypatch.setattr(jwks, "cache", jwks.JWKSCache(ttl=600, refresco_min=30, reloj=lambda: ahora[0]))
+        lecturas = _lecturas(monkeypatch)
+        for i in range(10):
+            with pytest.raises(HTTPException) as exc:
+                dependencies.verify_token(firmar_rs256({"sub": SUB, "n": i}, kid="inventado"))
+            assert exc.value.detail == "Clave de firma desconocida"
+        assert len(lecturas) == 1
+        ahora[0] = 31
+        with pytest.raises(HTTPException):
+            dependencies.verify_token(firmar_rs256({"sub": SUB}, kid="inventado"))
+        assert len(lecturas) == 2
+
+    def test_falla_de_descarga_conserva_claves(self, jwks_archivo, monkeypatch):
+        ahora = [0.0]
+        monkeypatch.setattr(jwks, "cache", jwks.JWKSCache(ttl=600, refresco_min=30, reloj=lambda: ahora[0]))
+        dependencies.verify_token(firmar_rs256({"sub": SUB}))
+        monkeypatch.setenv("SUPABASE_JWKS_FILE", "/no/existe.json")
+        ahora[0] = 700
+        assert dependencies.verify_token(firmar_rs256({"sub": SUB, "otro": 1}))["sub"] == SUB
+
+    def test_sin_jwks_es_503(self, jwks_archivo, monkeypatch):
+        monkeypatch.setenv("SUPABASE_JWKS_FILE", "/no/existe.json")
+        with pytest.raises(HTTPException) as exc:
+            dependencies.verify_token(ES256_OPENSSL)
+        assert exc.value.status_code == 503
+
+    def test_refresco_lento_no_bloquea(self, jwks_archivo, monkeypatch):
+        ahora = [0.0]
+        monkeypatch.setattr(jwks, "cache", jwks.JWKSCache(ttl=600, refresco_min=30, reloj=lambda: ahora[0]))
+        dependencies.verify_token(RS256_OPENSSL)
+
+        # El TTL vence y la descarga se cuelga: sólo la espera el hilo que la hace.
+        liberar = threading.Event()
+        original = jwks._descargar
+        monkeypatch.setattr(jwks, "_descargar", lambda fuente: liberar.wait(5) and original(fuente))
+        ahora[0] = 700
+        refrescando = threading.Thread(target=jwks.cache.clave, args=("rsa-1",))
+        refrescando.start()
+        time.sleep(0.05)
+        inicio = time.perf_counter()
+        assert jwks.cache.clave("ec-1")[0] == "ES256"
+        assert time.perf_counter() - inicio < 0.5
+        liberar.set()
+        refrescando.join()
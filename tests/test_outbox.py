@@ -0,0 +1,246 @@
+"""
+Tests del outbox transaccional y su relay
+"""
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from models.models import EventoOutbox
+from services import notificaciones, outbox
+
+
+class SinkMemoria(outbox.Sink):
+    nombre = "memoria"
+
+    def __init__(self, fallar=False):
+        self.recibidos = []
+        self.fallar = fallar
+
+    def enviar(self, eventos):
+        if self.fallar:
+            raise RuntimeError("sink caído")
+        self.recibidos.extend(eventos)
+
+
+def _pendientes(db_session):
+    db = db_session()
+    try:
+        return db.query(EventoOutbox).filter(EventoOutbox.fecha_envio.is_(None)).count()
+    finally:
+        db.close()
+
+
+class TestEscrituraTransaccional:
+    """Los endpoints escriben el outbox en la misma transacción que el cambio."""
+
+    def test_crear_y_actualizar_encolan_eventos(self, db_client, db_session):
+        creada = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "Luz"}).json()
+        id_sol = creada["solicitud"]["id"]
+        db_client.put(f"/solicitudes/{id_sol}/estado", params={"nuevo_estado": "cerrada"})
+
+        sink = SinkMemoria()
+        assert outbox.drenar(db_session, [sink]) == 2
+        assert [e["tipo"] for e in sink.recibidos] == ["solicitud.creada", "solicitud.estado_actualizado"]
+        assert sink.recibidos[0]["payload"]["id_solicitud"] == id_sol
+        assert sink.recibidos[1]["payload"]["estado_anterior"] == "pendiente"
+        assert sink.recibidos[1]["payload"]["estado_nuevo"] == "cerrada"
+
+    def test_rollback_no_deja_eventos(self, db_session):
+        db = db_session()
+        outbox.encolar(db, "x", {"a": 1})
+        db.rollback()
+        db.close()
+        assert _pendientes(db_session) == 0
+
+
+class TestRelay:
+    """Entrega por lotes, al menos una vez, con métrica de lag."""
+
+    def _encolar(self, db_session, n):
+        db = db_session()
+        outbox.encolar_varios(db, "prueba", [{"n": i} for i in range(n)])
+        db.commit()
+        db.close()
+
+    def test_entrega_en_orden_y_por_lotes(self, db_session):
+        self._encolar(db_session, 5)
+        sink = SinkMemoria()
+        assert outbox.drenar(db_session, [sink], lote=2) == 5
+        assert [e["payload"]["n"] for e in sink.recibidos] == [0, 1, 2, 3, 4]
+        assert outbox.drenar(db_session, [sink]) == 0
+        assert outbox.PENDIENTES.render()[-1] == "outbox_pendientes 0"
+
+    def test_sink_que_falla_reintenta_el_lote(self, db_session):
+        self._encolar(db_session, 3)
+        ok, caido = SinkMemoria(), SinkMemoria(fallar=True)
+        assert outbox.drenar(db_session, [ok, caido]) == 0
+        assert _pendientes(db_session) == 3
+        db = db_session()
+        assert {e.intentos for e in db.query(EventoOutbox)} == {1}
+        assert "sink caído" in db.query(EventoOutbox).first().ultimo_error
+        db.close()
+
+        # Al volver el sink se reentrega todo: el que ya lo recibió lo ve dos veces.
+        caido.fallar = False
+        assert outbox.drenar(db_session, [ok, caido]) == 3
+        assert len(ok.recibidos) == 6 and len(caido.recibidos) == 3
+        assert _pendientes(db_session) == 0
+
+    def test_entrega_sin_transaccion_abierta(self, db_session):
+        """El lote se reserva y se hace commit antes de llamar al sink."""
+        self._encolar(db_session, 2)
+        durante = {}
+
+        class SinkLento(SinkMemoria):
+            def enviar(self, eventos):
+                db = db_session()
+                try:
+                    durante["reservados"] = db.query(EventoOutbox).filter(
+                        EventoOutbox.reclamado_hasta.is_not(None)
+                    ).count()
+                finally:
+                    db.close()
+                # Otro relay en paralelo no vuelve a tomar el lote reservado.
+                durante["paralelo"] = outbox.drenar(db_session, [SinkMemoria()])
+                super().enviar(eventos)
+
+        sink = SinkLento()
+        assert outbox.drenar(db_session, [sink]) == 2
+        assert durante == {"reservados": 2, "paralelo": 0}
+        db = db_session()
+        assert {e.reclamado_hasta for e in db.query(EventoOutbox)} == {None}
+        db.close()
+
+    def test_reserva_vencida_se_retoma(self, db_session):
+        """Si el relay murió con el lote reservado, al vencer la reserva se reentrega."""
+        self._encolar(db_session, 1)
+        ahora = datetime.now(timezone.utc)
+        db = db_session()
+        db.query(EventoOutbox).update({"reclamado_hasta": ahora + timedelta(seconds=outbox.RECLAMO_SECONDS)})
+        db.commit()
+        db.close()
+
+        sink = SinkMemoria()
+        assert outbox.drenar(db_session, [sink], ahora=lambda: ahora) == 0
+        futuro = ahora + timedelta(seconds=outbox.RECLAMO_SECONDS + 1)
+        assert outbox.drenar(db_session, [sink], ahora=lambda: futuro) == 1
+        assert _pendientes(db_session) == 0
+
+    def test_lag_del_pendiente_mas_viejo(self, db_session):
+        self._encolar(db_session, 1)
+        futuro = datetime.now(timezone.utc) + timedelta(minutes=10)
+        outbox.drenar(db_session, [SinkMemoria(fallar=True)], ahora=lambda: futuro)
+        lag = float(outbox.LAG_SECONDS.render()[-1].split()[-1])
+        assert 590 <= lag <= 610
+
+    def test_sink_suscriptores(self, db_session):
+        recibidos = []
+
+        def suscriptor(evento, payload):
+            recibidos.append((evento, payload))
+
+        notificaciones.suscribir(suscriptor)
+        try:
+            self._encolar(db_session, 2)
+            outbox.drenar(db_session, [outbox.SinkSuscriptores()])
+        finally:
+            notificaciones.desuscribir(suscriptor)
+        assert recibidos == [("prueba", {"n": 0}), ("prueba", {"n": 1})]
+
+    def test_sink_archivo(self, db_session, tmp_path):
+        self._encolar(db_session, 2)
+        ruta = tmp_path / "eventos.jsonl"
+        outbox.drenar(db_session, [outbox.SinkArchivo(str(ruta))])
+        lineas = [json.loads(linea) for linea in ruta.read_text(encoding="utf-8").splitlines()]
+        assert [linea["payload"]["n"] for linea in lineas] == [0, 1]
+
+
+@pytest.fixture
+def servidor_webhook():
+    recibidos = []
+    estado = {"codigo": 200}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            cuerpo = self.rfile.read(int(self.headers["Content-Length"]))
+            recibidos.append(json.loads(cuerpo))
+            self.send_response(estado["codigo"])
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    hilo = threading.Thread(target=server.serve_forever, daemon=True)
+    hilo.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/eventos", recibidos, estado
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class TestSinkWebhook:
+    """POST del lote a un servidor HTTP local."""
+
+    def test_entrega_y_reintenta_ante_5xx(self, db_session, servidor_webhook):
+        url, recibidos, estado = servidor_webhook
+        db = db_session()
+        outbox.encolar(db, "prueba", {"n": 1})
+        db.commit()
+        db.close()
+
+        estado["codigo"] = 503
+        assert outbox.drenar(db_session, [outbox.SinkWebhook(url, timeout=2)]) == 0
+        estado["codigo"] = 200
+        assert outbox.drenar(db_session, [outbox.SinkWebhook(url, timeout=2)]) == 1
+        assert len(recibidos) == 2
+        assert recibidos[-1]["eventos"][0]["payload"] == {"n": 1}
+
+
+class TestRetencion:
+    """Los eventos entregados se borran pasada la retención; los pendientes nunca."""
+
+    def _eventos(self, db_session, enviados_hace_dias):
+        ahora = datetime.now(timezone.utc)
+        db = db_session()
+        for i, dias in enumerate(enviados_hace_dias):
+            db.add(EventoOutbox(
+                tipo="prueba", payload={"n": i},
+                fecha_envio=None if dias is None else ahora - timedelta(days=dias),
+            ))
+        db.commit()
+        db.close()
+        return ahora
+
+    def _restantes(self, db_session):
+        db = db_session()
+        try:
+            return sorted(e.payload["n"] for e in db.query(EventoOutbox))
+        finally:
+            db.close()
+
+    def test_purga_solo_entregados_viejos(self, db_session):
+        ahora = self._eventos(db_session, [30, 8, 1, None, 30])
+        assert outbox.purgar(db_session, ahora, retencion_dias=7, lote=1) == 3
+        assert self._restantes(db_session) == [2, 3]
+
+    def test_relay_purga_una_vez_por_intervalo(self, db_session, monkeypatch):
+        monkeypatch.setattr(outbox, "_proxima_purga", None)
+        ahora = self._eventos(db_session, [30])
+        outbox.drenar(db_session, [SinkMemoria()], ahora=lambda: ahora)
+        assert self._restantes(db_session) == []
+
+        self._eventos(db_session, [30])
+        outbox.drenar(db_session, [SinkMemoria()], ahora=lambda: ahora + timedelta(minutes=1))
+        assert self._restantes(db_session) == [0]
+        outbox.drenar(db_session, [SinkMemoria()], ahora=lambda: ahora + timedelta(hours=2))
+        assert self._restantes(db_session) == []
+
+    def test_retencion_cero_conserva_todo(self, db_session):
+        ahora = self._eventos(db_session, [400])
+        assert outbox.purgar(db_session, ahora, retencion_dias=0) == 0
+        assert self._restantes(db_session) == [0]
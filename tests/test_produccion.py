@@ -0,0 +1,76 @@
+"""
+Tests de la configuración de gunicorn y del uso del pool por request
+"""
+import os
+import runpy
+import uuid
+
+import pytest
+
+from auth.dependencies import get_current_user
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+def _cargar(monkeypatch, **env):
+    for clave in ("WEB_CONCURRENCY", "GUNICORN_MAX_WORKERS", "PORT"):
+        monkeypatch.delenv(clave, raising=False)
+    for clave, valor in env.items():
+        monkeypatch.setenv(clave, valor)
+    return runpy.run_path(CONF)
+
+
+class TestGunicornConf:
+    """Workers según CPUs, preload y reciclaje con jitter."""
+
+    def test_valores_por_defecto(self, monkeypatch):
+        conf = _cargar(monkeypatch)
+        assert conf["worker_class"] == "uvicorn_worker.UvicornWorker"
+        assert conf["preload_app"] is True
+        assert conf["max_requests"] > 0 and conf["max_requests_jitter"] > 0
+        assert conf["graceful_timeout"] > 0
+        assert conf["bind"] == "0.0.0.0:8000"
+        assert conf["forwarded_allow_ips"] == "127.0.0.1"  # X-Forwarded-For lo resuelve la app
+
+    def test_workers_por_cpu_con_tope(self, monkeypatch):
+        monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(16)), raising=False)
+        assert _cargar(monkeypatch)["workers"] == 4
+        monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0}, raising=False)
+        assert _cargar(monkeypatch)["workers"] == 3
+        assert _cargar(monkeypatch, GUNICORN_MAX_WORKERS="2")["workers"] == 2
+
+    def test_web_concurrency_manda(self, monkeypatch):
+        conf = _cargar(monkeypatch, WEB_CONCURRENCY="6", PORT="10000")
+        assert conf["workers"] == 6
+        assert conf["bind"] == "0.0.0.0:10000"
+
+    def test_post_fork_descarta_el_pool_heredado(self, monkeypatch):
+        from db import session
+
+        llamadas = []
+        monkeypatch.setattr(session.engine, "dispose", lambda close=True: llamadas.append(close))
+        _cargar(monkeypatch)["post_fork"](None, None)
+        assert llamadas == [False]
+
+
+class TestConexionPorRequest:
+    """La autenticación no retiene una conexión mientras corre el handler."""
+
+    def test_usuario_autenticado_sin_conexion_abierta(self, db_session, monkeypatch):
+        from fastapi.security import HTTPAuthorizationCredentials
+
+        from auth import dependencies
+        from models.models import RolUsuario, Usuario
+
+        user_id = uuid.uuid4()
+        db = db_session()
+        db.add(Usuario(id=user_id, rol=RolUsuario.JEFE_AREA, correo="j@hospital.cl", nombre="J", apellido="A", id_area=1))
+        db.commit()
+        db.close()
+
+        monkeypatch.setattr(dependencies, "verify_token", lambda token: {"sub": str(user_id)})
+        sesion = db_session()
+        usuario = get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials="x"), sesion)
+        assert not sesion.in_transaction()
+        # El área quedó cargada antes de soltar la sesión.
+        assert usuario.area.nombre_area == "Mantención"
@@ -0,0 +1,110 @@
+"""
+Tests para limitación de tasa y control de admisión
+"""
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from services.rate_limit import ConcurrencyLimit, MemoryBackend, RateLimit, SQLiteBackend
+from services import rate_limit
+
+
+class TestTokenBucket:
+    """Tests de los backends de token bucket."""
+
+    @pytest.mark.parametrize("factory", ["memory", "sqlite"])
+    def test_rafaga_y_espera(self, factory, tmp_path):
+        backend = MemoryBackend() if factory == "memory" else SQLiteBackend(str(tmp_path / "rl.sqlite3"))
+        assert backend.take("k", 2, 1.0) == 0
+        assert backend.take("k", 2, 1.0) == 0
+        espera = backend.take("k", 2, 1.0)
+        assert 0 < espera <= 1.0
+        # Claves independientes
+        assert backend.take("otra", 2, 1.0) == 0
+
+    def test_429_con_retry_after(self, monkeypatch):
+        monkeypatch.setattr(rate_limit, "backend", MemoryBackend())
+        limite = RateLimit("test", capacity=1, per_minute=1)
+        limite.check("x")
+        with pytest.raises(HTTPException) as exc:
+            limite.check("x")
+        assert exc.value.status_code == 429
+        assert int(exc.value.headers["Retry-After"]) >= 1
+
+
+class TestConcurrencyLimit:
+    """Tests del cupo de concurrencia global."""
+
+    def test_503_al_superar_cupo(self):
+        cupo = ConcurrencyLimit(1)
+        primera = cupo()
+        next(primera)
+        with pytest.raises(HTTPException) as exc:
+            next(cupo())
+        assert exc.value.status_code == 503
+        assert "Retry-After" in exc.value.headers
+        with pytest.raises(StopIteration):
+            next(primera)
+        segunda = cupo()
+        next(segunda)
+
+
+class TestRateLimitEndpoints:
+    """Tests de los límites aplicados a endpoints públicos."""
+
+    def test_qr_validate_por_codigo(self, db_client, monkeypatch):
+        monkeypatch.setattr(rate_limit.qr_por_codigo, "capacity", 2)
+        assert db_client.get("/qr/validate?code=QR-TEST-1").status_code == 200
+        assert db_client.get("/qr/validate?code=QR-TEST-1").status_code == 200
+        r = db_client.get("/qr/validate?code=QR-TEST-1")
+        assert r.status_code == 429
+        assert "retry-after" in r.headers
+
+    def test_crear_solicitud_por_cama(self, db_client, monkeypatch):
+        monkeypatch.setattr(rate_limit.solicitudes_por_cama, "capacity", 1)
+        body = {"id_cama": 1, "id_area": 1, "tipo": "BAÑO"}
+        assert db_client.post("/solicitudes", json=body).status_code == 200
+        assert db_client.post("/solicitudes", json=body).status_code == 429
+
+
+class TestClienteDetrasDeProxy:
+    """La IP de los límites no se puede falsificar con X-Forwarded-For."""
+
+    def _ip(self, client_host, xff):
+        from starlette.applications import Starlette
+        from starlette.responses import PlainTextResponse
+        from starlette.routing import Route
+        from starlette.testclient import TestClient
+        from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+        app = Starlette(routes=[Route("/", lambda r: PlainTextResponse(rate_limit.client_ip(r)))])
+        app = ProxyHeadersMiddleware(app, trusted_hosts=rate_limit.TRUSTED_PROXIES)
+        return TestClient(app, client=(client_host, 1234)).get("/", headers={"X-Forwarded-For": xff}).text
+
+    def test_primer_salto_no_confiable(self):
+        assert self._ip("10.1.2.3", "1.1.1.1, 203.0.113.7") == "203.0.113.7"
+        assert self._ip("10.1.2.3", "203.0.113.7, 10.9.9.9") == "203.0.113.7"
+
+    def test_sin_proxy_confiable_se_ignora_el_header(self):
+        assert self._ip("198.51.100.4", "1.1.1.1") == "198.51.100.4"
+
+
+class TestPodaSQLite:
+    def test_borra_buckets_recargados(self, tmp_path, monkeypatch):
+        backend = SQLiteBackend(str(tmp_path / "rl.sqlite3"))
+        backend.take("viejo", 2, 1.0)
+        backend.take("lleno", 10, 100.0)
+        backend.take("vacio", 1, 0.001)
+        assert backend.prune(time.time() + 1) == 2
+        filas = backend._conn().execute("SELECT key FROM bucket").fetchall()
+        assert filas == [("vacio",)]
+
+    def test_poda_al_escribir(self, tmp_path, monkeypatch):
+        backend = SQLiteBackend(str(tmp_path / "rl.sqlite3"))
+        monkeypatch.setattr(SQLiteBackend, "PRUNE_EVERY", 10)
+        for i in range(10):
+            backend.take(f"ip:{i}", 1, 6000.0)  # se recarga en 10 ms
+            time.sleep(0.002)
+        total = backend._conn().execute("SELECT COUNT(*) FROM bucket").fetchone()[0]
+        assert total < 10
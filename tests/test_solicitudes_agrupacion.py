@@ -0,0 +1,92 @@
+"""
+Tests para la agrupación de solicitudes duplicadas por cama/área/tipo
+"""
+from routers import solicitudes
+
+
+class TestAgrupacionSolicitudes:
+    """Tests de POST /solicitudes con solicitudes abiertas equivalentes."""
+
+    def test_duplicado_se_agrupa(self, db_client):
+        r1 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO", "descripcion": "gotera"})
+        r2 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO", "descripcion": "sin agua"})
+
+        assert r1.json()["fusionada"] is False
+        assert r2.json()["fusionada"] is True
+        assert r2.json()["solicitud"]["id"] == r1.json()["solicitud"]["id"]
+        assert "sin agua" in r2.json()["solicitud"]["descripcion"]
+
+    def test_otro_tipo_no_se_agrupa(self, db_client):
+        r1 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"})
+        r2 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "TELEVISOR"})
+        assert r2.json()["fusionada"] is False
+        assert r2.json()["solicitud"]["id"] != r1.json()["solicitud"]["id"]
+
+    def test_cerrada_no_se_agrupa(self, db_client):
+        r1 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"})
+        id_solicitud = r1.json()["solicitud"]["id"]
+        db_client.put(f"/solicitudes/{id_solicitud}/estado", params={"nuevo_estado": "cerrada"})
+        r2 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"})
+        assert r2.json()["fusionada"] is False
+
+    def test_ventana_cero_desactiva(self, db_client, monkeypatch):
+        monkeypatch.setattr(solicitudes, "COALESCE_WINDOW_MINUTES", 0)
+        db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"})
+        r2 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"})
+        assert r2.json()["fusionada"] is False
+
+    def _carrera(self, monkeypatch, db_session, cambio):
+        """Aplica `cambio` desde otra sesión justo después de la primera búsqueda."""
+        from models.models import Solicitud
+
+        original = solicitudes._buscar_solicitud_abierta
+        llamadas = []
+
+        def con_carrera(db, *args):
+            encontrada = original(db, *args)
+            llamadas.append(encontrada)
+            if len(llamadas) == 1 and encontrada is not None:
+                otra = db_session()
+                cambio(otra, otra.get(Solicitud, encontrada.id_solicitud))
+                otra.commit()
+                otra.close()
+            return encontrada
+
+        monkeypatch.setattr(solicitudes, "_buscar_solicitud_abierta", con_carrera)
+        return llamadas
+
+    def test_version_cambia_antes_del_commit_reintenta(self, db_client, db_session, monkeypatch):
+        from models.models import EstadoSolicitud
+
+        r1 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"})
+        llamadas = self._carrera(
+            monkeypatch, db_session, lambda db, s: setattr(s, "estado_actual", EstadoSolicitud.EN_PROCESO)
+        )
+        r2 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO", "descripcion": "otra"})
+
+        assert r2.status_code == 200
+        assert len(llamadas) == 2
+        assert r2.json()["fusionada"] is True
+        assert r2.json()["solicitud"]["id"] == r1.json()["solicitud"]["id"]
+        assert r2.json()["solicitud"]["version"] == 3  # cambio de estado + agrupación
+
+    def test_cerrada_antes_del_commit_crea_otra(self, db_client, db_session, monkeypatch):
+        from models.models import EstadoSolicitud
+
+        r1 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"})
+        self._carrera(monkeypatch, db_session, lambda db, s: setattr(s, "estado_actual", EstadoSolicitud.CERRADA))
+        r2 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"})
+
+        assert r2.status_code == 200
+        assert r2.json()["fusionada"] is False
+        assert r2.json()["solicitud"]["id"] != r1.json()["solicitud"]["id"]
+
+    def test_borrada_antes_del_commit_crea_otra(self, db_client, db_session, monkeypatch):
+        r1 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"})
+        self._carrera(monkeypatch, db_session, lambda db, s: db.delete(s))
+        r2 = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "BAÑO"})
+
+        assert r1.status_code == 200
+        assert r2.status_code == 200
+        assert r2.json()["fusionada"] is False
+        assert r2.json()["solicitud"]["version"] == 1
@@ -0,0 +1,100 @@
+"""
+Tests para el conteo de SQL por petición y el log de consultas lentas
+"""
+import logging
+
+from sqlalchemy import text
+
+from db import session as sesion_db
+
+
+class TestSqlTiming:
+    """Tests de Server-Timing y consultas lentas."""
+
+    def test_server_timing_cuenta_sentencias(self, db_client, db_session):
+        engine = db_session.kw["bind"]
+        sesion_db.enable_query_timing(engine)
+        try:
+            response = db_client.get("/qr/validate?code=QR-TEST-1")
+        finally:
+            sesion_db.disable_query_timing(engine)
+
+        timing = response.headers.get("server-timing", "")
+        assert timing.startswith("db;dur=")
+        assert "queries" in timing
+        metricas = db_client.get("/metrics").text
+        assert 'http_request_db_statements_count{method="GET",route="/qr/validate"}' in metricas
+
+    def test_desactivado_sin_header(self, db_client):
+        response = db_client.get("/qr/validate?code=QR-TEST-1")
+        assert "server-timing" not in response.headers
+
+    def test_consulta_lenta_con_plan(self, db_session, monkeypatch, caplog):
+        engine = db_session.kw["bind"]
+        monkeypatch.setattr(sesion_db, "SLOW_QUERY_MS", 0)
+        sesion_db.enable_query_timing(engine)
+        try:
+            with caplog.at_level(logging.WARNING, logger="db.slow_query"):
+                db = db_session()
+                db.execute(text("SELECT * FROM cama WHERE id_cama = 1")).all()
+                db.close()
+        finally:
+            sesion_db.disable_query_timing(engine)
+        assert "Consulta lenta" in caplog.text
+        assert "Plan:" in caplog.text
+        assert "EXPLAIN no disponible" not in caplog.text
+
+    def test_explain_fallido_no_aborta_la_transaccion(self, caplog):
+        """En Postgres el EXPLAIN va en un SAVEPOINT que se revierte si falla."""
+        ejecutadas = []
+
+        class Cursor:
+            def execute(self, sql, parametros=None):
+                ejecutadas.append(sql.split(" FROM")[0])
+                if sql.startswith("EXPLAIN"):
+                    raise RuntimeError("canceling statement due to statement timeout")
+
+            def close(self):
+                pass
+
+        class Conexion:
+            autocommit = False
+
+            def cursor(self):
+                return Cursor()
+
+        class Dialecto:
+            name = "postgresql"
+
+        class Conn:
+            dialect = Dialecto()
+
+        cursor = type("CursorDeLaPeticion", (), {"connection": Conexion()})()
+        with caplog.at_level(logging.WARNING, logger="db.slow_query"):
+            sesion_db._log_slow_query(Conn(), cursor, "SELECT * FROM cama", {}, 2.0, False)
+        assert ejecutadas == [
+            "SAVEPOINT slow_query_explain",
+            "EXPLAIN SELECT *",
+            "ROLLBACK TO SAVEPOINT slow_query_explain",
+            "RELEASE SAVEPOINT slow_query_explain",
+        ]
+        assert "EXPLAIN no disponible" in caplog.text
+
+    def test_activado_a_mitad_de_sentencia(self, db_session):
+        # El before no corrió (conteo apagado) pero el after sí: no debe romper.
+        class Contexto:
+            pass
+
+        sesion_db._after_cursor_execute(None, None, "SELECT 1", (), Contexto(), False)
+
+    def test_toggle_avisa_que_es_por_worker(self, db_client):
+        from auth.dependencies import require_admin
+        from main import app
+
+        app.dependency_overrides[require_admin] = lambda: None
+        try:
+            cuerpo = db_client.put("/admin/diagnostico/sql?activo=false").json()
+        finally:
+            app.dependency_overrides.pop(require_admin, None)
+        assert cuerpo["alcance"] == "worker"
+        assert "SQL_TIMING_ENABLED" in cuerpo["nota"]
@@ -0,0 +1,169 @@
+"""
+Tests del cliente Admin de Supabase contra un servidor falso local
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services import supabase_admin
+from services.supabase_admin import CircuitBreaker, SupabaseAdminError
+
+
+class FakeSupabase:
+    """Responde con la cola `respuestas` ((status, cuerpo, demora)); luego 200 {}."""
+
+    def __init__(self):
+        self.respuestas = []
+        self.peticiones = []
+        self.conexiones = set()
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _responder(self):
+                largo = int(self.headers.get("Content-Length") or 0)
+                cuerpo = json.loads(self.rfile.read(largo)) if largo else None
+                fake.peticiones.append((self.command, self.path, cuerpo, self.headers.get("apikey")))
+                fake.conexiones.add(self.client_address)
+                status, respuesta, demora = fake.respuestas.pop(0) if fake.respuestas else (200, {}, 0)
+                if demora:
+                    time.sleep(demora)
+                datos = json.dumps(respuesta).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(datos)))
+                    self.end_headers()
+                    self.wfile.write(datos)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            do_POST = do_PUT = do_DELETE = _responder
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    fake = FakeSupabase()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), fake.handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setenv("SUPABASE_URL", f"http://127.0.0.1:{server.server_port}/")
+    monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", "service-key")
+    monkeypatch.setattr(supabase_admin, "BACKOFF_BASE_SECONDS", 0)
+    monkeypatch.setattr(supabase_admin, "TIMEOUT_SECONDS", 0.5)
+    monkeypatch.setattr(supabase_admin, "breaker", CircuitBreaker(umbral=2, espera=60))
+    supabase_admin.cerrar()
+    try:
+        yield fake
+    finally:
+        supabase_admin.cerrar()
+        server.shutdown()
+        server.server_close()
+
+
+class TestClienteSupabase:
+    """Pool compartido, reintentos acotados y mensajes de error."""
+
+    def test_crear_usuario_reutiliza_conexion(self, supabase):
+        supabase.respuestas = [(200, {"id": "u1"}, 0), (200, {"id": "u2"}, 0)]
+        assert supabase_admin.create_auth_user("a@x.cl", "secreto1")["id"] == "u1"
+        assert supabase_admin.create_auth_user("b@x.cl", "secreto2")["id"] == "u2"
+        metodo, path, cuerpo, apikey = supabase.peticiones[0]
+        assert (metodo, path, apikey) == ("POST", "/auth/v1/admin/users", "service-key")
+        assert cuerpo == {"email": "a@x.cl", "password": "secreto1", "email_confirm": True}
+        # keep-alive: las dos llamadas salen por la misma conexión.
+        assert len(supabase.conexiones) == 1
+
+    def test_reintenta_5xx_en_put(self, supabase):
+        supabase.respuestas = [(500, {}, 0), (503, {}, 0), (200, {"id": "u1"}, 0)]
+        assert supabase_admin.update_auth_user("u1", password="nueva123") == {"id": "u1"}
+        assert len(supabase.peticiones) == 3
+
+    def test_reintentos_acotados(self, supabase):
+        supabase.respuestas = [(500, {"message": "caído"}, 0)] * 5
+        with pytest.raises(SupabaseAdminError, match="caído"):
+            supabase_admin.delete_auth_user("u1")
+        assert len(supabase.peticiones) == supabase_admin.REINTENTOS + 1
+
+    def test_post_no_reintenta_500(self, supabase):
+        supabase.respuestas = [(500, {"message": "falló"}, 0)]
+        with pytest.raises(SupabaseAdminError, match="Error creando usuario en Supabase: falló"):
+            supabase_admin.create_auth_user("a@x.cl", "secreto1")
+        assert len(supabase.peticiones) == 1
+
+    def test_reintenta_timeout_en_delete(self, supabase):
+        supabase.respuestas = [(200, {}, 1.0), (200, {}, 0)]
+        supabase_admin.delete_auth_user("u1")
+        assert len(supabase.peticiones) == 2
+
+    def test_4xx_no_se_reintenta(self, supabase):
+        supabase.respuestas = [(422, {"message": "User already registered"}, 0)]
+        with pytest.raises(SupabaseAdminError, match="already registered"):
+            supabase_admin.create_auth_user("a@x.cl", "secreto1")
+        assert len(supabase.peticiones) == 1
+        assert supabase_admin.breaker.estado == "cerrado"
+
+    def test_delete_404_es_ok(self, supabase):
+        supabase.respuestas = [(404, {}, 0)]
+        supabase_admin.delete_auth_user("no-existe")
+
+
+class TestCircuitBreaker:
+    """Falla rápido con Supabase caído y se recupera tras la espera."""
+
+    def test_abre_y_falla_rapido(self, supabase):
+        supabase.respuestas = [(503, {}, 0)] * 6
+        for _ in range(2):
+            with pytest.raises(SupabaseAdminError):
+                supabase_admin.delete_auth_user("u1")
+        assert supabase_admin.breaker.estado == "abierto"
+
+        antes = len(supabase.peticiones)
+        with pytest.raises(SupabaseAdminError, match="no está disponible"):
+            supabase_admin.delete_auth_user("u1")
+        assert len(supabase.peticiones) == antes
+
+    def test_semiabierto_deja_pasar_una_prueba(self):
+        ahora = [0.0]
+        breaker = CircuitBreaker(umbral=1, espera=10, reloj=lambda: ahora[0])
+        breaker.fallo()
+        assert not breaker.permitir()
+        ahora[0] = 11
+        assert breaker.estado == "semiabierto"
+        assert breaker.permitir()
+        assert not breaker.permitir()  # sólo una prueba a la vez
+        breaker.fallo()
+        assert breaker.estado == "abierto"
+        ahora[0] = 22
+        assert breaker.permitir()
+        breaker.exito()
+        assert breaker.estado == "cerrado"
+        assert breaker.permitir()
+
+    def test_prueba_con_error_inesperado_no_traba_el_circuito(self, supabase, monkeypatch):
+        ahora = [0.0]
+        monkeypatch.setattr(supabase_admin, "breaker", CircuitBreaker(umbral=1, espera=10, reloj=lambda: ahora[0]))
+        supabase_admin.breaker.fallo()
+        ahora[0] = 11
+
+        class ClienteRoto:
+            def request(self, *args, **kwargs):
+                raise ValueError("respuesta ilegible")
+
+        monkeypatch.setattr(supabase_admin, "_get_client", lambda: ClienteRoto())
+        with pytest.raises(ValueError):
+            supabase_admin.delete_auth_user("u1")
+        # La prueba no registró resultado, pero la siguiente llamada puede probar.
+        assert supabase_admin.breaker.permitir()
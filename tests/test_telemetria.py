@@ -0,0 +1,52 @@
+"""
+Tests para el middleware de telemetría y el endpoint /metrics
+"""
+from services.telemetry import Registry
+
+
+class TestRegistry:
+    """Tests del formato de exposición Prometheus."""
+
+    def test_histograma_acumulado(self):
+        registry = Registry()
+        hist = registry.histogram("lat_seconds", "Latencia.", ("route",), buckets=(0.1, 1.0))
+        hist.observe(0.05, "/a")
+        hist.observe(0.5, "/a")
+        hist.observe(5, "/a")
+        texto = registry.render()
+        assert '# TYPE lat_seconds histogram' in texto
+        assert 'lat_seconds_bucket{route="/a",le="0.1"} 1' in texto
+        assert 'lat_seconds_bucket{route="/a",le="1"} 2' in texto
+        assert 'lat_seconds_bucket{route="/a",le="+Inf"} 3' in texto
+        assert 'lat_seconds_count{route="/a"} 3' in texto
+
+    def test_counter_y_gauge(self):
+        registry = Registry()
+        registry.counter("reqs_total", "Peticiones.", ("status",)).inc("200")
+        gauge = registry.gauge("en_curso", "En curso.")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        texto = registry.render()
+        assert 'reqs_total{status="200"} 1' in texto
+        assert "en_curso 1" in texto
+
+
+class TestMetricsEndpoint:
+    """Tests de GET /metrics."""
+
+    def test_metrics_expone_rutas(self, client):
+        client.get("/")
+        client.get("/qr/redirect/ABC", follow_redirects=False)
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_requests_total{method="GET",route="/",status="200"}' in response.text
+        # Se usa la plantilla de la ruta, no el path concreto
+        assert 'route="/qr/redirect/{code}"' in response.text
+        assert "http_requests_in_flight" in response.text
+
+    def test_metrics_con_token(self, client, monkeypatch):
+        monkeypatch.setenv("METRICS_TOKEN", "secreto")
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer secreto"}).status_code == 200
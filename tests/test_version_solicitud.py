@@ -0,0 +1,99 @@
+"""
+Tests del control de concurrencia optimista (version / ETag) en solicitudes
+"""
+import pytest
+
+from models.models import EstadoSolicitud, Solicitud
+
+
+@pytest.fixture
+def solicitud(db_client):
+    creada = db_client.post("/solicitudes", json={"id_cama": 1, "id_area": 1, "tipo": "Luz"}).json()
+    return creada["solicitud"]
+
+
+class TestVersionSolicitud:
+    """If-Match / version condicionan el cambio de estado; el conflicto responde 409."""
+
+    def test_get_entrega_etag_y_version(self, db_client, solicitud):
+        res = db_client.get(f"/solicitudes/{solicitud['id']}")
+        assert res.status_code == 200
+        assert res.headers["etag"] == f'"sol-{solicitud["id"]}-v1"'
+        assert res.json()["version"] == 1
+
+    def test_cada_cambio_incrementa_version(self, db_client, solicitud):
+        url = f"/solicitudes/{solicitud['id']}/estado"
+        res = db_client.put(url, params={"nuevo_estado": "en_proceso", "version": 1})
+        assert res.status_code == 200
+        assert res.json()["solicitud"]["version"] == 2
+        assert res.headers["etag"] == f'"sol-{solicitud["id"]}-v2"'
+
+    def test_if_match_obsoleto_responde_409_con_estado_actual(self, db_client, solicitud):
+        url = f"/solicitudes/{solicitud['id']}/estado"
+        etag = db_client.get(f"/solicitudes/{solicitud['id']}").headers["etag"]
+        assert db_client.put(url, params={"nuevo_estado": "en_proceso"}, headers={"If-Match": etag}).status_code == 200
+
+        # El segundo usuario todavía tiene el ETag de la versión 1.
+        res = db_client.put(url, params={"nuevo_estado": "cerrada"}, headers={"If-Match": etag})
+        assert res.status_code == 409
+        assert res.json()["solicitud"]["estado"] == "en_proceso"
+        assert res.json()["solicitud"]["version"] == 2
+        assert res.headers["etag"] == f'"sol-{solicitud["id"]}-v2"'
+
+    def test_version_obsoleta_responde_409(self, db_client, solicitud):
+        url = f"/solicitudes/{solicitud['id']}/estado"
+        db_client.put(url, params={"nuevo_estado": "en_proceso"})
+        res = db_client.put(url, params={"nuevo_estado": "cerrada", "version": 1})
+        assert res.status_code == 409
+
+    def test_update_condicionado_detecta_carrera(self, db_client, db_session, solicitud, monkeypatch):
+        """Si otro cambio gana entre la lectura y el UPDATE, no se bloquea: 409."""
+        from services import historial
+
+        original = historial.registrar_transicion
+
+        def con_carrera(db, s, estado, ahora, inicio_estado=None):
+            otra = db_session()
+            otra.get(Solicitud, s.id_solicitud).estado_actual = EstadoSolicitud.CERRADA
+            otra.commit()
+            otra.close()
+            return original(db, s, estado, ahora, inicio_estado)
+
+        monkeypatch.setattr(historial, "registrar_transicion", con_carrera)
+        res = db_client.put(f"/solicitudes/{solicitud['id']}/estado", params={"nuevo_estado": "en_proceso"})
+        assert res.status_code == 409
+        assert res.json()["solicitud"]["estado"] == "cerrada"
+
+    def test_borrada_durante_la_carrera_responde_404(self, db_client, db_session, solicitud, monkeypatch):
+        from services import historial
+
+        original = historial.registrar_transicion
+
+        def con_borrado(db, s, estado, ahora, inicio_estado=None):
+            otra = db_session()
+            otra.delete(otra.get(Solicitud, s.id_solicitud))
+            otra.commit()
+            otra.close()
+            return original(db, s, estado, ahora, inicio_estado)
+
+        monkeypatch.setattr(historial, "registrar_transicion", con_borrado)
+        res = db_client.put(f"/solicitudes/{solicitud['id']}/estado", params={"nuevo_estado": "en_proceso"})
+        assert res.status_code == 404
+        assert res.json()["detail"] == "Solicitud no encontrada"
+
+    def test_sin_precondicion_sigue_funcionando(self, db_client, solicitud):
+        res = db_client.put(f"/solicitudes/{solicitud['id']}/estado", params={"nuevo_estado": "cerrada"})
+        assert res.status_code == 200
+        assert res.json()["solicitud"]["estado"] == "cerrada"
+
+    def test_cambio_masivo_incrementa_version(self, db_client, db_session, solicitud):
+        from auth.dependencies import require_authenticated_user
+        from main import app
+        from models.models import RolUsuario, Usuario
+
+        app.dependency_overrides[require_authenticated_user] = lambda: Usuario(
+            rol=RolUsuario.ADMIN, correo="u@example.com"
+        )
+        db_client.put("/solicitudes/estado", json={"ids": [solicitud["id"]], "estado": "cerrada"})
+        res = db_client.put(f"/solicitudes/{solicitud['id']}/estado", params={"nuevo_estado": "pendiente", "version": 1})
+        assert res.status_code == 409
@@ -0,0 +1,27 @@
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+
+
+def parse_fields(raw: Optional[str], permitidos: Iterable[str]) -> Optional[frozenset]:
+    """
+    Convierte `fields=a,b,c` en un conjunto validado. None (o vacío) significa
+    "todos los campos"; un nombre desconocido responde 400.
+    """
+    if raw is None or not raw.strip():
+        return None
+    permitidos = set(permitidos)
+    campos = frozenset(c.strip() for c in raw.split(",") if c.strip())
+    desconocidos = sorted(campos - permitidos)
+    if desconocidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos inválidos: {desconocidos}. Permitidos: {sorted(permitidos)}",
+        )
+    return campos
+
+
+def project(item: dict, campos: Optional[frozenset]) -> dict:
+    if campos is None:
+        return item
+    return {k: v for k, v in item.items() if k in campos}
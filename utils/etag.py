@@ -0,0 +1,15 @@
+from typing import Optional
+
+
+def coincide(header: Optional[str], etag: str) -> bool:
+    """
+    True si algún ETag de un If-None-Match / If-Match (lista separada por
+    comas, `*` o con prefijo W/) corresponde a `etag`.
+    """
+    if not header:
+        return False
+    for candidato in header.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or candidato.removeprefix("W/") == etag:
+            return True
+    return False